@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Import-Time Benchmark for the Enhanced Forecast Model
+
+Measures how long a fresh interpreter takes to import the forecast modules and
+checks that the optional backends (matplotlib, statsmodels, scipy, Prophet,
+PyMC3) are not imported until a method needs them. Short-lived scheduler
+workers pay this cost on every start, so the script exits with a non-zero
+status when the median import time exceeds the budget or a heavy backend is
+loaded eagerly.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --repeat 10 --budget 1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = (
+    'uk_forecast_template',
+    'uk_forecast_cache',
+    'uk_forecast_charts',
+    'uk_forecast_arima',
+    'uk_forecast_factor',
+    'uk_forecast_exog',
+    'uk_forecast_prophet',
+    'uk_forecast_profile',
+    'uk_forecast_scenarios',
+    'uk_forecast_backtest',
+    'uk_forecast_enhanced_model',
+    'uk_forecast_enhanced_simple',
+    'uk_forecast_batch',
+    'uk_forecast_hierarchy',
+    'uk_forecast_dashboard',
+)
+
+# Backends that must only be imported on first use
+LAZY_BACKENDS = ('matplotlib', 'statsmodels', 'scipy', 'prophet', 'pymc3', 'theano')
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = sorted(name for name in {backends!r} if name in sys.modules)
+print(json.dumps({{'seconds': elapsed, 'loaded': loaded}}))
+"""
+
+
+def measure(module, repeat=5):
+    """
+    Import a module in fresh interpreters.
+
+    Returns:
+    - Tuple of (list of import times in seconds, eagerly loaded backends)
+    """
+    times = []
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, backends=LAZY_BACKENDS)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        loaded.update(result['loaded'])
+    return times, sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the forecast modules.")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of fresh interpreters per module")
+    parser.add_argument('--budget', type=float, default=1.5, help="Maximum median import time in seconds")
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        times, loaded = measure(module, args.repeat)
+        median = statistics.median(times)
+        print(f"{module}: median {median * 1000:.0f} ms, min {min(times) * 1000:.0f} ms over {args.repeat} runs")
+
+        if loaded:
+            print(f"  FAIL: backends imported eagerly: {', '.join(loaded)}")
+            failed = True
+        if median > args.budget:
+            print(f"  FAIL: median import time exceeds the {args.budget:.2f} s budget")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark on Synthetic Markets
+
+Times every stage of the forecast pipeline on synthetic templates (see
+synthetic_templates.py) for 1 to 10,000 series:
+
+- generate: writing the templates
+- parse: indexing the template and parsing HISTORICAL QUERIES and FORECAST RESULTS
+- load: loading the template into EnhancedForecastModel
+- outliers: outlier detection and adjustment
+- arima, arimax, prophet, bayesian, pymc3: fit and 12-month forecast of each
+  model backend, with the result caches disabled
+- comparison: the comparison with the factor forecast
+- excel: the Excel export
+
+Parsing, loading and outlier handling run over every series. The model
+backends, the comparison and the Excel export take seconds per series, so
+they run on the first --fit-limit series only; every result reports the
+number of series it was timed on and the time per series. Backends that are
+not installed (Prophet, PyMC3) are skipped. An untimed pass over one series
+runs first, so the one-off imports of the backends are not counted.
+
+Results are written to benchmarks/results/pipeline_<timestamp>.json with the
+configuration and the library versions, and compared with the latest earlier
+result: stages whose time per series grew by more than the tolerance are
+reported as regressions. Everything runs offline; the templates are written
+to a temporary directory unless --data-dir is given.
+
+Usage:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --series 1 100 10000 --fit-limit 20 --fail-on-regression
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from convert_uk_csv_to_excel import convert_csv_to_excel  # noqa: E402
+from synthetic_templates import write_templates  # noqa: E402
+from uk_forecast_enhanced_model import EnhancedForecastModel  # noqa: E402
+from uk_forecast_profile import RunProfile, environment, write_report  # noqa: E402
+from uk_forecast_template import TemplateReader  # noqa: E402
+
+DEFAULT_RESULTS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'results')
+
+# Layout version of the result files
+RESULTS_VERSION = 2
+
+BACKENDS = ('arima', 'arimax', 'prophet', 'bayesian', 'pymc3')
+
+DEFAULT_BACKENDS = ('arima', 'arimax', 'prophet', 'bayesian')
+
+# Packages a backend needs besides the core requirements
+BACKEND_PACKAGES = {'prophet': 'prophet', 'pymc3': 'pymc3'}
+
+
+def _fit_arima(model):
+    model.fit_arima_model(cache_dir=None)
+    model.forecast_arima()
+
+
+def _fit_arimax(model):
+    model.fit_arimax_model(cache_dir=None)
+    model.forecast_arimax()
+
+
+def _fit_prophet(model):
+    model.fit_prophet_model(cache_dir=None)
+    model.forecast_prophet()
+
+
+def _fit_bayesian(model):
+    model.bayesian_forecast(backend='conjugate')
+
+
+def _fit_pymc3(model):
+    model.bayesian_forecast(backend='pymc3')
+
+
+BACKEND_STEPS = {
+    'arima': _fit_arima,
+    'arimax': _fit_arimax,
+    'prophet': _fit_prophet,
+    'bayesian': _fit_bayesian,
+    'pymc3': _fit_pymc3,
+}
+
+
+def available_backends(backends):
+    """The backends whose packages are installed."""
+    return [backend for backend in backends
+            if backend not in BACKEND_PACKAGES or importlib.util.find_spec(BACKEND_PACKAGES[backend]) is not None]
+
+
+def run_pipeline(paths, fit_limit, backends, excel_dir, outlier_method='zscore'):
+    """
+    Time the pipeline stages on a set of templates.
+
+    Parameters:
+    - paths: Template paths
+    - fit_limit: Number of series the backends, the comparison and the export are timed on
+    - backends: Model backends to time (see BACKENDS)
+    - excel_dir: Directory of the exported workbooks
+    - outlier_method: Outlier detection method
+
+    Returns:
+    - RunProfile with one span per stage and series
+    """
+    profile = RunProfile(f"{len(paths)} series")
+    sample = []
+    # The models print progress for every series
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            with profile.span('parse'):
+                reader = TemplateReader(path)
+                reader.historical_queries()
+                reader.forecast_results()
+
+        for path in paths:
+            with profile.span('load'):
+                model = EnhancedForecastModel(path)
+            with profile.span('outliers'):
+                model.detect_outliers(method=outlier_method)
+                model.adjust_outliers()
+            if len(sample) < fit_limit:
+                sample.append(model)
+
+        for backend in backends:
+            for model in sample:
+                with profile.span(backend):
+                    BACKEND_STEPS[backend](model)
+
+        for model in sample:
+            with profile.span('comparison'):
+                model.compare_with_factor_model(model.csv_path)
+
+        for model in sample:
+            excel_path = os.path.join(excel_dir, os.path.basename(model.csv_path)[:-len('.csv')] + '.xlsx')
+            with profile.span('excel'):
+                convert_csv_to_excel(model.csv_path, excel_path)
+    return profile
+
+
+def stage_results(profile, series):
+    """Rows of the results file for the stages of one run."""
+    rows = []
+    for stage, totals in profile.stages().iterrows():
+        rows.append({
+            'series': series,
+            'stage': stage,
+            'count': int(totals['Calls']),
+            'seconds': float(totals['Seconds']),
+            'cpu_seconds': float(totals['CPU_Seconds']),
+            'per_series_ms': float(totals['Seconds']) / totals['Calls'] * 1000,
+            'rss_delta_bytes': None if pd.isna(totals['RSS_Delta_Bytes']) else int(totals['RSS_Delta_Bytes']),
+            'max_rss_bytes': None if pd.isna(totals['Max_RSS_Bytes']) else int(totals['Max_RSS_Bytes'])
+        })
+    return rows
+
+
+def compare_results(current, previous, tolerance=0.25):
+    """
+    Compare the time per series of two benchmark runs.
+
+    Parameters:
+    - current, previous: Result dicts as written by main
+    - tolerance: Relative slowdown reported as a regression
+
+    Returns:
+    - DataFrame indexed by series and stage with the previous and current
+      milliseconds per series, their ratio and a Regression flag
+    """
+    columns = ['series', 'stage', 'per_series_ms']
+    comparison = pd.merge(
+        pd.DataFrame(previous['results'])[columns], pd.DataFrame(current['results'])[columns],
+        on=['series', 'stage'], suffixes=('_previous', '_current')
+    ).set_index(['series', 'stage'])
+    comparison['Ratio'] = comparison['per_series_ms_current'] / comparison['per_series_ms_previous']
+    comparison['Regression'] = comparison['Ratio'] > 1 + tolerance
+    return comparison
+
+
+def latest_result(results_dir, exclude=None):
+    """Path of the latest results file in a directory, or None."""
+    paths = sorted(path for path in glob.glob(os.path.join(results_dir, 'pipeline_*.json')) if path != exclude)
+    return paths[-1] if paths else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the forecast pipeline on synthetic markets.")
+    parser.add_argument('--series', type=int, nargs='+', default=[1, 10, 100],
+                        help="Numbers of series to benchmark (1 to 10000)")
+    parser.add_argument('--months', type=int, default=61, help="Months of history per series")
+    parser.add_argument('--outlier-density', type=float, default=0.03, help="Share of outlier months")
+    parser.add_argument('--seasonality', type=float, default=0.2, help="Amplitude of the seasonal profile")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data")
+    parser.add_argument('--backends', nargs='*', choices=BACKENDS, default=list(DEFAULT_BACKENDS),
+                        help="Model backends to time")
+    parser.add_argument('--fit-limit', type=int, default=10,
+                        help="Number of series the backends, comparison and export are timed on")
+    parser.add_argument('--outlier-method', default='zscore', help="Outlier detection method")
+    parser.add_argument('--data-dir', default=None, help="Keep the synthetic templates in this directory")
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR, help="Directory of the result files")
+    parser.add_argument('--compare', default=None, metavar='RESULTS',
+                        help="Results file to compare with (defaults to the latest in the results directory)")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Relative slowdown per series reported as a regression (default: 0.25)")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with a non-zero status when a stage regressed")
+    args = parser.parse_args()
+
+    if any(series < 1 or series > 10000 for series in args.series):
+        parser.error("--series must be between 1 and 10000")
+
+    backends = available_backends(args.backends)
+    for backend in sorted(set(args.backends) - set(backends)):
+        print(f"{backend} is not installed, skipping its benchmark")
+
+    config = {
+        'series': sorted(set(args.series)), 'months': args.months, 'outlier_density': args.outlier_density,
+        'seasonality': args.seasonality, 'seed': args.seed, 'backends': backends, 'fit_limit': args.fit_limit,
+        'outlier_method': args.outlier_method
+    }
+    started = time.time()
+    results = []
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix='bench_pipeline_'))
+        excel_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='bench_excel_'))
+
+        # The templates of the largest run are written once; smaller runs use the first ones
+        largest = max(config['series'])
+        generate = RunProfile('generate')
+        with generate.span('generate'):
+            paths = write_templates(data_dir, largest, args.months, args.outlier_density, args.seasonality,
+                                    seed=args.seed)
+        results.extend(stage_results(generate, largest))
+
+        # One untimed pass imports the backends, so their import time is not counted in the first run
+        run_pipeline(paths[:1], 1, backends, excel_dir, args.outlier_method)
+
+        for series in config['series']:
+            profile = run_pipeline(paths[:series], args.fit_limit, backends, excel_dir, args.outlier_method)
+            rows = stage_results(profile, series)
+            results.extend(rows)
+            print(f"\n{series} series")
+            for row in rows:
+                print(f"  {row['stage']:<11} {row['seconds']:9.3f} s  {row['per_series_ms']:10.2f} ms/series"
+                      f"  ({row['count']} series)")
+
+    current = {
+        'version': RESULTS_VERSION,
+        'started': pd.Timestamp(started, unit='s', tz='UTC').isoformat(),
+        'seconds': time.time() - started,
+        'environment': environment(),
+        'config': config,
+        'results': results,
+    }
+    path = os.path.join(args.results_dir, f"pipeline_{time.strftime('%Y%m%d_%H%M%S', time.gmtime(started))}.json")
+    write_report(current, path)
+    print(f"\nResults saved to {path}")
+
+    previous_path = args.compare or latest_result(args.results_dir, exclude=path)
+    if previous_path is None:
+        return
+    with open(previous_path, encoding='utf-8') as file:
+        previous = json.load(file)
+    changed = {key for key in config if previous.get('config', {}).get(key) != config[key]}
+    if changed:
+        print(f"Note: the configuration differs from {previous_path} in {', '.join(sorted(changed))}")
+
+    comparison = compare_results(current, previous, args.tolerance)
+    print(f"\nComparison with {previous_path} (ms per series):")
+    print(comparison.round(3).to_string())
+    regressions = comparison[comparison['Regression']]
+    if not regressions.empty:
+        print(f"\n{len(regressions)} stage(s) slower by more than {args.tolerance:.0%}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Synthetic Forecast Templates
+
+Writes forecast templates in the sectioned CSV format of
+Travel_Queries_Forecast_UK_Aligned.csv for any number of synthetic markets,
+so the pipeline can be benchmarked at scale without real data. Every template
+has the same sections as the real ones: HISTORICAL QUERIES, FLIGHT SEARCHES,
+MEDIA IMPRESSIONS, BRAND HEALTH, HOTEL GUESTS, PARAMETERS, SEASONALITY INDEX,
+FORECAST CALCULATIONS and FORECAST RESULTS. The forecast sections are computed
+with the factor model from the generated inputs.
+
+The queries of a market are a growing level times a yearly seasonal profile
+with multiplicative noise; a share of the months (the outlier density) is
+replaced by spikes and drops. Each market gets its own level, growth and
+seasonal phase, drawn from a seeded generator, so the same arguments always
+produce the same files.
+
+Usage:
+    python benchmarks/synthetic_templates.py synthetic/ --markets 100 --months 61
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from uk_forecast_factor import FactorModel  # noqa: E402
+from uk_forecast_template import MONTH_NAMES  # noqa: E402
+
+# Number of fields per row of the real templates
+ROW_WIDTH = 9
+
+SECTION_RULE = '=' * 20
+
+SCENARIOS = ('Conservative', 'Moderate', 'Ambitious')
+
+# Scenario parameters of the synthetic markets (the Aligned template's values)
+PARAMETERS = (
+    ('Base Growth Factor', 'growth', (0.02, 0.05, 0.08), '{:.0%}'),
+    ('Brand Awareness Target', None, (0.93, 0.935, 0.94), '{:.1%}'),
+    ('Brand Consideration Target', 'consideration_target', (0.34, 0.35, 0.36), '{:.0%}'),
+    ('Media Effectiveness Multiplier', 'media_effectiveness', (0.05, 0.08, 0.12), '{:.2f}'),
+    ('Flight Search Correlation', 'flight_correlation', (0.01, 0.03, 0.05), '{:.2f}'),
+    ('Brand Health Coefficient', 'brand_coefficient', (0.10, 0.15, 0.20), '{:.2f}'),
+)
+
+
+def synthetic_queries(markets, months, outlier_density=0.03, seasonality=0.2, noise=0.08, seed=0):
+    """
+    Monthly indexed queries of synthetic markets.
+
+    Parameters:
+    - markets: Number of markets
+    - months: Number of months per market
+    - outlier_density: Share of months replaced by spikes or drops
+    - seasonality: Amplitude of the yearly seasonal profile (0 for none)
+    - noise: Standard deviation of the multiplicative noise
+    - seed: Seed of the random generator
+
+    Returns:
+    - Tuple of (array of shape (markets, months), boolean outlier mask of the same shape)
+    """
+    rng = np.random.default_rng(seed)
+    steps = np.arange(months)
+
+    level = rng.uniform(40, 120, size=(markets, 1))
+    growth = rng.uniform(-0.02, 0.15, size=(markets, 1))
+    phase = rng.uniform(0, 2 * np.pi, size=(markets, 1))
+
+    profile = 1 + seasonality * np.sin(2 * np.pi * steps / 12 + phase)
+    values = level * (1 + growth) ** (steps / 12) * profile * rng.lognormal(0, noise, size=(markets, months))
+
+    outliers = rng.random((markets, months)) < outlier_density
+    shocks = np.where(rng.random((markets, months)) < 0.5, rng.uniform(0.2, 0.5, (markets, months)),
+                      rng.uniform(1.8, 3.0, (markets, months)))
+    values = np.where(outliers, values * shocks, values)
+    return np.round(values, 2), outliers
+
+
+def template_rows(queries, forecast_year, rng, title='Travel Queries Forecast Template'):
+    """
+    Rows of one synthetic template.
+
+    Parameters:
+    - queries: Monthly indexed queries ending in January of the forecast year
+    - forecast_year: Year forecast by the template
+    - rng: NumPy random generator for the other input sections
+
+    Returns:
+    - List of rows (lists of strings)
+    """
+    base_year = forecast_year - 1
+    months = len(queries)
+    if months < 13:
+        raise ValueError("The history needs at least the 12 months of the base year and January")
+
+    # The history ends in January of the forecast year, as in the real templates
+    start = forecast_year * 12 - (months - 1)
+    years = (start + np.arange(months)) // 12
+    month_numbers = (start + np.arange(months)) % 12
+
+    rows = [[title], [], ['INSTRUCTIONS:'],
+            ['1. This template is designed to forecast travel queries for a market using the multi-factor approach'],
+            ['2. Fill in the data in each of the input sheets (Historical Queries, Flight Searches, '
+             'Media Impressions, Brand Health)'],
+            ['3. Adjust the parameters in the Parameters sheet if needed'],
+            ['4. The forecast will automatically calculate based on the input data and parameters'], []]
+
+    def section(name, header, body):
+        rows.extend([[SECTION_RULE], [name], [SECTION_RULE], header, *body, []])
+
+    # Rows are ordered by month, then year
+    order = np.lexsort((years, month_numbers))
+    section('HISTORICAL QUERIES', ['Month', 'Year', 'Indexed Queries'],
+            [[MONTH_NAMES[month_numbers[i]], str(years[i]), f"{queries[i]:.2f}"] for i in order])
+
+    base = queries[(years == base_year)][np.argsort(month_numbers[years == base_year])]
+    profile = base / base.mean()
+
+    flights = 10000 * profile * rng.uniform(0.8, 1.2, size=(2, 12)) * np.array([[1.0], [rng.uniform(1.0, 1.6)]])
+    section('FLIGHT SEARCHES', ['Month', 'Year', 'Flight Searches'],
+            [[MONTH_NAMES[month], str(base_year - 1 + i), f"{flights[i, month]:.0f}"]
+             for month in range(12) for i in range(2)])
+
+    impressions = rng.uniform(2e7, 1.5e8, size=(3, 12))
+    section('MEDIA IMPRESSIONS',
+            ['Month', f'{base_year - 1} Impressions', f'{base_year} Impressions',
+             f'{forecast_year} Planned Impressions'],
+            [[MONTH_NAMES[month]] + [f"{impressions[i, month]:,.0f}" for i in range(3)] for month in range(12)])
+
+    awareness, consideration, intent = rng.uniform(0.85, 0.95), rng.uniform(0.28, 0.34), rng.uniform(0.18, 0.22)
+    quarters = [f'Q4 {base_year - 1}'] + [f'Q{q} {base_year}' for q in range(1, 5)]
+    quarters += [f'Q{q} {forecast_year} (Target)' for q in range(1, 5)]
+    brand = [[quarter, f"{awareness + 0.001 * i:.2%}", f"{consideration + 0.004 * i:.2%}", f"{intent + 0.003 * i:.2%}"]
+             for i, quarter in enumerate(quarters)]
+    section('BRAND HEALTH', ['Quarter', 'Awareness', 'Consideration', 'Intent'], brand)
+
+    guests = 15000 * profile * rng.uniform(0.8, 1.2, size=(2, 12)) * np.array([[1.0], [rng.uniform(1.0, 1.4)]])
+    section('HOTEL GUESTS', ['Month', 'Year', 'Hotel Guests'],
+            [[MONTH_NAMES[month], str(base_year - 1 + i), f"{guests[i, month]:.0f}"]
+             for month in range(12) for i in range(2)])
+
+    section('PARAMETERS', ['Parameter', *SCENARIOS, 'Notes'],
+            [[name, *(fmt.format(value) for value in values), 'Synthetic benchmark parameter']
+             for name, _, values, fmt in PARAMETERS])
+
+    seasonality = np.round(profile, 2)
+    section('SEASONALITY INDEX', ['Month', 'Seasonality Index', 'Notes'],
+            [[MONTH_NAMES[month], f"{seasonality[month]:.2f}", 'Derived from the synthetic base year']
+             for month in range(12)])
+
+    # The forecast sections are computed from the inputs as they appear in the file
+    model = FactorModel(
+        np.round(base, 2), seasonality, np.round(impressions[1]), np.round(impressions[2]),
+        np.round(flights[1]) / np.round(flights[0]) - 1,
+        consideration=round(consideration + 0.016, 4), intent=round(intent + 0.012, 4),
+        parameters={key: values for _, key, values, _ in PARAMETERS if key is not None},
+        base_year=base_year
+    )
+    computed = model.compute()
+    moderate = SCENARIOS.index('Moderate')
+    section('FORECAST CALCULATIONS',
+            ['Month', f'{base_year} Queries', 'Seasonality Index', 'Media Multiplier', 'Flight Search Factor',
+             'Brand Health Multiplier', *(f'{scenario} Forecast' for scenario in SCENARIOS)],
+            [[MONTH_NAMES[month], f"{base[month]:.2f}", f"{seasonality[month]:.2f}",
+              *(f"{computed[factor][moderate, month]:.2f}" for factor in ('media', 'flight', 'brand')),
+              *(f"{computed['forecast'][i, month]:.2f}" for i in range(len(SCENARIOS)))]
+             for month in range(12)])
+
+    results = model.forecast_results()
+    columns = [f'{base_year} Queries', *SCENARIOS]
+    body = [[row['Month'], *(f"{row[column]:.2f}" for column in columns),
+             *(f"{row[f'{scenario} YoY']:.1%}" for scenario in SCENARIOS)] for _, row in results.iterrows()]
+    averages = results[columns].mean()
+    body.append(['Average', *(f"{averages[column]:.2f}" for column in columns),
+                 *(f"{averages[scenario] / averages[columns[0]] - 1:.1%}" for scenario in SCENARIOS)])
+    section('FORECAST RESULTS', ['Month', *columns, *(f'{scenario} YoY' for scenario in SCENARIOS)], body)
+    return rows[:-1]
+
+
+def write_templates(directory, markets, months=61, outlier_density=0.03, seasonality=0.2, forecast_year=2025,
+                    seed=0):
+    """
+    Write synthetic templates Travel_Queries_Forecast_S<number>_Synthetic.csv.
+
+    Parameters:
+    - directory: Output directory
+    - markets: Number of templates
+    - months: Months of HISTORICAL QUERIES per template (ending in January of the forecast year)
+    - outlier_density, seasonality, seed: See synthetic_queries
+    - forecast_year: Year forecast by the templates
+
+    Returns:
+    - List of the template paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    queries, _ = synthetic_queries(markets, months, outlier_density, seasonality, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+
+    width = len(str(markets))
+    paths = []
+    for index, values in enumerate(queries, start=1):
+        path = os.path.join(directory, f"Travel_Queries_Forecast_S{index:0{width}d}_Synthetic.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file, lineterminator='\n')
+            for row in template_rows(values, forecast_year, rng):
+                writer.writerow(row + [''] * (ROW_WIDTH - len(row)))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic forecast templates.")
+    parser.add_argument('directory', help="Output directory")
+    parser.add_argument('--markets', type=int, default=10, help="Number of templates")
+    parser.add_argument('--months', type=int, default=61, help="Months of history per template")
+    parser.add_argument('--outlier-density', type=float, default=0.03, help="Share of outlier months")
+    parser.add_argument('--seasonality', type=float, default=0.2, help="Amplitude of the seasonal profile")
+    parser.add_argument('--forecast-year', type=int, default=2025, help="Year forecast by the templates")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator")
+    args = parser.parse_args()
+
+    paths = write_templates(args.directory, args.markets, args.months, args.outlier_density, args.seasonality,
+                            args.forecast_year, args.seed)
+    print(f"Wrote {len(paths)} templates to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,142 +1,260 @@
-import pandas as pd
+import argparse
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
+from uk_forecast_template import TemplateReader, INTRODUCTION, MONTH_NUMBERS, base_year_of, expand_templates
+
+# Forecast files picked up from directories
+EXPORT_PATTERN = '*Forecast*.csv'
+
+SUMMARY_SCENARIOS = ('Conservative', 'Moderate', 'Ambitious')
+
+# Text cells that hold numbers, e.g. "97.56", "39,767,259" or "-1.4%"
+_NUMBER = re.compile(r'[+-]?(?:\d{1,3}(?:,\d{3})+|\d+)?(?:\.(\d+))?')
+_PERCENT = re.compile(r'([+-]?(?:\d{1,3}(?:,\d{3})+|\d+)?(?:\.(\d+))?)%')
+
+def _named_styles():
+    """Shared cell styles, registered once per workbook."""
+    thin = Side(style='thin')
+    header = NamedStyle(
+        name='Header',
+        font=Font(bold=True),
+        fill=PatternFill(start_color="D7E4BC", end_color="D7E4BC", fill_type="solid"),
+        alignment=Alignment(wrap_text=True, vertical="top"),
+        border=Border(left=thin, right=thin, top=thin, bottom=thin)
+    )
+    styles = [header, NamedStyle(name='Thousands', number_format='#,##0')]
+    styles += [
+        NamedStyle(name=f'Percent {decimals}', number_format='0%' if decimals == 0 else f'0.{"0" * decimals}%')
+        for decimals in range(3)
+    ]
+    return styles
+
+def cell_value(text):
+    """
+    Convert the text of a template cell to the value written to Excel.
+    
+    Returns:
+    - Tuple of (value, named style or None); numbers become int/float and
+      percentages become fractions with a percentage format
+    """
+    match = _PERCENT.fullmatch(text)
+    if match and any(c.isdigit() for c in text):
+        decimals = len(match.group(2) or '')
+        return float(match.group(1).replace(',', '')) / 100, f'Percent {min(decimals, 2)}'
+    
+    match = _NUMBER.fullmatch(text)
+    if match and any(c.isdigit() for c in text):
+        number = text.replace(',', '')
+        value = float(number) if match.group(1) is not None else int(number)
+        return value, 'Thousands' if ',' in text else None
+    
+    return text, None
+
+def _append_rows(sheet, rows):
+    """Append rows in bulk; the first row is the header."""
+    for row_idx, cells in enumerate(rows):
+        row = []
+        for text in cells:
+            value, style = (text, 'Header') if row_idx == 0 else cell_value(text)
+            if style is not None:
+                # Only styled cells need a cell object; plain values are appended as is
+                value = WriteOnlyCell(sheet, value=value)
+                value.style = style
+            row.append(value)
+        sheet.append(row)
+
+def forecast_table(reader):
+    """
+    Monthly forecast table of a template.
+    
+    Uses the FORECAST RESULTS section, or the results table of the introduction
+    in files without sections (the 'Month,<year> Actual,...' block).
+    
+    Returns:
+    - DataFrame with Month, the base-year queries and one column per scenario,
+      or None if the file has no forecast table
+    """
+    if 'FORECAST RESULTS' in reader:
+        return reader.forecast_results()
+    
+    rows = reader.rows(INTRODUCTION)
+    for start, header in enumerate(rows):
+        if header[0] != 'Month':
+            continue
+        try:
+            base_year_of(header)
+        except ValueError:
+            continue
+        body = []
+        for cells in rows[start + 1:]:
+            if cells[0] not in MONTH_NUMBERS:
+                break
+            body.append([cells[0]] + [cell_value(text)[0] for text in cells[1:len(header)]])
+        if body:
+            return pd.DataFrame(body, columns=header[:len(body[0])])
+    return None
+
+def summary_rows(table):
+    """
+    Summary metrics of a forecast table, computed column-wise.
+    
+    Returns:
+    - Rows of [Metric, Value] text, with the header row first
+    """
+    rows = [["Metric", "Value"]]
+    if table is None:
+        rows.append(["Forecast results", "Not available"])
+        return rows
+    
+    base_year = base_year_of(table.columns)
+    base_column = next(column for column in table.columns if column.startswith(f'{base_year} '))
+    scenarios = [scenario for scenario in SUMMARY_SCENARIOS if scenario in table.columns]
+    
+    months = table['Month'].to_numpy()
+    base = table[base_column].to_numpy(dtype=float)
+    forecasts = table[scenarios].to_numpy(dtype=float)
+    averages = forecasts.mean(axis=0)
+    growth = averages / base.mean() - 1
+    
+    rows.append([f"Average {base_year} Monthly Queries", f"{base.mean():.2f}"])
+    rows += [[f"{scenario} Forecast Average", f"{average:.2f}"] for scenario, average in zip(scenarios, averages)]
+    rows += [[f"{scenario} YoY Growth", f"{value:.1%}"] for scenario, value in zip(scenarios, growth)]
+    
+    # Peak and highest growth of the central scenario
+    central = table[scenarios[len(scenarios) // 2]].to_numpy(dtype=float)
+    rows.append(["Peak Month", months[np.argmax(central)]])
+    rows.append(["Highest Growth Month", months[np.argmax(central / base - 1)]])
+    return rows
 
-def convert_csv_to_excel(csv_path, excel_path):
+def convert_csv_to_excel(csv_path, excel_path, streaming=True):
     """
     Convert the UK Travel Queries Forecast CSV file to Excel format.
     
+    Rows are appended in bulk with numeric and percentage cells stored as
+    numbers, and the header style is a named style shared by all sheets.
+    
     Args:
         csv_path (str): Path to the CSV file
         excel_path (str): Path where the Excel file will be saved
+        streaming (bool): Use write-only worksheets, which stream rows to the
+            file with bounded memory; set to False for an editable workbook
     """
     print(f"Converting {csv_path} to Excel format...")
     
     # Create a new Excel workbook
-    workbook = openpyxl.Workbook()
-    
-    # Remove the default sheet
-    default_sheet = workbook.active
-    workbook.remove(default_sheet)
+    workbook = openpyxl.Workbook(write_only=streaming)
+    if not streaming:
+        # Remove the default sheet
+        workbook.remove(workbook.active)
     
-    # Read the CSV file
-    with open(csv_path, 'r') as file:
-        content = file.read()
+    for style in _named_styles():
+        workbook.add_named_style(style)
     
-    # Split the content by section markers
-    sections = content.split('====================')
+    # Index the template sections in a single pass
+    reader = TemplateReader(csv_path)
     
     # Process each section
-    for i, section in enumerate(sections):
-        if not section.strip():
+    for section_name in reader.sections:
+        section_content = reader.rows(section_name)
+        if not section_content:
             continue
         
-        # Extract section name and content
-        lines = section.strip().split('\n')
-        
-        # For the first section (header), use "Introduction" as the sheet name
-        if i == 0:
+        # The block before the first section marker becomes the "Introduction" sheet
+        if section_name == INTRODUCTION:
             sheet_name = "Introduction"
-            section_content = lines
         else:
-            # The first line after the section marker is the section name
-            section_name = lines[0].strip()
-            section_content = lines[1:]
             sheet_name = section_name.replace(" ", "_")[:31]  # Excel has a 31 character limit for sheet names
         
         # Create a new sheet
         sheet = workbook.create_sheet(title=sheet_name)
         
-        # Add the content to the sheet
-        for row_idx, line in enumerate(section_content):
-            if line.strip():  # Skip empty lines
-                cells = line.split(',')
-                for col_idx, cell_value in enumerate(cells):
-                    sheet.cell(row=row_idx+1, column=col_idx+1, value=cell_value.strip())
-        
-        # Format the header row
-        header_font = Font(bold=True)
-        header_fill = PatternFill(start_color="D7E4BC", end_color="D7E4BC", fill_type="solid")
-        header_alignment = Alignment(wrap_text=True, vertical="top")
-        header_border = Border(
-            left=Side(style='thin'), 
-            right=Side(style='thin'), 
-            top=Side(style='thin'), 
-            bottom=Side(style='thin')
-        )
-        
-        for cell in sheet[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = header_border
-        
-        # Set column widths
-        for col_idx in range(1, sheet.max_column + 1):
+        # Column widths must be set before rows are streamed
+        max_columns = max(len(cells) for cells in section_content)
+        for col_idx in range(1, max_columns + 1):
             sheet.column_dimensions[get_column_letter(col_idx)].width = 15
+        
+        # Add the content to the sheet
+        _append_rows(sheet, section_content)
     
     # Add a summary sheet
     summary_sheet = workbook.create_sheet(title="Summary")
     
-    # Add summary data
-    summary_data = [
-        ["Metric", "Value"],
-        ["Average 2024 Monthly Queries", "97.56"],
-        ["Conservative Forecast Average", "103.78"],
-        ["Moderate Forecast Average", "109.47"],
-        ["Ambitious Forecast Average", "115.16"],
-        ["Conservative YoY Growth", "6.4%"],
-        ["Moderate YoY Growth", "12.2%"],
-        ["Ambitious YoY Growth", "18.0%"],
-        ["Peak Month", "October"],
-        ["Highest Growth Month", "October"]
-    ]
-    
-    for row_idx, row_data in enumerate(summary_data):
-        for col_idx, cell_value in enumerate(row_data):
-            summary_sheet.cell(row=row_idx+1, column=col_idx+1, value=cell_value)
-    
-    # Format the summary header
-    for cell in summary_sheet[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = header_border
-    
     # Set column widths for summary
     summary_sheet.column_dimensions['A'].width = 30
     summary_sheet.column_dimensions['B'].width = 15
     
+    # Add summary data computed from the forecast results
+    _append_rows(summary_sheet, summary_rows(forecast_table(reader)))
+    
     # Save the workbook
     workbook.save(excel_path)
     
     print(f"Conversion complete. Excel file saved to {excel_path}")
 
+def _convert(csv_path, output_dir=None):
+    directory = output_dir or os.path.dirname(csv_path)
+    excel_path = os.path.join(directory, os.path.basename(csv_path)[:-len('.csv')] + '.xlsx')
+    convert_csv_to_excel(csv_path, excel_path)
+    return excel_path
+
+def convert_files(csv_files, output_dir=None, workers=None):
+    """
+    Convert several CSV files to Excel, one file per worker process.
+    
+    Parameters:
+    - csv_files: Paths of the CSV files
+    - output_dir: Directory of the Excel files (defaults to the directory of each CSV file)
+    - workers: Number of processes (defaults to the CPU count; 1 converts in-process)
+    
+    Returns:
+    - Dict of CSV path -> Excel path of the converted files
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    converted = {}
+    if not csv_files:
+        return converted
+    
+    workers = min(workers or os.cpu_count() or 1, len(csv_files))
+    if workers == 1:
+        for csv_path in csv_files:
+            converted[csv_path] = _convert(csv_path, output_dir)
+        return converted
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_convert, csv_path, output_dir): csv_path for csv_path in csv_files}
+        for future in as_completed(futures):
+            csv_path = futures[future]
+            try:
+                converted[csv_path] = future.result()
+            except Exception as e:
+                print(f"Error converting {csv_path}: {e}")
+    return converted
+
 def main():
     # Get the directory of the current script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
-    # List of CSV files to convert
-    csv_files = [
-        "Travel_Queries_Forecast_UK_Updated.csv",
-        "Travel_Queries_Forecast_UK_Conservative.csv",
-        "Travel_Queries_Forecast_UK_Enhanced.csv",
-        "Travel_Queries_Forecast_UK_Enhanced_Updated.csv",
-        "UK_Travel_Queries_2025_Forecast_Updated.csv"
-    ]
+    parser = argparse.ArgumentParser(description='Convert forecast CSV files to Excel')
+    parser.add_argument('sources', nargs='*', default=[script_dir],
+                        help=f'CSV files, directories or glob patterns (directories match {EXPORT_PATTERN})')
+    parser.add_argument('--output-dir', help='Directory of the Excel files (defaults to next to each CSV file)')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (defaults to the CPU count)')
+    args = parser.parse_args()
     
-    # Convert each CSV file to Excel
-    for csv_file in csv_files:
-        csv_path = os.path.join(script_dir, csv_file)
-        excel_path = os.path.join(script_dir, csv_file.replace(".csv", ".xlsx"))
-        
-        if os.path.exists(csv_path):
-            convert_csv_to_excel(csv_path, excel_path)
-            print(f"{csv_file} conversion complete.")
-        else:
-            print(f"File not found: {csv_path}")
+    csv_files = expand_templates(args.sources, pattern=EXPORT_PATTERN)
+    converted = convert_files(csv_files, output_dir=args.output_dir, workers=args.workers)
+    
+    for csv_path in csv_files:
+        if csv_path in converted:
+            print(f"{os.path.basename(csv_path)} conversion complete.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,69 @@
+"""ARIMA parameter cache and the choice of differencing orders for the order search."""
+
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('statsmodels')
+
+from uk_forecast_arima import ArimaCache, choose_seasonal_differencing, fit_arima, select_arima_order  # noqa: E402
+
+
+def monthly_series(seasonality, months=60, seed=0):
+    """Trending monthly series with a yearly sinusoid of the given amplitude."""
+    rng = np.random.default_rng(seed)
+    steps = np.arange(months)
+    values = 100 + 0.5 * steps + seasonality * np.sin(2 * np.pi * steps / 12) + rng.normal(0, 2, months)
+    return pd.Series(values, index=pd.date_range('2020-01-01', periods=months, freq='MS'))
+
+
+def test_cached_fit_is_rebuilt_from_parameters(tmp_path):
+    series = monthly_series(15)
+    order, seasonal_order = (1, 1, 1), (0, 1, 1, 12)
+    fitted = fit_arima(series, order, seasonal_order, cache=ArimaCache(str(tmp_path)))
+
+    # Only the parameters and criteria are stored
+    (path,) = tmp_path.iterdir()
+    assert os.path.getsize(path) < 2048
+    with open(path, 'rb') as file:
+        assert set(pickle.load(file)) == {'params', 'aic', 'bic'}
+
+    rebuilt = fit_arima(series, order, seasonal_order, cache=ArimaCache(str(tmp_path)))
+    assert rebuilt.aic == pytest.approx(fitted.aic)
+    np.testing.assert_allclose(rebuilt.forecast(12), fitted.forecast(12))
+    np.testing.assert_allclose(rebuilt.get_forecast(12).conf_int(), fitted.get_forecast(12).conf_int())
+
+
+@pytest.mark.parametrize('seasonality, expected', [(15, 1), (0, 0)])
+def test_seasonal_differencing_follows_seasonal_strength(seasonality, expected):
+    assert choose_seasonal_differencing(monthly_series(seasonality)) == expected
+
+
+def test_short_series_are_not_seasonally_differenced():
+    assert choose_seasonal_differencing(monthly_series(15, months=30)) == 0
+
+
+def test_candidates_share_the_differencing_orders():
+    ranking = select_arima_order(monthly_series(15), p_values=(0, 1), q_values=(0, 1), workers=1, cache_dir=None)
+    assert ranking['order'].map(lambda order: order[1]).nunique() == 1
+    assert set(ranking['seasonal_order'].map(lambda order: order[1])) == {1}
+
+
+def test_models_without_a_cache_write_nothing(tmp_path, monkeypatch):
+    from uk_forecast_enhanced_model import EnhancedForecastModel
+
+    monkeypatch.chdir(tmp_path)
+    model = EnhancedForecastModel.from_series(monthly_series(15))
+    model.fit_arima_model()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_fitted_models_are_cached_inside_the_result_cache(tmp_path):
+    from uk_forecast_enhanced_model import EnhancedForecastModel
+
+    model = EnhancedForecastModel.from_series(monthly_series(15), cache_dir=str(tmp_path / 'results'))
+    model.fit_arima_model()
+    assert len(list((tmp_path / 'results' / 'arima').iterdir())) == 1
@@ -0,0 +1,26 @@
+"""Backtests of models built from an in-memory series."""
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_enhanced_model import EnhancedForecastModel
+
+
+def seasonal_model():
+    steps = np.arange(60)
+    values = 100 + 10 * np.sin(2 * np.pi * steps / 12)
+    return EnhancedForecastModel.from_series(
+        pd.Series(values, index=pd.date_range('2020-01-01', periods=60, freq='MS'))
+    )
+
+
+def test_series_without_a_template_use_no_growth():
+    _, metrics = seasonal_model().backtest(models=['seasonal_naive'], step=6, workers=1)
+    # A repeating yearly pattern is forecast exactly by the same month of the previous year
+    assert metrics['MAPE'].max() < 1e-9
+
+
+def test_naive_growth_overrides_the_template():
+    forecasts, _ = seasonal_model().backtest(models=['seasonal_naive'], step=6, naive_growth=0.1, workers=1)
+    first = forecasts[forecasts['Horizon'] == 1]
+    np.testing.assert_allclose(first['Forecast'], first['Actual'] * 1.1)
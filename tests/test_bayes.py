@@ -0,0 +1,26 @@
+"""Reproducibility of the conjugate Bayesian forecast."""
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_enhanced_model import EnhancedForecastModel
+
+
+def model():
+    steps = np.arange(60)
+    values = 100 + 0.5 * steps + 10 * np.sin(2 * np.pi * steps / 12)
+    return EnhancedForecastModel.from_series(
+        pd.Series(values, index=pd.date_range('2020-01-01', periods=60, freq='MS'))
+    )
+
+
+def test_seeded_forecasts_are_reproducible():
+    first = model().bayesian_forecast(backend='conjugate', seasonal=True)
+    second = model().bayesian_forecast(backend='conjugate', seasonal=True)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_seed_changes_the_draws():
+    first = model().bayesian_forecast(backend='conjugate', random_state=1)
+    second = model().bayesian_forecast(backend='conjugate', random_state=2)
+    assert not first.equals(second)
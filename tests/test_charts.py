@@ -0,0 +1,34 @@
+"""Data drawn on the charts of the enhanced model."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+
+import matplotlib.dates as mdates  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+
+from uk_forecast_enhanced_model import EnhancedForecastModel  # noqa: E402
+
+
+def test_outliers_are_drawn_on_the_series_dates(monkeypatch):
+    values = 100 + 10 * np.sin(2 * np.pi * np.arange(60) / 12)
+    values[[20, 45]] = [300, 10]
+    model = EnhancedForecastModel.from_series(
+        pd.Series(values, index=pd.date_range('2020-01-01', periods=60, freq='MS'))
+    )
+    model.detect_outliers()
+
+    figure, ax = plt.subplots()
+    monkeypatch.setattr(model, '_save_figure',
+                        lambda path, stage, draw, *parts, **options: draw(ax, *parts, **options))
+    model.plot_outliers()
+
+    drawn = ax.collections[0].get_offsets()
+    dates = mdates.date2num(model.time_series.index)
+    assert len(drawn) == 2
+    assert dates.min() <= drawn[:, 0].min() and drawn[:, 0].max() <= dates.max()
+    np.testing.assert_allclose(drawn[:, 1], [300, 10])
+    plt.close(figure)
@@ -0,0 +1,23 @@
+"""ARIMAX forecasts from the regressors of a template."""
+
+import os
+
+import pytest
+
+pytest.importorskip('statsmodels')
+
+from uk_forecast_enhanced_model import EnhancedForecastModel  # noqa: E402
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'Travel_Queries_Forecast_UK_Aligned.csv')
+
+
+@pytest.mark.parametrize('order', [(1, 0, 0), (1, 1, 1)])
+def test_forecast_with_and_without_a_trend_constant(order):
+    model = EnhancedForecastModel(TEMPLATE)
+    p, d, q = order
+    model.fit_arimax_model(p=p, d=d, q=q, cache_dir=None)
+
+    forecast = model.forecast_arimax(steps=12)
+    assert len(forecast) == 12
+    assert forecast['ARIMAX_Forecast'].notna().all()
@@ -0,0 +1,65 @@
+"""Streamed outlier scores against scores of a refit on the full history."""
+
+import numpy as np
+import pytest
+
+from uk_forecast_outliers import OutlierDetector, RollingMADDetector, SeasonalDetector, STLResidualDetector
+
+HISTORY = 48
+STREAMED = 12
+
+
+def clean_series(seed=0):
+    """Monthly sinusoid with a slow trend and Gaussian noise, and its calendar months."""
+    rng = np.random.default_rng(seed)
+    steps = np.arange(HISTORY + STREAMED)
+    values = 100 + 0.3 * steps + 15 * np.sin(2 * np.pi * steps / 12) + rng.normal(0, 2, len(steps))
+    return values, steps % 12 + 1
+
+
+def stream(detector, values, months):
+    """Fit the detector on the history and score the remaining months one by one."""
+    detector.fit(values[:HISTORY], months[:HISTORY])
+    return np.array([detector.update(value, month)
+                     for value, month in zip(values[HISTORY:], months[HISTORY:])])
+
+
+@pytest.mark.parametrize('detector', [RollingMADDetector, SeasonalDetector])
+def test_streamed_scores_match_full_fit(detector):
+    values, months = clean_series()
+    refitted = detector().fit(values, months)[HISTORY:]
+    np.testing.assert_allclose(stream(detector(), values, months), refitted)
+
+
+def test_stl_streamed_scores_match_refits():
+    pytest.importorskip('statsmodels')
+    values, months = clean_series()
+    streamed = stream(STLResidualDetector(), values, months)
+
+    # Every streamed month scores as the last month of a refit on the history up to it
+    refitted = [STLResidualDetector().fit(values[:end], months[:end])[-1]
+                for end in range(HISTORY + 1, HISTORY + STREAMED + 1)]
+    np.testing.assert_allclose(streamed, refitted)
+
+    full = STLResidualDetector().fit(values, months)[HISTORY:]
+    assert np.abs(streamed).max() < 3.0
+    assert np.abs(full).max() < 3.0
+
+
+def test_stl_level_shift_is_not_flagged_every_month():
+    pytest.importorskip('statsmodels')
+    values, months = clean_series()
+    values[HISTORY:] += 20
+
+    detector = STLResidualDetector()
+    flags = detector.is_outlier(stream(detector, values, months))
+    assert flags.sum() < STREAMED // 2
+
+
+def test_detectors_must_implement_fit_and_update():
+    class FitOnly(OutlierDetector):
+        def fit(self, values, months):
+            return np.zeros(len(values))
+
+    with pytest.raises(TypeError):
+        FitOnly()
@@ -0,0 +1,21 @@
+"""Memory recorded by the spans of a run profile."""
+
+import numpy as np
+import pytest
+
+from uk_forecast_profile import RunProfile, rss_bytes
+
+pytestmark = pytest.mark.skipif(rss_bytes() is None, reason="the RSS cannot be measured on this platform")
+
+
+def test_span_records_the_growth_of_the_rss():
+    profile = RunProfile('test')
+    with profile.span('allocate'):
+        values = np.ones(32 * 1024 ** 2 // 8)
+    with profile.span('idle'):
+        pass
+
+    stages = profile.stages()
+    assert stages.loc['allocate', 'RSS_Delta_Bytes'] >= values.nbytes * 0.9
+    # A later span is not charged with the memory allocated before it
+    assert abs(stages.loc['idle', 'RSS_Delta_Bytes']) < values.nbytes * 0.1
@@ -1,31 +1,58 @@
-// UK Market Data
-const ukData = {
-    impressions: {
-        '2023': [39266229, 57795441, 100046948, 25065565, 30007835, 20505990, 20370260, 47983271, 22843633, 35095789, 105077019, 151167994],
-        '2024': [39767259, 20577624, 50003357, 109331811, 45176614, 37914837, 56385822, 30416431, 55798934, 111534185, 136058361, 47304711],
-        '2025': [63743254, 70187219, 119431507, 149301104, 96899625, 64959531, 63978941, 63978941, 45474202, 51467010, 100082976, 83358485]
-    },
-    travelQueries: {
-        '2023': [89.36, 73.07, 79.49, 91.35, 76.72, 71.75, 86.36, 86.07, 89.66, 102.53, 90.83, 91.73],
-        '2024': [124.85, 98.80, 99.09, 92.34, 86.94, 82.80, 86.15, 92.83, 99.68, 110.86, 97.25, 99.18],
-        '2025': {
-            'moderate': [140.09, 116.37, 121.81, 97.33, 88.33, 80.16, 84.87, 95.97, 116.99, 141.94, 107.87, 121.92],
-            'conservative': [132.84, 110.31, 115.46, 92.27, 83.75, 75.98, 80.44, 90.96, 110.90, 134.59, 102.26, 115.57],
-            'ambitious': [147.34, 122.43, 128.15, 102.38, 92.92, 84.35, 89.30, 100.97, 123.07, 149.28, 113.49, 128.28]
-        }
-    },
-    flightSearches: {
-        '2023': [10767, 6511, 7372, 6642, 6345, 6479, 9945, 9989, 10744, 11213, 12135, 11526],
-        '2024': [17665, 13368, 15826, 13953, 17633, 17415, 20346, 15218, 22007, 19997, 12760, 15876]
-    },
-    hotelGuests: {
-        '2023': [12304, 13858, 12817, 12797, 11185, 8253, 7009, 9876, 9170, 18296, 17845, 17082],
-        '2024': [14154, 19770, 16710, 19461, 17258, 12160, 13222, 17891, 14968, 24484, 20531, 28534]
+// Dashboard data files written by uk_forecast_dashboard.py
+const DATA_ROOT = 'dashboard_data';
+const DATA_SCHEMA = 1;
+
+// The market and variant can be chosen with ?market=UK&variant=Aligned
+const dashboardParams = new URLSearchParams(window.location.search);
+
+// Base data of the market, and the scenario forecasts fetched so far
+let ukData = null;
+const scenarioData = {};
+
+// Incremented on every queries chart update so that a slow fetch cannot overwrite a newer selection
+let queriesRequest = 0;
+
+async function fetchData(path, version) {
+    // Versioned files can be cached by the browser; the manifest is always revalidated
+    const url = version ? `${DATA_ROOT}/${path}?v=${version}` : `${DATA_ROOT}/${path}`;
+    const response = await fetch(url, version ? {} : { cache: 'no-cache' });
+    if (!response.ok) {
+        throw new Error(`Failed to load ${url}: ${response.status}`);
     }
-};
+    const data = await response.json();
+    if (data.schema !== DATA_SCHEMA) {
+        throw new Error(`Unsupported data schema ${data.schema} in ${url}`);
+    }
+    return data;
+}
 
-// Months labels
-const months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+async function loadMarketData() {
+    const manifest = await fetchData('manifest.json');
+    const marketName = dashboardParams.get('market') || 'UK';
+    const market = manifest.markets[marketName];
+    if (!market) {
+        throw new Error(`No dashboard data for ${marketName}`);
+    }
+    const variantName = dashboardParams.get('variant') || market.default;
+    const variant = market.variants[variantName];
+    if (!variant) {
+        throw new Error(`No dashboard data for ${marketName} ${variantName}`);
+    }
+    ukData = await fetchData(variant.path, variant.version);
+    ukData.directory = variant.path.slice(0, variant.path.lastIndexOf('/') + 1);
+}
+
+function loadScenario(scenario) {
+    // Each scenario is fetched once, the first time it is shown
+    if (!scenarioData[scenario]) {
+        const entry = ukData.scenarios[scenario];
+        scenarioData[scenario] = fetchData(ukData.directory + entry.file, entry.version).catch(error => {
+            delete scenarioData[scenario];
+            throw error;
+        });
+    }
+    return scenarioData[scenario];
+}
 
 // Chart instances
 let queriesChart, impressionsChart, flightsChart, hotelChart;
@@ -126,11 +153,18 @@ const chartConfig = {
 };
 
 // Initialize charts
-document.addEventListener('DOMContentLoaded', function() {
-    initCharts();
+document.addEventListener('DOMContentLoaded', async function() {
     setupTabSwitching();
     setupScenarioButtons();
     setupPrintButton();
+    try {
+        await loadMarketData();
+        initCharts();
+        const active = document.querySelector('.scenario-btn.active');
+        await updateQueriesChart(active ? active.getAttribute('data-scenario') : ukData.defaultScenario);
+    } catch (error) {
+        console.error('Failed to load the dashboard data:', error);
+    }
 });
 
 function initCharts() {
@@ -139,25 +173,9 @@ function initCharts() {
     queriesChart = new Chart(queriesCtx, {
         type: 'line',
         data: {
-            labels: months,
-            datasets: [
-                {
-                    label: '2024 Actual',
-                    data: ukData.travelQueries['2024'],
-                    borderColor: 'rgba(255, 159, 64, 1)',
-                    backgroundColor: 'rgba(255, 159, 64, 0.1)',
-                    borderWidth: 2,
-                    fill: false
-                },
-                {
-                    label: '2025 Moderate',
-                    data: ukData.travelQueries['2025']['moderate'],
-                    borderColor: 'rgba(75, 192, 192, 1)',
-                    backgroundColor: 'rgba(75, 192, 192, 0.1)',
-                    borderWidth: 2,
-                    fill: false
-                }
-            ]
+            labels: ukData.labels,
+            // Filled by updateQueriesChart once the scenario is loaded
+            datasets: []
         },
         options: {
             ...chartConfig,
@@ -165,7 +183,7 @@ function initCharts() {
                 ...chartConfig.plugins,
                 title: {
                     display: true,
-                    text: 'UK Travel Queries Forecast',
+                    text: `${ukData.market} Travel Queries Forecast`,
                     font: {
                         family: "'Inter', sans-serif",
                         size: 16,
@@ -207,32 +225,36 @@ function initCharts() {
         }
     });
     
+    const previousYear = String(ukData.baseYear - 1);
+    const baseYear = String(ukData.baseYear);
+    const forecastYear = String(ukData.forecastYear);
+    
     // Impressions Chart
     const impressionsCtx = document.getElementById('impressions-chart').getContext('2d');
     impressionsChart = new Chart(impressionsCtx, {
         type: 'line',
         data: {
-            labels: months,
+            labels: ukData.labels,
             datasets: [
                 {
-                    label: '2023',
-                    data: ukData.impressions['2023'],
+                    label: previousYear,
+                    data: ukData.impressions[previousYear],
                     borderColor: 'rgba(54, 162, 235, 1)',
                     backgroundColor: 'rgba(54, 162, 235, 0.1)',
                     borderWidth: 2,
                     fill: false
                 },
                 {
-                    label: '2024',
-                    data: ukData.impressions['2024'],
+                    label: baseYear,
+                    data: ukData.impressions[baseYear],
                     borderColor: 'rgba(255, 206, 86, 1)',
                     backgroundColor: 'rgba(255, 206, 86, 0.1)',
                     borderWidth: 2,
                     fill: false
                 },
                 {
-                    label: '2025 (Planned)',
-                    data: ukData.impressions['2025'],
+                    label: `${forecastYear} (Planned)`,
+                    data: ukData.impressions[forecastYear],
                     borderColor: 'rgba(75, 192, 192, 1)',
                     backgroundColor: 'rgba(75, 192, 192, 0.1)',
                     borderWidth: 2,
@@ -246,7 +268,7 @@ function initCharts() {
                 ...chartConfig.plugins,
                 title: {
                     display: true,
-                    text: 'UK Media Impressions',
+                    text: `${ukData.market} Media Impressions`,
                     font: {
                         family: "'Inter', sans-serif",
                         size: 16,
@@ -300,19 +322,19 @@ function initCharts() {
     flightsChart = new Chart(flightsCtx, {
         type: 'line',
         data: {
-            labels: months,
+            labels: ukData.labels,
             datasets: [
                 {
-                    label: '2023',
-                    data: ukData.flightSearches['2023'],
+                    label: previousYear,
+                    data: ukData.flightSearches[previousYear],
                     borderColor: 'rgba(54, 162, 235, 1)',
                     backgroundColor: 'rgba(54, 162, 235, 0.1)',
                     borderWidth: 2,
                     fill: false
                 },
                 {
-                    label: '2024',
-                    data: ukData.flightSearches['2024'],
+                    label: baseYear,
+                    data: ukData.flightSearches[baseYear],
                     borderColor: 'rgba(255, 159, 64, 1)',
                     backgroundColor: 'rgba(255, 159, 64, 0.1)',
                     borderWidth: 2,
@@ -326,7 +348,7 @@ function initCharts() {
                 ...chartConfig.plugins,
                 title: {
                     display: true,
-                    text: 'UK Flight Searches',
+                    text: `${ukData.market} Flight Searches`,
                     font: {
                         family: "'Inter', sans-serif",
                         size: 16,
@@ -373,19 +395,19 @@ function initCharts() {
     hotelChart = new Chart(hotelCtx, {
         type: 'line',
         data: {
-            labels: months,
+            labels: ukData.labels,
             datasets: [
                 {
-                    label: '2023',
-                    data: ukData.hotelGuests['2023'],
+                    label: previousYear,
+                    data: ukData.hotelGuests[previousYear],
                     borderColor: 'rgba(54, 162, 235, 1)',
                     backgroundColor: 'rgba(54, 162, 235, 0.1)',
                     borderWidth: 2,
                     fill: false
                 },
                 {
-                    label: '2024',
-                    data: ukData.hotelGuests['2024'],
+                    label: baseYear,
+                    data: ukData.hotelGuests[baseYear],
                     borderColor: 'rgba(255, 159, 64, 1)',
                     backgroundColor: 'rgba(255, 159, 64, 0.1)',
                     borderWidth: 2,
@@ -399,7 +421,7 @@ function initCharts() {
                 ...chartConfig.plugins,
                 title: {
                     display: true,
-                    text: 'UK Hotel Guests',
+                    text: `${ukData.market} Hotel Guests`,
                     font: {
                         family: "'Inter', sans-serif",
                         size: 16,
@@ -474,43 +496,53 @@ function setupScenarioButtons() {
     });
 }
 
-function updateQueriesChart(scenario) {
-    // Clear existing datasets
-    queriesChart.data.datasets = [];
+async function updateQueriesChart(scenario) {
+    if (!ukData) {
+        return;
+    }
+    const request = ++queriesRequest;
+    const previousYear = String(ukData.baseYear - 1);
+    const baseYear = String(ukData.baseYear);
+    const datasets = [];
     
     if (scenario === 'actual') {
-        // Show 2023 and 2024 actual data
-        queriesChart.data.datasets.push({
-            label: '2023 Actual',
-            data: ukData.travelQueries['2023'],
+        // Show the previous and base year actual data
+        datasets.push({
+            label: `${previousYear} Actual`,
+            data: ukData.travelQueries[previousYear],
             borderColor: 'rgba(54, 162, 235, 1)',
             backgroundColor: 'rgba(54, 162, 235, 0.1)',
             borderWidth: 2,
             fill: false
         });
         
-        queriesChart.data.datasets.push({
-            label: '2024 Actual',
-            data: ukData.travelQueries['2024'],
+        datasets.push({
+            label: `${baseYear} Actual`,
+            data: ukData.travelQueries[baseYear],
             borderColor: 'rgba(255, 159, 64, 1)',
             backgroundColor: 'rgba(255, 159, 64, 0.1)',
             borderWidth: 2,
             fill: false
         });
     } else {
-        // Show 2024 actual and 2025 forecast for selected scenario
-        queriesChart.data.datasets.push({
-            label: '2024 Actual',
-            data: ukData.travelQueries['2024'],
+        // Show base year actual and the forecast of the selected scenario, fetched on first use
+        const forecast = await loadScenario(scenario);
+        if (request !== queriesRequest) {
+            return;
+        }
+        
+        datasets.push({
+            label: `${baseYear} Actual`,
+            data: ukData.travelQueries[baseYear],
             borderColor: 'rgba(255, 159, 64, 1)',
             backgroundColor: 'rgba(255, 159, 64, 0.1)',
             borderWidth: 2,
             fill: false
         });
         
-        queriesChart.data.datasets.push({
-            label: `2025 ${scenario.charAt(0).toUpperCase() + scenario.slice(1)}`,
-            data: ukData.travelQueries['2025'][scenario],
+        datasets.push({
+            label: `${forecast.year} ${forecast.label}`,
+            data: forecast.values,
             borderColor: 'rgba(75, 192, 192, 1)',
             backgroundColor: 'rgba(75, 192, 192, 0.1)',
             borderWidth: 2,
@@ -519,6 +551,7 @@ function updateQueriesChart(scenario) {
     }
     
     // Update chart
+    queriesChart.data.datasets = datasets;
     queriesChart.update();
 }
 
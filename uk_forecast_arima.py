@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Automatic ARIMA Order Selection
+
+Evaluates a grid of non-seasonal (p, d, q) and seasonal (P, D, Q, 12) orders
+for a monthly series in parallel worker processes and ranks the candidates by
+AIC or BIC. The differencing orders are fixed before the search: the seasonal
+order D by the strength of the seasonal component (the rule of nsdiffs in
+R's forecast package), then d by the ADF test on the seasonally differenced series.
+Likelihoods of series differenced differently are not comparable, so only
+candidates with the same d and D are ranked against each other.
+
+The estimated parameters and information criteria of every fit are cached on
+disk, keyed by a hash of the series and the order, so rerunning the search
+(or refitting the winning order) on unchanged data does not refit anything: a
+cached model is rebuilt by running the Kalman smoother with its parameters,
+which takes milliseconds. The cache is a size-bounded ResultCache holding a
+few hundred bytes per fit.
+
+When new months are appended to a series, extend_arima runs the fitted
+state-space model forward over them with the estimated parameters, which is
+far cheaper than refitting.
+
+Usage:
+    from uk_forecast_arima import select_arima_order, fit_arima
+
+    ranking = select_arima_order(series)
+    best = ranking.iloc[0]
+    results = fit_arima(series, best['order'], best['seasonal_order'])
+
+    # A new month arrives: filter it through the fitted model without refitting
+    results = extend_arima(results, new_month)
+"""
+
+import hashlib
+import itertools
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_cache import DEFAULT_MAX_BYTES, ResultCache
+
+DEFAULT_CACHE_DIR = os.path.join('.forecast_cache', 'arima')
+
+# Seasonal period of the monthly series
+SEASONAL_PERIOD = 12
+
+# Seasonal strength above which the series is seasonally differenced
+SEASONAL_STRENGTH_THRESHOLD = 0.64
+
+# Layout version of the cache entries; part of the key so older entries are not read
+_ENTRY_VERSION = 'params-1'
+
+
+def series_key(series):
+    """Hash of the values and dates of a series."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(series.to_numpy(dtype=float)).tobytes())
+    digest.update(np.ascontiguousarray(series.index.asi8).tobytes())
+    return digest.hexdigest()
+
+
+class ArimaCache(ResultCache):
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Cache of the parameters and information criteria of fitted ARIMA models.
+
+        Parameters:
+        - directory: Directory for the cached entries, or None to keep them in memory only
+        - max_bytes: Size limit of the directory
+        """
+        super().__init__(directory, max_bytes)
+
+    def key(self, series, order, seasonal_order, exog=None):
+        """Cache key for a series, exogenous regressors, model order and statsmodels version."""
+        import statsmodels
+
+        regressors = '' if exog is None else super().key(exog)
+        digest = hashlib.sha256(
+            f"{series_key(series)}|{regressors}|{order}|{seasonal_order}|{statsmodels.__version__}|{_ENTRY_VERSION}"
+            .encode()
+        )
+        return f"{'-'.join(map(str, order))}_{'-'.join(map(str, seasonal_order))}_{digest.hexdigest()[:32]}"
+
+
+def choose_differencing(series, max_d=2, alpha=0.05):
+    """
+    Smallest differencing order for which the ADF test rejects a unit root.
+
+    Parameters:
+    - series: Time series
+    - max_d: Largest differencing order to consider
+    - alpha: Significance level of the ADF test
+
+    Returns:
+    - Differencing order d
+    """
+    from statsmodels.tsa.stattools import adfuller
+
+    values = series.to_numpy(dtype=float)
+    for d in range(max_d + 1):
+        if len(values) < 8:
+            return d
+        p_value = adfuller(values, autolag='AIC')[1]
+        if p_value < alpha:
+            return d
+        values = np.diff(values)
+    return max_d
+
+
+def seasonal_strength(series, period=SEASONAL_PERIOD):
+    """
+    Strength of the seasonal component of an STL decomposition, between 0 and 1.
+
+    1 - Var(remainder) / Var(seasonal + remainder), as defined by Wang, Smith and Hyndman.
+    """
+    from statsmodels.tsa.seasonal import STL
+
+    decomposition = STL(series.to_numpy(dtype=float), period=period).fit()
+    remainder = np.asarray(decomposition.resid)
+    detrended = remainder + np.asarray(decomposition.seasonal)
+    return max(0.0, 1 - np.var(remainder) / np.var(detrended)) if np.var(detrended) > 0 else 0.0
+
+
+def choose_seasonal_differencing(series, period=SEASONAL_PERIOD, threshold=SEASONAL_STRENGTH_THRESHOLD):
+    """
+    Seasonal differencing order D: 1 when the seasonal strength exceeds the threshold.
+
+    Series shorter than three full seasons are not seasonally differenced.
+    """
+    if len(series) < 3 * period:
+        return 0
+    return int(seasonal_strength(series, period) > threshold)
+
+
+def candidate_orders(p_values=(0, 1, 2), d_values=(0, 1, 2), q_values=(0, 1, 2),
+                     seasonal_p_values=(0, 1), seasonal_d_values=(0, 1), seasonal_q_values=(0, 1),
+                     period=SEASONAL_PERIOD):
+    """Cartesian grid of (order, seasonal_order) pairs."""
+    orders = itertools.product(p_values, d_values, q_values)
+    seasonal_orders = [
+        (P, D, Q, period if (P, D, Q) != (0, 0, 0) else 0)
+        for P, D, Q in itertools.product(seasonal_p_values, seasonal_d_values, seasonal_q_values)
+    ]
+    return [(order, seasonal_order) for order, seasonal_order in itertools.product(orders, seasonal_orders)]
+
+
+def fit_arima(series, order=(1, 1, 1), seasonal_order=(0, 0, 0, 0), cache=None, exog=None, **fit_options):
+    """
+    Fit an ARIMA model, reusing the cached parameters for the same series and order.
+
+    On a cache hit the results are rebuilt by running the Kalman smoother with
+    the cached parameters, without estimating anything.
+
+    Parameters:
+    - series: Time series with a monthly DatetimeIndex
+    - order: (p, d, q)
+    - seasonal_order: (P, D, Q, s)
+    - cache: ArimaCache instance, or None to always fit
+    - exog: Optional DataFrame of regressors aligned with series (regression with ARIMA errors)
+    - fit_options: Keyword arguments passed to ARIMA.fit (only used when fitting)
+
+    Returns:
+    - Fitted ARIMAResults
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    order = tuple(int(value) for value in order)
+    seasonal_order = tuple(int(value) for value in seasonal_order)
+
+    key = None
+    entry = None
+    if cache is not None:
+        key = cache.key(series, order, seasonal_order, exog)
+        entry = cache.get(key)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        series = series.asfreq('MS') if series.index.freq is None else series
+        if exog is not None and exog.index.freq is None:
+            exog = exog.asfreq('MS')
+        model = ARIMA(series, exog=exog, order=order, seasonal_order=seasonal_order)
+        if entry is not None:
+            return model.smooth(entry['params'])
+        results = model.fit(**fit_options)
+
+    if cache is not None:
+        cache.put(key, _cache_entry(results))
+    return results
+
+
+def _cache_entry(results):
+    """The parameters and information criteria of a fit, as stored in an ArimaCache."""
+    return {
+        'params': results.params.to_numpy(dtype=float),
+        'aic': float(results.aic),
+        'bic': float(results.bic)
+    }
+
+
+def extend_arima(results, new_observations, refit=False, **fit_options):
+    """
+    Extend a fitted ARIMA model with observations that follow its sample.
+
+    The Kalman filter is run forward over the new observations with the
+    estimated parameters, so the state, forecasts and intervals reflect the
+    new data without re-estimating anything.
+
+    Parameters:
+    - results: Fitted ARIMAResults
+    - new_observations: Series continuing the monthly index of the fitted series
+    - refit: Re-estimate the parameters on the extended sample instead, starting from the current estimates
+    - fit_options: Keyword arguments passed to ARIMA.fit when refitting
+
+    Returns:
+    - ARIMAResults for the extended sample
+    """
+    if len(new_observations) == 0:
+        return results
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if new_observations.index.freq is None:
+            new_observations = new_observations.asfreq('MS')
+        if refit:
+            fit_options.setdefault('start_params', results.params)
+        return results.append(new_observations, refit=refit, fit_kwargs=fit_options or None)
+
+
+def _evaluate_candidate(task):
+    """Fit one candidate order in a worker process and return its criteria."""
+    series, order, seasonal_order, cache_dir = task
+    cache = ArimaCache(cache_dir) if cache_dir is not None else None
+    try:
+        # Ranking needs the criteria only, so cached candidates are not rebuilt
+        entry = cache.get(cache.key(series, order, seasonal_order)) if cache is not None else None
+        if entry is None:
+            entry = _cache_entry(fit_arima(series, order, seasonal_order, cache=cache))
+        return {
+            'order': order,
+            'seasonal_order': seasonal_order,
+            'aic': entry['aic'],
+            'bic': entry['bic'],
+            'error': None
+        }
+    except Exception as e:
+        return {'order': order, 'seasonal_order': seasonal_order,
+                'aic': np.nan, 'bic': np.nan, 'error': str(e)}
+
+
+def select_arima_order(series, p_values=(0, 1, 2), q_values=(0, 1, 2),
+                       seasonal_p_values=(0, 1), seasonal_q_values=(0, 1),
+                       d=None, D=None, criterion='aic', workers=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Grid search of ARIMA orders ranked by an information criterion.
+
+    Parameters:
+    - series: Time series with a monthly DatetimeIndex
+    - p_values, q_values: Non-seasonal AR and MA orders to try
+    - seasonal_p_values, seasonal_q_values: Seasonal AR and MA orders to try
+    - d: Differencing order; chosen with the ADF test when None
+    - D: Seasonal differencing order; chosen by the seasonal strength when None
+    - criterion: 'aic' or 'bic'
+    - workers: Number of worker processes (defaults to the number of cores, 1 runs in-process)
+    - cache_dir: Directory of the fitted-results cache, or None to disable it
+
+    Returns:
+    - DataFrame of candidates sorted by the criterion, best first
+    """
+    if criterion not in ('aic', 'bic'):
+        raise ValueError(f"Unknown information criterion: {criterion}")
+
+    # Both differencing orders are fixed first, so every candidate's likelihood
+    # is computed on the same differenced series
+    if D is None:
+        D = choose_seasonal_differencing(series)
+    if d is None:
+        # A seasonally differenced series is differenced at most once more
+        differenced = series.diff(SEASONAL_PERIOD).dropna() if D else series
+        d = choose_differencing(differenced, max_d=2 - D)
+
+    candidates = candidate_orders(
+        p_values, (d,), q_values,
+        seasonal_p_values, (D,), seasonal_q_values
+    )
+    tasks = [(series, order, seasonal_order, cache_dir) for order, seasonal_order in candidates]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        rows = [_evaluate_candidate(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(_evaluate_candidate, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+    ranking = pd.DataFrame(rows)
+    ranking = ranking.sort_values(criterion, na_position='last').reset_index(drop=True)
+    return ranking
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Rolling-Origin Backtesting for the Travel Queries Forecast Models
+
+Measures forecast accuracy on the HISTORICAL QUERIES series with expanding or
+rolling-window cross-validation. For every forecast origin each model is fitted
+on the data up to the origin and forecasts the following months, which are then
+compared with the actuals. Folds run in parallel worker processes.
+
+Models:
+- arima: ARIMA/seasonal ARIMA, warm-started from a fit on the first training window
+- prophet: Facebook Prophet (skipped when it is not installed)
+- bayesian: conjugate Bayesian AR(1) with simulated forecast paths
+- seasonal_naive: same month of the previous year grown by the template's base
+  growth factor. This is a baseline, not the template's factor model: the media,
+  flight and brand factors are only known for the template's base year, so they
+  cannot be refitted on each fold
+
+Metrics are reported per model and forecast horizon: MAPE, sMAPE, MASE (scaled
+by the in-sample seasonal naive error) and the coverage of the 95% intervals.
+
+Usage:
+    python uk_forecast_backtest.py Travel_Queries_Forecast_UK_Aligned.csv
+"""
+
+import argparse
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_arima import fit_arima
+from uk_forecast_bayes import sample_ar1_posterior, simulate_ar_paths
+from uk_forecast_prophet import fit_prophet, prophet_forecast
+
+BACKTEST_MODELS = ('arima', 'prophet', 'bayesian', 'seasonal_naive')
+
+# Seasonal period used by the seasonal naive baseline and the MASE scale
+SEASONAL_PERIOD = 12
+
+
+def rolling_origin_folds(n_observations, initial=36, horizon=12, step=1, window='expanding'):
+    """
+    Training ranges for rolling-origin cross-validation.
+
+    Parameters:
+    - n_observations: Length of the series
+    - initial: Size of the first training window
+    - horizon: Number of months forecast from each origin
+    - step: Months between consecutive origins
+    - window: 'expanding' (training always starts at the first month) or 'rolling' (fixed size)
+
+    Returns:
+    - List of (train_start, train_end) positions; the test months follow train_end
+    """
+    if window not in ('expanding', 'rolling'):
+        raise ValueError(f"Unknown backtest window: {window}")
+    if initial >= n_observations:
+        raise ValueError(f"Initial window of {initial} months leaves no test data in {n_observations} months")
+
+    folds = []
+    for train_end in range(initial, n_observations, step):
+        train_start = 0 if window == 'expanding' else train_end - initial
+        folds.append((train_start, train_end))
+    return folds
+
+
+def _mase_scale(train):
+    """Mean absolute error of the seasonal naive forecast on the training data."""
+    lag = SEASONAL_PERIOD if len(train) > SEASONAL_PERIOD else 1
+    return float(np.mean(np.abs(train[lag:] - train[:-lag])))
+
+
+def _forecast_arima(train, horizon, order, seasonal_order, start_params):
+    # Warm start the optimiser from the parameters of the reference fit
+    results = fit_arima(train, order, seasonal_order, start_params=start_params)
+    prediction = results.get_forecast(steps=horizon)
+    interval = np.asarray(prediction.conf_int(alpha=0.05))
+    return np.asarray(prediction.predicted_mean), interval[:, 0], interval[:, 1]
+
+
+def _forecast_prophet(train, horizon):
+    if importlib.util.find_spec('prophet') is None:
+        return None
+
+    # Folds share the Stan backend of their worker process
+    forecast = prophet_forecast(fit_prophet(train), periods=horizon)
+    return (forecast['Prophet_Forecast'].to_numpy(), forecast['Lower_CI'].to_numpy(),
+            forecast['Upper_CI'].to_numpy())
+
+
+def _forecast_bayesian(train, horizon, samples, seed):
+    posterior = sample_ar1_posterior(train.to_numpy(), draws=samples, random_state=seed)
+    paths = simulate_ar_paths(
+        posterior['alpha'], posterior['beta'], posterior['sigma'], train.iloc[-1], horizon,
+        random_state=seed
+    )
+    lower, upper = np.quantile(paths, [0.025, 0.975], axis=0)
+    return paths.mean(axis=0), lower, upper
+
+
+def _forecast_seasonal_naive(train, horizon, growth):
+    values = train.to_numpy()
+    if len(values) < SEASONAL_PERIOD:
+        return None
+    # Same month of the previous year, repeated for horizons beyond one year
+    last_year = values[-SEASONAL_PERIOD:]
+    steps = np.arange(horizon)
+    forecast = last_year[steps % SEASONAL_PERIOD] * (1 + growth) ** (steps // SEASONAL_PERIOD + 1)
+    no_interval = np.full(horizon, np.nan)
+    return forecast, no_interval, no_interval
+
+
+def _run_fold(task):
+    """Fit every model on one training window and score the forecasts."""
+    series, (train_start, train_end), options = task
+    train = series.iloc[train_start:train_end]
+    actual = series.iloc[train_end:train_end + options['horizon']]
+    horizon = len(actual)
+    scale = _mase_scale(train.to_numpy())
+
+    rows = []
+    for model in options['models']:
+        try:
+            if model == 'arima':
+                result = _forecast_arima(
+                    train, horizon, options['arima_order'], options['seasonal_order'], options['start_params']
+                )
+            elif model == 'prophet':
+                result = _forecast_prophet(train, horizon)
+            elif model == 'bayesian':
+                result = _forecast_bayesian(train, horizon, options['samples'], seed=train_end)
+            else:
+                result = _forecast_seasonal_naive(train, horizon, options['naive_growth'])
+        except Exception as e:
+            print(f"Error fitting {model} at origin {series.index[train_end - 1]:%Y-%m}: {e}")
+            result = None
+
+        if result is None:
+            continue
+
+        forecast, lower, upper = result
+        rows.append(pd.DataFrame({
+            'Model': model,
+            'Origin': series.index[train_end - 1],
+            'Date': actual.index,
+            'Horizon': np.arange(1, horizon + 1),
+            'Actual': actual.to_numpy(),
+            'Forecast': forecast[:horizon],
+            'Lower_CI': lower[:horizon],
+            'Upper_CI': upper[:horizon],
+            'Scale': scale
+        }))
+    return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+
+
+def score_forecasts(forecasts):
+    """
+    Accuracy metrics per model and forecast horizon.
+
+    Parameters:
+    - forecasts: DataFrame of fold forecasts as produced by backtest
+
+    Returns:
+    - DataFrame indexed by (Model, Horizon) with MAPE, sMAPE, MASE, Coverage and Folds
+    """
+    errors = forecasts['Forecast'] - forecasts['Actual']
+    scored = pd.DataFrame({
+        'Model': forecasts['Model'],
+        'Horizon': forecasts['Horizon'],
+        'APE': 100 * np.abs(errors) / np.abs(forecasts['Actual']),
+        'sAPE': 200 * np.abs(errors) / (np.abs(forecasts['Actual']) + np.abs(forecasts['Forecast'])),
+        'ASE': np.abs(errors) / forecasts['Scale'],
+        # Coverage is undefined for models without intervals
+        'Covered': ((forecasts['Actual'] >= forecasts['Lower_CI']) &
+                    (forecasts['Actual'] <= forecasts['Upper_CI'])).where(forecasts['Lower_CI'].notna())
+    })
+    metrics = scored.groupby(['Model', 'Horizon']).agg(
+        MAPE=('APE', 'mean'),
+        sMAPE=('sAPE', 'mean'),
+        MASE=('ASE', 'mean'),
+        Coverage=('Covered', 'mean'),
+        Folds=('APE', 'size')
+    )
+    return metrics
+
+
+def backtest(series, models=BACKTEST_MODELS, initial=36, horizon=12, step=1, window='expanding',
+             arima_order=(1, 1, 1), seasonal_order=(0, 0, 0, 0), naive_growth=0.05,
+             samples=1000, workers=None):
+    """
+    Rolling-origin backtest of the forecast models.
+
+    Parameters:
+    - series: Monthly time series with a DatetimeIndex
+    - models: Models to evaluate, from BACKTEST_MODELS
+    - initial, horizon, step, window: Fold layout, see rolling_origin_folds
+    - arima_order, seasonal_order: ARIMA orders
+    - naive_growth: Annual growth applied by the seasonal naive baseline
+    - samples: Posterior draws for the Bayesian model
+    - workers: Number of worker processes (defaults to the number of cores, 1 runs in-process)
+
+    Returns:
+    - Tuple of (fold forecasts DataFrame, metrics DataFrame from score_forecasts)
+    """
+    unknown = set(models) - set(BACKTEST_MODELS)
+    if unknown:
+        raise ValueError(f"Unknown backtest models: {', '.join(sorted(unknown))}")
+
+    series = series.asfreq('MS') if series.index.freq is None else series
+    folds = rolling_origin_folds(len(series), initial, horizon, step, window)
+
+    # Fit the first window once; its parameters warm start every ARIMA fold
+    start_params = None
+    if 'arima' in models:
+        first_start, first_end = folds[0]
+        reference = fit_arima(series.iloc[first_start:first_end], arima_order, seasonal_order)
+        start_params = np.asarray(reference.params)
+
+    options = {
+        'models': tuple(models),
+        'horizon': horizon,
+        'arima_order': tuple(arima_order),
+        'seasonal_order': tuple(seasonal_order),
+        'start_params': start_params,
+        'naive_growth': naive_growth,
+        'samples': samples
+    }
+    tasks = [(series, fold, options) for fold in folds]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        results = [_run_fold(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_fold, tasks))
+
+    forecasts = pd.concat([result for result in results if not result.empty], ignore_index=True)
+    return forecasts, score_forecasts(forecasts)
+
+
+def main():
+    """Main function to run the backtest."""
+    from uk_forecast_enhanced_model import EnhancedForecastModel
+
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the travel queries forecast models.")
+    parser.add_argument('template', nargs='?', default='Travel_Queries_Forecast_UK_Aligned.csv',
+                        help="Forecast template CSV")
+    parser.add_argument('--models', nargs='+', default=list(BACKTEST_MODELS), choices=BACKTEST_MODELS)
+    parser.add_argument('--initial', type=int, default=36, help="Size of the first training window")
+    parser.add_argument('--horizon', type=int, default=12, help="Months forecast from each origin")
+    parser.add_argument('--step', type=int, default=1, help="Months between origins")
+    parser.add_argument('--window', choices=('expanding', 'rolling'), default='expanding')
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('--output', default='uk_backtest_metrics.csv', help="Path of the metrics table")
+    args = parser.parse_args()
+
+    model = EnhancedForecastModel(args.template)
+    print("Running backtest...")
+    forecasts, metrics = model.backtest(
+        models=args.models, initial=args.initial, horizon=args.horizon,
+        step=args.step, window=args.window, workers=args.workers
+    )
+
+    print(metrics.groupby('Model')[['MAPE', 'sMAPE', 'MASE', 'Coverage']].mean().round(3))
+    metrics.to_csv(args.output)
+    print(f"Metrics saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
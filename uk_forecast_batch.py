@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Batch Multi-Market Travel Queries Forecast
+
+Runs the enhanced forecast model over many forecast templates at once. Every
+template (Travel_Queries_Forecast_<MARKET>[_<VARIANT>].csv) gets its own
+EnhancedForecastModel, and the models are fitted in a process pool sized to
+the number of cores on the host. The per-market comparison tables are combined
+into one consolidated results table.
+
+With --incremental, the fitted models of every market are kept in the result
+cache. When a template only gains new months of HISTORICAL QUERIES, the stored
+ARIMA model is extended with them instead of being refitted (a full refit
+happens every --refit-every months).
+
+With --report, every market records the time and memory of its stages, and
+the reports are combined into one JSON run report (see uk_forecast_profile).
+
+Usage:
+    python uk_forecast_batch.py                       # all templates in this directory
+    python uk_forecast_batch.py Markets/              # all templates in a directory
+    python uk_forecast_batch.py "Markets/*/Travel_Queries_Forecast_*.csv" --workers 8
+    python uk_forecast_batch.py Markets/ --incremental     # monthly refresh: extend the fitted models
+    python uk_forecast_batch.py Markets/ --report run_report.json --profile cprofile
+"""
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import uk_forecast_enhanced_model as enhanced
+from uk_forecast_cache import DEFAULT_CACHE_DIR, ResultCache, file_digest, library_versions, model_cache_dir
+from uk_forecast_charts import chart_path
+from uk_forecast_profile import PROFILERS, RunProfile, aggregate_reports, profile_span, write_report
+from uk_forecast_series import MonthlySeries
+from uk_forecast_store import ResultsStore, comparison_frames
+from uk_forecast_template import expand_templates
+
+_TEMPLATE_NAME = re.compile(r'Travel_Queries_Forecast_(?P<market>[^_]+)(?:_(?P<variant>.+))?')
+
+
+def market_of(csv_path):
+    """
+    Derive the market and scenario variant from a template file name.
+
+    Travel_Queries_Forecast_UK_Aligned.csv -> ('UK', 'Aligned')
+    Travel_Queries_Forecast_UK.csv         -> ('UK', 'Base')
+    """
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    match = _TEMPLATE_NAME.fullmatch(stem)
+    if match is None:
+        return stem, 'Base'
+    return match.group('market'), match.group('variant') or 'Base'
+
+
+def run_market(csv_path, outlier_method='zscore', outlier_threshold=3.0,
+               arima_order=(1, 1, 1), steps=12, use_prophet=True, use_bayesian=True, use_arimax=True,
+               chart_dir=None, cache_dir=None, incremental=False, refit_every=12, run_profile=None):
+    """
+    Run detection, forecasting and comparison for a single template.
+
+    This is the unit of work executed in each worker process. The per-model
+    CSV files are not written because their file names are shared between
+    markets; with a chart directory, the outlier and forecast charts are
+    rendered to <chart_dir>/<market>/<variant>/ in the worker.
+
+    With a cache directory, the comparison table of a template whose contents
+    and options are unchanged is loaded from the cache without fitting anything.
+    With incremental set as well, a template that only gained new months
+    updates the market's stored model instead of fitting from scratch.
+
+    With a RunProfile, the stages of the model are recorded in it.
+
+    Returns:
+    - DataFrame with the comparison table and Market, Variant, Source columns
+    """
+    options = (outlier_method, outlier_threshold, arima_order, steps, use_prophet, use_bayesian, use_arimax,
+               chart_dir, cache_dir)
+    if cache_dir is None:
+        return _forecast_market(csv_path, *options, profile=run_profile)
+
+    cache = ResultCache(cache_dir)
+    versions = library_versions('numpy', 'pandas', 'scipy', 'statsmodels', 'prophet', 'pymc3')
+    key = cache.key('market', file_digest(csv_path), os.path.basename(csv_path), options[:-1], versions)
+    if not incremental:
+        with profile_span(run_profile, 'cached_market'):
+            return cache.get_or_compute(key, lambda: _forecast_market(csv_path, *options, profile=run_profile))
+
+    # The fitted model of the market is kept under a key that ignores the template contents
+    state_key = cache.key('market_state', os.path.abspath(csv_path), options[:-1], versions)
+    with profile_span(run_profile, 'cached_market'):
+        return cache.get_or_compute(
+            key, lambda: _update_market(csv_path, cache, state_key, refit_every, *options, profile=run_profile)
+        )
+
+
+def _update_market(csv_path, cache, state_key, refit_every, outlier_method, outlier_threshold,
+                   arima_order, steps, use_prophet, use_bayesian, use_arimax, chart_dir, cache_dir, profile=None):
+    """Update the stored model of a market with new months, or fit it if the history was revised."""
+    model = cache.get(state_key)
+    if model is not None and _extends_history(model, csv_path):
+        model.cache = ResultCache(cache_dir)
+        model.profile = profile
+        model.update(steps=steps, refit_every=refit_every)
+        _forecast_others(model, steps, use_prophet, use_bayesian, cache_dir)
+    else:
+        model = _fit_market(csv_path, outlier_method, outlier_threshold, arima_order, steps,
+                            use_prophet, use_bayesian, use_arimax, cache_dir, profile)
+    comparison = _comparison_table(model, csv_path, chart_dir)
+    cache.put(state_key, model)
+    return comparison
+
+
+def _extends_history(model, csv_path):
+    """Whether the template's history is the model's history followed by new months."""
+    history = MonthlySeries.from_frame(enhanced.TemplateReader(csv_path).historical_queries())
+    return history.extends(model.series)
+
+
+def _forecast_market(csv_path, outlier_method, outlier_threshold, arima_order, steps,
+                     use_prophet, use_bayesian, use_arimax, chart_dir, cache_dir, profile=None):
+    """Fit the models for one template and build its comparison table."""
+    model = _fit_market(csv_path, outlier_method, outlier_threshold, arima_order, steps,
+                        use_prophet, use_bayesian, use_arimax, cache_dir, profile)
+    return _comparison_table(model, csv_path, chart_dir)
+
+
+def _fit_market(csv_path, outlier_method, outlier_threshold, arima_order, steps,
+                use_prophet, use_bayesian, use_arimax, cache_dir, profile=None):
+    """Fit every model of one template."""
+    model = enhanced.EnhancedForecastModel(csv_path, cache_dir=cache_dir, profile=profile)
+
+    model.detect_outliers(method=outlier_method, threshold=outlier_threshold)
+    model.adjust_outliers(method='median_window', window_size=3)
+
+    # The fitted-model caches live inside the run's cache directory, so --no-cache disables them too
+    p, d, q = arima_order
+    model.fit_arima_model(p=p, d=d, q=q, cache_dir=model_cache_dir(cache_dir, 'arima'))
+    model.forecast_arima(steps=steps)
+
+    # Templates without the regressor sections only get the univariate models
+    if use_arimax and any(section in model.template for section, _ in enhanced.REGRESSORS.values()):
+        model.fit_arimax_model(p=p, d=d, q=q, cache_dir=model_cache_dir(cache_dir, 'arima'))
+        model.forecast_arimax(steps=steps)
+
+    _forecast_others(model, steps, use_prophet, use_bayesian, cache_dir)
+    return model
+
+
+def _forecast_others(model, steps, use_prophet, use_bayesian, cache_dir):
+    """Fit the Prophet and Bayesian forecasts, which have no incremental update."""
+    if use_prophet and enhanced.prophet_available:
+        model.fit_prophet_model(cache_dir=model_cache_dir(cache_dir, 'prophet'))
+        model.forecast_prophet(periods=steps)
+
+    if use_bayesian:
+        model.bayesian_forecast(periods=steps)
+
+
+def _comparison_table(model, csv_path, chart_dir=None):
+    """Comparison table of a fitted model with the Market, Variant and Source columns."""
+    market, variant = market_of(csv_path)
+
+    comparison = model.compare_with_factor_model(csv_path)
+    if chart_dir is not None:
+        model.plot_outliers(chart_path(chart_dir, market, variant, 'outliers'), market=market)
+        model.plot_forecasts(chart_path(chart_dir, market, variant, 'forecast_comparison'), market=market)
+
+    comparison.index.name = 'Date'
+    comparison = comparison.reset_index()
+    comparison.insert(0, 'Market', market)
+    comparison.insert(1, 'Variant', variant)
+    comparison['Outliers'] = len(model.outliers)
+    comparison['Source'] = os.path.basename(csv_path)
+    return comparison
+
+
+def profile_market(csv_path, profiler=None, trace_memory=False, profile_dir=None, **options):
+    """
+    Run one template with a run profile.
+
+    Parameters:
+    - csv_path: Path of the template
+    - profiler, trace_memory: See RunProfile
+    - profile_dir: Directory of the profiler output (<market>_<variant>.prof or .txt)
+    - options: Keyword arguments passed on to run_market
+
+    Returns:
+    - Tuple of (comparison table, run report)
+    """
+    market, variant = market_of(csv_path)
+    prefix = os.path.join(profile_dir or '.', f"{market}_{variant}")
+    with RunProfile(f"{market}/{variant}", profiler, trace_memory, prefix) as profile:
+        comparison = run_market(csv_path, run_profile=profile, **options)
+    report = profile.report()
+    report['source'] = os.path.basename(csv_path)
+    return comparison, report
+
+
+def run_batch(sources, workers=None, report=None, profiler=None, trace_memory=False, **options):
+    """
+    Forecast every template in parallel and consolidate the results.
+
+    Parameters:
+    - sources: Files, directories or glob patterns of templates
+    - workers: Number of worker processes (defaults to the number of cores)
+    - report: Path of a JSON report with the stage timings of every market
+      and their totals, or None for no report
+    - profiler, trace_memory: Profile every market (see RunProfile); the
+      profiler output is written next to the report
+    - options: Keyword arguments passed on to run_market
+
+    Returns:
+    - Tuple of (consolidated results DataFrame, dict of failed path -> error)
+    """
+    paths = expand_templates(sources)
+    if not paths:
+        raise ValueError("No forecast templates found")
+
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    print(f"Forecasting {len(paths)} templates with {workers} worker processes...")
+
+    profiled = report is not None or profiler is not None or trace_memory
+    profile_dir = os.path.dirname(os.path.abspath(report)) if report else None
+
+    start = time.perf_counter()
+    results = []
+    reports = []
+    failures = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if profiled:
+            futures = {executor.submit(profile_market, path, profiler, trace_memory, profile_dir, **options): path
+                       for path in paths}
+        else:
+            futures = {executor.submit(run_market, path, **options): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+                if profiled:
+                    result, market_report = result
+                    reports.append(market_report)
+                results.append(result)
+                print(f"{os.path.basename(path)} complete.")
+            except Exception as e:
+                failures[path] = str(e)
+                print(f"Error forecasting {path}: {e}")
+
+    if report is not None:
+        write_report(aggregate_reports(
+            sorted(reports, key=lambda market_report: market_report['name']),
+            workers=workers, wall_seconds=time.perf_counter() - start, failures=failures
+        ), report)
+        print(f"Run report saved to {report}")
+
+    if not results:
+        return pd.DataFrame(), failures
+
+    consolidated = pd.concat(results, ignore_index=True)
+    consolidated = consolidated.sort_values(['Market', 'Variant', 'Date']).reset_index(drop=True)
+    return consolidated, failures
+
+
+def store_batch(consolidated, store_dir):
+    """
+    Append a consolidated batch result to a results store as one run.
+
+    Returns:
+    - The run id shared by all markets
+    """
+    store = ResultsStore(store_dir)
+    run_id = None
+    timestamp = pd.Timestamp.now(tz='UTC')
+    for (market, variant), comparison in consolidated.groupby(['Market', 'Variant']):
+        frames = comparison_frames(comparison.set_index('Date'))
+        run_id = store.write_run(frames, market=market, variant=variant, run_id=run_id, timestamp=timestamp)
+    return run_id
+
+
+def main():
+    """Main function to run the batch forecast."""
+    parser = argparse.ArgumentParser(description="Forecast travel queries for many market templates in parallel.")
+    parser.add_argument('sources', nargs='*', default=[os.path.dirname(os.path.abspath(__file__))],
+                        help="Template files, directories or glob patterns")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: number of cores)")
+    parser.add_argument('--output', default='forecast_batch_results.csv',
+                        help="Path of the consolidated results table")
+    parser.add_argument('--outlier-method', default='zscore', help="Outlier detection method")
+    parser.add_argument('--outlier-threshold', type=float, default=3.0, help="Outlier detection threshold")
+    parser.add_argument('--no-prophet', action='store_true', help="Skip Prophet forecasting")
+    parser.add_argument('--no-bayesian', action='store_true', help="Skip Bayesian forecasting")
+    parser.add_argument('--no-arimax', action='store_true',
+                        help="Skip the ARIMAX forecast with flight search, hotel and media regressors")
+    parser.add_argument('--charts', default=None,
+                        help="Render the outlier and forecast charts of every market into this directory")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help="Directory of the result cache; unchanged templates are not refitted")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute every template without reading or writing any cache")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Extend the cached models of templates that only gained new months instead of refitting")
+    parser.add_argument('--refit-every', type=int, default=12,
+                        help="Months added incrementally before a full ARIMA refit (default: 12)")
+    parser.add_argument('--store', default=None,
+                        help="Also append the results to the Parquet results store in this directory")
+    parser.add_argument('--report', default=None,
+                        help="Write a JSON report with the stage timings and memory of every market to this path")
+    parser.add_argument('--profile', choices=PROFILERS, default=None,
+                        help="Profile every market with cProfile or the pyinstrument sampling profiler")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Record the peak Python allocations of every stage (slower)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    consolidated, failures = run_batch(
+        args.sources,
+        workers=args.workers,
+        report=args.report,
+        profiler=args.profile,
+        trace_memory=args.trace_memory,
+        outlier_method=args.outlier_method,
+        outlier_threshold=args.outlier_threshold,
+        use_prophet=not args.no_prophet,
+        use_bayesian=not args.no_bayesian,
+        use_arimax=not args.no_arimax,
+        chart_dir=args.charts,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        incremental=args.incremental,
+        refit_every=args.refit_every
+    )
+
+    print("Saving results...")
+    consolidated.to_csv(args.output, index=False)
+    if args.store and not consolidated.empty:
+        run_id = store_batch(consolidated, args.store)
+        print(f"Results appended to {args.store} as run {run_id}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Forecast {consolidated['Source'].nunique() if not consolidated.empty else 0} templates "
+          f"in {elapsed:.1f}s ({len(failures)} failed). Results saved to {args.output}")
+
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
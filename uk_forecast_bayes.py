@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Bayesian AR Forecast Simulation
+
+Turns posterior draws of an AR(1) model
+
+    y[t] = alpha + beta * y[t-1] + e[t],   e[t] ~ Normal(0, sigma)
+
+into forecast trajectories. Every posterior draw is propagated as its own
+path, so parameter uncertainty and the accumulated noise both widen the
+intervals with the horizon. All paths are computed together as a
+(draws x horizon) array.
+
+sample_ar1_posterior provides posterior draws without PyMC3: with a
+Normal-Inverse-Gamma prior the AR(1) regression has a closed-form posterior
+that is sampled directly with NumPy, optionally with Fourier terms for the
+calendar month as an additive seasonal effect.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Number of draws simulated per block, bounding the (draws x horizon x horizon) weights
+_BLOCK_SIZE = 256
+
+
+def simulate_ar_paths(alpha, beta, sigma, last_value, horizon, seasonal_effects=None, random_state=None):
+    """
+    Simulate one forecast trajectory per posterior draw.
+
+    The AR recursion is unrolled in closed form,
+
+        y[h] = beta^(h+1) * y[-1] + sum_{j<=h} beta^(h-j) * (alpha + s[j] + e[j]),
+
+    and evaluated for all draws and horizons with a single tensor contraction.
+
+    Parameters:
+    - alpha, beta, sigma: Arrays of posterior draws (one value per draw)
+    - last_value: Last observed value the paths start from
+    - horizon: Number of periods to simulate
+    - seasonal_effects: Optional additive effect per period, shape (horizon,) or (draws, horizon)
+    - random_state: Seed or numpy Generator for the noise
+
+    Returns:
+    - Array of shape (draws, horizon) with the simulated paths
+    """
+    rng = np.random.default_rng(random_state)
+    alpha = np.asarray(alpha, dtype=float).ravel()
+    beta = np.asarray(beta, dtype=float).ravel()
+    sigma = np.asarray(sigma, dtype=float).ravel()
+    draws = len(alpha)
+
+    # Innovation entering the recursion at each step
+    shocks = alpha[:, None] + sigma[:, None] * rng.standard_normal((draws, horizon))
+    if seasonal_effects is not None:
+        shocks += seasonal_effects
+
+    steps = np.arange(horizon)
+    lags = steps[:, None] - steps[None, :]
+    lower = lags >= 0
+    lags = np.where(lower, lags, 0)
+
+    paths = np.empty((draws, horizon))
+    for start in range(0, draws, _BLOCK_SIZE):
+        block = slice(start, start + _BLOCK_SIZE)
+        powers = beta[block, None] ** np.arange(horizon + 1)
+        # weights[d, h, j] = beta[d] ** (h - j) for j <= h
+        weights = powers[:, lags] * lower
+        paths[block] = np.einsum('dhj,dj->dh', weights, shocks[block]) + powers[:, 1:] * last_value
+    return paths
+
+
+def summarize_paths(paths, index, fan_levels=(0.5, 0.8, 0.95), credible_level=0.95):
+    """
+    Summarise simulated paths into a forecast table.
+
+    Parameters:
+    - paths: Array of shape (draws, horizon)
+    - index: Index for the forecast periods
+    - fan_levels: Central interval widths for the fan chart bands
+    - credible_level: Width of the interval reported as Lower_CI/Upper_CI
+
+    Returns:
+    - DataFrame with Bayesian_Forecast (posterior mean), Lower_CI, Upper_CI and
+      Lower_<level>/Upper_<level> columns for every fan chart band
+    """
+    levels = sorted(set(fan_levels) | {credible_level})
+    probabilities = [p for level in levels for p in ((1 - level) / 2, (1 + level) / 2)]
+
+    # All quantiles in a single pass over the paths
+    quantiles = np.quantile(paths, probabilities, axis=0)
+
+    forecast = pd.DataFrame({'Bayesian_Forecast': paths.mean(axis=0)}, index=index)
+    for i, level in enumerate(levels):
+        lower, upper = quantiles[2 * i], quantiles[2 * i + 1]
+        if level == credible_level:
+            forecast['Lower_CI'] = lower
+            forecast['Upper_CI'] = upper
+        if level in fan_levels:
+            label = f"{level * 100:g}"
+            forecast[f'Lower_{label}'] = lower
+            forecast[f'Upper_{label}'] = upper
+    return forecast
+
+
+def fourier_terms(months, harmonics=2):
+    """
+    Annual Fourier terms for calendar months.
+
+    Parameters:
+    - months: Calendar month (1-12) of each period
+    - harmonics: Number of sine/cosine pairs
+
+    Returns:
+    - Array of shape (len(months), 2 * harmonics)
+    """
+    angles = 2 * np.pi * np.asarray(months, dtype=float)[:, None] / 12 * np.arange(1, harmonics + 1)
+    return np.hstack([np.sin(angles), np.cos(angles)])
+
+
+def sample_ar1_posterior(values, draws=1000, months=None, harmonics=2,
+                         prior_mean_beta=0.9, prior_scales=(10.0, 0.1, 10.0),
+                         prior_shape=2.0, prior_rate=None, random_state=None):
+    """
+    Sample the conjugate Normal-Inverse-Gamma posterior of an AR(1) regression.
+
+        y[t] = alpha + beta * y[t-1] + seasonal(month[t]) + e[t],   e[t] ~ Normal(0, sigma)
+
+    Coefficients have prior Normal(m0, sigma^2 * V0) with m0 = (0, prior_mean_beta, 0, ...)
+    and V0 diagonal with prior_scales (alpha, beta, seasonal terms); sigma^2 has
+    prior InverseGamma(prior_shape, prior_rate).
+
+    Parameters:
+    - values: Observations in time order
+    - draws: Number of posterior draws
+    - months: Calendar month of each observation; adds Fourier seasonal terms when given
+    - harmonics: Number of Fourier pairs for the seasonal term
+    - prior_mean_beta: Prior mean of the AR coefficient
+    - prior_scales: Prior standard deviations of (alpha, beta, seasonal) in units of sigma
+    - prior_shape, prior_rate: Inverse-Gamma prior of sigma^2 (rate defaults to the sample variance)
+    - random_state: Seed or numpy Generator
+
+    Returns:
+    - Dict with 'alpha', 'beta', 'sigma' arrays of shape (draws,) and, with
+      months, 'seasonal' of shape (draws, 2 * harmonics)
+    """
+    rng = np.random.default_rng(random_state)
+    values = np.asarray(values, dtype=float)
+    y = values[1:]
+
+    # Design matrix: intercept, lagged value and optional seasonal terms
+    columns = [np.ones(len(y)), values[:-1]]
+    if months is not None:
+        seasonal = fourier_terms(np.asarray(months)[1:], harmonics)
+        columns.extend(seasonal.T)
+    X = np.column_stack(columns)
+    k = X.shape[1]
+
+    prior_mean = np.zeros(k)
+    prior_mean[1] = prior_mean_beta
+    scales = np.array([prior_scales[0], prior_scales[1]] + [prior_scales[2]] * (k - 2))
+    prior_precision = np.diag(1 / scales ** 2)
+    if prior_rate is None:
+        prior_rate = np.var(y) * (prior_shape - 1)
+
+    # Closed-form posterior parameters
+    precision = prior_precision + X.T @ X
+    covariance = np.linalg.inv(precision)
+    mean = covariance @ (prior_precision @ prior_mean + X.T @ y)
+    shape = prior_shape + len(y) / 2
+    rate = prior_rate + 0.5 * (y @ y + prior_mean @ prior_precision @ prior_mean - mean @ precision @ mean)
+
+    # sigma^2 ~ InverseGamma(shape, rate), coefficients ~ Normal(mean, sigma^2 * covariance)
+    variance = 1 / rng.gamma(shape, 1 / rate, size=draws)
+    cholesky = np.linalg.cholesky(covariance)
+    coefficients = mean + np.sqrt(variance)[:, None] * (rng.standard_normal((draws, k)) @ cholesky.T)
+
+    posterior = {
+        'alpha': coefficients[:, 0],
+        'beta': coefficients[:, 1],
+        'sigma': np.sqrt(variance)
+    }
+    if months is not None:
+        posterior['seasonal'] = coefficients[:, 2:]
+    return posterior
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Persistent Content-Addressed Result Cache
+
+Stores intermediate artefacts of the forecast pipeline (parsed sections,
+outlier flags, adjusted series, fitted models, forecasts, rendered plots) as
+pickle files named by a hash of everything that determines them: the input
+data, the stage parameters and the versions of the libraries involved. A
+rerun on unchanged inputs loads every stage from disk instead of recomputing
+it, while any change to the data, parameters or libraries produces a new key.
+
+The cache directory is bounded in size. Reading an entry refreshes its
+modification time, and the least recently used entries are removed when a
+write takes the directory over its limit. The size of the directory is
+scanned on the first write and then tracked from the sizes of the files
+written, so the directory is only rescanned when it may be over its limit.
+
+Usage:
+    from uk_forecast_cache import ResultCache
+
+    cache = ResultCache('.forecast_cache/results')
+    key = cache.key('bayesian', series, periods, samples)
+    forecast = cache.get_or_compute(key, lambda: expensive_forecast(series))
+"""
+
+import hashlib
+import os
+import pickle
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join('.forecast_cache', 'results')
+
+# Size limit of a cache directory
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+_MISSING = object()
+
+
+def model_cache_dir(cache_dir, name):
+    """Directory of a fitted-model cache kept inside a result cache directory, or None without one."""
+    return None if cache_dir is None else os.path.join(cache_dir, name)
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 ** 2), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def library_versions(*distributions):
+    """Installed versions of the given distributions, without importing them."""
+    versions = []
+    for name in distributions:
+        try:
+            versions.append((name, metadata.version(name)))
+        except metadata.PackageNotFoundError:
+            versions.append((name, None))
+    return tuple(versions)
+
+
+def _update_digest(digest, part):
+    """Feed one key part into a hash, hashing pandas and NumPy objects by content."""
+    if isinstance(part, (pd.Series, pd.DataFrame, pd.Index)):
+        digest.update(type(part).__name__.encode())
+        if isinstance(part, pd.DataFrame):
+            digest.update(repr(list(part.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(part, index=not isinstance(part, pd.Index)).to_numpy().tobytes())
+    elif isinstance(part, np.ndarray):
+        digest.update(repr((part.dtype.str, part.shape)).encode())
+        digest.update(np.ascontiguousarray(part).tobytes())
+    elif isinstance(part, (tuple, list)):
+        digest.update(f"{type(part).__name__}{len(part)}".encode())
+        for item in part:
+            _update_digest(digest, item)
+    elif isinstance(part, dict):
+        _update_digest(digest, sorted(part.items(), key=lambda item: repr(item[0])))
+    else:
+        digest.update(repr(part).encode())
+    digest.update(b'|')
+
+
+class ResultCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Disk-backed cache of pickled results with LRU eviction.
+
+        Parameters:
+        - directory: Directory of the cache files, or None to keep results in memory only
+        - max_bytes: Size limit of the directory; least recently used files are removed beyond it
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._memory = {}
+        # Size of the directory as of the last scan plus the files written since; None before the first write
+        self._disk_bytes = None
+
+    def key(self, *parts):
+        """
+        Content hash of the given key parts.
+
+        Series, DataFrames and arrays are hashed by their values, so equal data
+        gives the same key regardless of where it came from.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            _update_digest(digest, part)
+        return digest.hexdigest()[:40]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        """Return the cached value for a key, or default."""
+        if key in self._memory:
+            return self._memory[key]
+        if self.directory is None:
+            return default
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            # Mark the entry as recently used
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return default
+        self._memory[key] = value
+        return value
+
+    def put(self, key, value):
+        """Store a value and evict old entries if the directory is over its limit."""
+        self._memory[key] = value
+        if self.directory is None:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so concurrent workers never read partial files
+        temporary_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self._path(key))
+
+        if self._disk_bytes is None:
+            self.evict()
+        else:
+            self._disk_bytes += os.path.getsize(self._path(key))
+            if self.max_bytes is not None and self._disk_bytes > self.max_bytes:
+                self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for a key, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def evict(self):
+        """Remove the least recently used files until the directory fits its size limit."""
+        if self.directory is None or self.max_bytes is None:
+            return
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._disk_bytes = total
+
+    def clear(self):
+        """Remove every cached entry."""
+        self._memory.clear()
+        self._disk_bytes = None
+        if self.directory is not None and os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pkl'):
+                    os.remove(entry.path)
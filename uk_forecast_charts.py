@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Headless Chart Rendering
+
+Draws the outlier and forecast comparison charts with matplotlib's
+object-oriented API on Agg canvases. Every chart is its own Figure, with no
+pyplot state shared between charts, so charts can be rendered concurrently in
+worker processes (the batch runner renders each market's charts in the
+process that fitted it).
+
+A PNG records the hash of the data it was drawn from in a text chunk. When a
+chart is saved again with the same hash, the existing file is left untouched
+and nothing is drawn.
+
+Usage:
+    from uk_forecast_charts import chart_path, draw_forecasts, render_png, save_chart
+
+    path = chart_path('charts', 'UK', 'Aligned', 'forecast_comparison')
+    save_chart(path, lambda: render_png(draw_forecasts, history, comparison), data_hash)
+"""
+
+import io
+import os
+import struct
+
+# Size of the charts in inches
+CHART_SIZE = (12, 6)
+
+# PNG text chunk keyword holding the hash of the plotted data
+HASH_KEYWORD = 'Data Hash'
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def chart_path(output_dir, market, variant, name):
+    """Output path of a market's chart: <output_dir>/<market>/<variant>/<name>.png"""
+    return os.path.join(output_dir, market, variant, f"{name}.png")
+
+
+def render_png(draw, *args, figsize=CHART_SIZE, data_hash=None, **kwargs):
+    """
+    Draw a chart on a new Agg figure and return it as PNG bytes.
+
+    Parameters:
+    - draw: Function drawing on the Axes passed as its first argument
+    - args, kwargs: Arguments passed on to draw
+    - figsize: Figure size in inches
+    - data_hash: Hash of the plotted data, stored in the PNG
+
+    Returns:
+    - PNG image bytes
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    draw(figure.add_subplot(), *args, **kwargs)
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', metadata={HASH_KEYWORD: data_hash} if data_hash else None)
+    return buffer.getvalue()
+
+
+def png_text(path, keyword):
+    """Value of a text chunk of a PNG file, or None if the file or the chunk does not exist."""
+    try:
+        with open(path, 'rb') as file:
+            if file.read(8) != _PNG_SIGNATURE:
+                return None
+            while True:
+                header = file.read(8)
+                if len(header) < 8:
+                    return None
+                length, chunk_type = struct.unpack('>I4s', header)
+                if chunk_type == b'tEXt':
+                    name, _, value = file.read(length).partition(b'\0')
+                    if name.decode('latin-1') == keyword:
+                        return value.decode('latin-1')
+                    file.seek(4, os.SEEK_CUR)
+                elif chunk_type in (b'IDAT', b'IEND'):
+                    # Text chunks written by matplotlib precede the image data
+                    return None
+                else:
+                    file.seek(length + 4, os.SEEK_CUR)
+    except OSError:
+        return None
+
+
+def save_chart(path, render, data_hash=None):
+    """
+    Write a chart unless the file already shows the same data.
+
+    Parameters:
+    - path: Output file
+    - render: Function returning the PNG bytes, only called when the chart is out of date
+    - data_hash: Hash of the plotted data, compared with the one stored in the existing file
+
+    Returns:
+    - True if the file was written, False if it was up to date
+    """
+    if data_hash is not None and png_text(path, HASH_KEYWORD) == data_hash:
+        return False
+
+    image = render()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write to a temporary file first so readers never see a partial image
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(image)
+    os.replace(temporary_path, path)
+    return True
+
+
+def draw_outliers(ax, time_series, outliers, adjusted_series=None, title='Time Series with Outliers'):
+    """
+    Draw the time series with outliers highlighted and the adjusted series.
+
+    The outliers are a frame with an Indexed_Queries column indexed by date, like the series.
+    """
+    ax.plot(time_series.index, time_series.values, 'b-', label='Original Data')
+    ax.scatter(outliers.index, outliers['Indexed_Queries'], color='red', label='Outliers')
+
+    if adjusted_series is not None:
+        ax.plot(adjusted_series.index, adjusted_series.values, 'g--', label='Adjusted Data')
+
+    ax.set_title(title)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Indexed Queries')
+    ax.legend()
+    ax.grid(True)
+
+
+def draw_forecasts(ax, time_series, comparison, title='UK Travel Queries Forecast Comparison'):
+    """Draw the historical data and every forecast of a comparison table."""
+    # Plot historical data
+    ax.plot(time_series.index, time_series.values, 'b-', label='Historical Data')
+
+    # Plot factor-based forecasts
+    ax.plot(comparison.index, comparison['Factor_Conservative'], 'g--', label='Factor Conservative')
+    ax.plot(comparison.index, comparison['Factor_Moderate'], 'g-', label='Factor Moderate')
+    ax.plot(comparison.index, comparison['Factor_Ambitious'], 'g:', label='Factor Ambitious')
+
+    # Statistical forecasts with their intervals, if available
+    for prefix, style, label in (('ARIMA', 'r', 'ARIMA'), ('Prophet', 'm', 'Prophet'), ('Bayesian', 'c', 'Bayesian')):
+        if f'{prefix}_Forecast' not in comparison.columns:
+            continue
+        ax.plot(comparison.index, comparison[f'{prefix}_Forecast'], f'{style}-', label=f'{label} Forecast')
+        ax.fill_between(
+            comparison.index,
+            comparison[f'{prefix}_Lower_CI'],
+            comparison[f'{prefix}_Upper_CI'],
+            color=style, alpha=0.1, label=f'{label} 95% CI'
+        )
+
+    if 'ARIMAX_Forecast' in comparison.columns:
+        ax.plot(comparison.index, comparison['ARIMAX_Forecast'], color='tab:orange', label='ARIMAX Forecast')
+
+    ax.set_title(title)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Indexed Queries')
+    ax.legend()
+    ax.grid(True)
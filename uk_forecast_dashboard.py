@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Dashboard Data Files
+
+Builds the data behind uk_dashboard.js from the forecast templates, so the
+dashboard no longer embeds hand-copied arrays. Every template
+(Travel_Queries_Forecast_<MARKET>[_<VARIANT>].csv) is written as compact JSON
+to <output_dir>/<market>/<variant>/:
+
+- base.json: month labels, media impressions, actual travel queries, flight
+  searches, hotel guests and the list of scenarios
+- scenario-<name>.json: the forecast of one scenario, fetched by the dashboard
+  only when that scenario is selected
+
+<output_dir>/manifest.json lists the markets and variants with the version of
+their data. Files carry the SCHEMA_VERSION of their layout and a version hash
+of their contents, which the dashboard appends to its requests so browsers
+cache the files until the data changes. Unchanged files are not rewritten.
+
+Files can be precompressed (.json.gz, and .json.br when the brotli package is
+installed) for servers that serve precompressed files, and long series can be
+downsampled to a maximum number of points per series.
+
+Usage:
+    python uk_forecast_dashboard.py Travel_Queries_Forecast_UK_Enhanced_Updated.csv
+    python uk_forecast_dashboard.py Markets/ --output-dir dashboard_data --compress gzip brotli
+"""
+
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+
+import numpy as np
+
+from uk_forecast_batch import market_of
+from uk_forecast_template import MONTH_NAMES, TemplateReader, base_year_of, expand_templates
+
+# Layout version of the data files; the dashboard refuses files with another schema
+SCHEMA_VERSION = 1
+
+DEFAULT_OUTPUT_DIR = 'dashboard_data'
+
+MANIFEST = 'manifest.json'
+
+COMPRESSIONS = ('gzip', 'brotli')
+
+# Dashboard series -> (template section, value column, decimals)
+SERIES = {
+    'travelQueries': ('HISTORICAL QUERIES', 'Indexed Queries', 2),
+    'flightSearches': ('FLIGHT SEARCHES', 'Flight Searches', 0),
+    'hotelGuests': ('HOTEL GUESTS', 'Hotel Guests', 0),
+}
+
+SCENARIOS = ('Conservative', 'Moderate', 'Ambitious')
+
+_COMPRESSED_SUFFIXES = {'gzip': '.gz', 'brotli': '.br'}
+
+
+def downsample(values, max_points=None):
+    """
+    Average consecutive values so that at most max_points remain.
+
+    Parameters:
+    - values: 1-d sequence of values
+    - max_points: Maximum number of points, or None to keep every value
+
+    Returns:
+    - Tuple of (array of values, list of (first, last) index of every point)
+    """
+    values = np.asarray(values, dtype=float)
+    if max_points is None or len(values) <= max_points:
+        return values, [(i, i) for i in range(len(values))]
+    buckets = np.array_split(np.arange(len(values)), max_points)
+    return (np.array([values[bucket].mean() for bucket in buckets]),
+            [(int(bucket[0]), int(bucket[-1])) for bucket in buckets])
+
+
+def dashboard_data(template, max_points=None, history_years=2):
+    """
+    Data of the dashboard for one template.
+
+    Parameters:
+    - template: TemplateReader or path of the template CSV
+    - max_points: Maximum number of points per series (None keeps the 12 months)
+    - history_years: Number of actual years up to the base year included per series
+
+    Returns:
+    - Tuple of (base data dict, dict of scenario name -> scenario data dict); the
+      dicts do not yet have the schema and version fields
+    """
+    reader = template if isinstance(template, TemplateReader) else TemplateReader(template)
+
+    results = reader.forecast_results()
+    base_year = base_year_of(results.columns)
+    forecast_year = base_year + 1
+
+    _, spans = downsample(np.zeros(len(MONTH_NAMES)), max_points)
+    labels = [_label(first, last) for first, last in spans]
+
+    def points(values, decimals):
+        values, _ = downsample(values, max_points)
+        values = np.round(values, decimals)
+        # Missing months are null so the chart leaves a gap
+        return [None if np.isnan(value) else (int(value) if decimals == 0 else float(value)) for value in values]
+
+    base = {'labels': labels, 'baseYear': base_year, 'forecastYear': forecast_year}
+
+    if 'MEDIA IMPRESSIONS' in reader:
+        media = reader.section('MEDIA IMPRESSIONS').set_index('Month').reindex(list(MONTH_NAMES))
+        base['impressions'] = {}
+        for column in media.columns:
+            year, _, kind = column.partition(' ')
+            if year.isdigit() and kind in ('Impressions', 'Planned Impressions'):
+                base['impressions'][year] = points(media[column].to_numpy(dtype=float), 0)
+
+    for name, (section, column, decimals) in SERIES.items():
+        if section not in reader:
+            continue
+        data = reader.section(section).pivot_table(index='Month', columns='Year', values=column)
+        data = data.reindex(list(MONTH_NAMES))
+        # Only complete years are charted; the current year's first months are not
+        years = [year for year in data.columns
+                 if data[year].notna().all() and base_year - history_years < year <= base_year]
+        base[name] = {str(int(year)): points(data[year].to_numpy(dtype=float), decimals) for year in years}
+
+    actual = results[f'{base_year} Queries'].to_numpy(dtype=float)
+    scenarios = {}
+    base['scenarios'] = {}
+    for scenario in SCENARIOS:
+        if scenario not in results.columns:
+            continue
+        forecast = results[scenario].to_numpy(dtype=float)
+        key = scenario.lower()
+        growth = round(float(forecast.sum() / actual.sum() - 1), 4)
+        scenarios[key] = {
+            'scenario': key,
+            'label': scenario,
+            'year': forecast_year,
+            'growth': growth,
+            'values': points(forecast, 2)
+        }
+        base['scenarios'][key] = {'file': f'scenario-{key}.json', 'label': scenario, 'growth': growth}
+    base['defaultScenario'] = 'moderate' if 'moderate' in scenarios else next(iter(scenarios), None)
+    return base, scenarios
+
+
+def write_json(path, data, compress=()):
+    """
+    Write compact, versioned JSON unless the file already holds the same data.
+
+    A schema and a version field (hash of the data) are added to data.
+
+    Parameters:
+    - path: Output file
+    - data: Dict to write
+    - compress: Precompressed copies to write next to the file (see COMPRESSIONS)
+
+    Returns:
+    - Tuple of (version, True if the file was written)
+    """
+    content = json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    version = hashlib.sha256(content).hexdigest()[:12]
+    payload = json.dumps({'schema': SCHEMA_VERSION, 'version': version, **data},
+                         separators=(',', ':')).encode('utf-8')
+
+    copies = {path: payload}
+    for method in compress:
+        if method not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {method}")
+        if method == 'gzip':
+            # A fixed timestamp keeps the compressed bytes reproducible
+            copies[path + _COMPRESSED_SUFFIXES[method]] = gzip.compress(payload, compresslevel=9, mtime=0)
+        else:
+            import brotli
+            copies[path + _COMPRESSED_SUFFIXES[method]] = brotli.compress(payload, quality=11)
+
+    written = False
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    for target, content in copies.items():
+        if os.path.exists(target):
+            with open(target, 'rb') as file:
+                if file.read() == content:
+                    continue
+        temporary_path = f"{target}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            file.write(content)
+        os.replace(temporary_path, target)
+        written = True
+    return version, written
+
+
+def write_dashboard(csv_path, output_dir=DEFAULT_OUTPUT_DIR, max_points=None, history_years=2, compress=()):
+    """
+    Write the dashboard data files of one template.
+
+    Parameters:
+    - csv_path: Path of the template CSV
+    - output_dir: Directory of the data files
+    - max_points, history_years: See dashboard_data
+    - compress: Precompressed copies to write (see COMPRESSIONS)
+
+    Returns:
+    - Manifest entry of the template: dict with market, variant, path and version
+    """
+    market, variant = market_of(csv_path)
+    directory = os.path.join(output_dir, market, variant)
+
+    base, scenarios = dashboard_data(csv_path, max_points=max_points, history_years=history_years)
+    # The scenario versions go into the base file so the dashboard can cache them
+    for key, scenario in scenarios.items():
+        version, _ = write_json(os.path.join(directory, f'scenario-{key}.json'), scenario, compress)
+        base['scenarios'][key]['version'] = version
+    version, _ = write_json(os.path.join(directory, 'base.json'), {'market': market, 'variant': variant, **base},
+                            compress)
+    return {'market': market, 'variant': variant, 'path': f'{market}/{variant}/base.json', 'version': version}
+
+
+def write_manifest(entries, output_dir=DEFAULT_OUTPUT_DIR, defaults=None, compress=()):
+    """
+    Add written templates to the manifest of the output directory.
+
+    Parameters:
+    - entries: Manifest entries returned by write_dashboard
+    - output_dir: Directory of the data files
+    - defaults: Dict of market -> variant shown when the dashboard does not ask for one
+      (defaults to the existing default or the first variant)
+
+    Returns:
+    - Version of the manifest
+    """
+    path = os.path.join(output_dir, MANIFEST)
+    markets = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+        if manifest.get('schema') == SCHEMA_VERSION:
+            markets = manifest['markets']
+
+    for entry in entries:
+        market = markets.setdefault(entry['market'], {'variants': {}})
+        market['variants'][entry['variant']] = {'path': entry['path'], 'version': entry['version']}
+    for name, market in markets.items():
+        variant = (defaults or {}).get(name)
+        if variant is not None:
+            if variant not in market['variants']:
+                raise ValueError(f"No data files for {name} {variant}")
+            market['default'] = variant
+        elif market.get('default') not in market['variants']:
+            market['default'] = sorted(market['variants'])[0]
+
+    version, _ = write_json(path, {'markets': markets}, compress)
+    return version
+
+
+def _label(first, last):
+    """Axis label of a point covering months first to last (0-based)."""
+    if first == last:
+        return MONTH_NAMES[first][:3]
+    return f"{MONTH_NAMES[first][:3]}-{MONTH_NAMES[last][:3]}"
+
+
+def main():
+    """Main function to write the dashboard data files."""
+    parser = argparse.ArgumentParser(description="Write the dashboard data files of forecast templates.")
+    parser.add_argument('sources', nargs='+', help="Template files, directories or glob patterns")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Directory of the data files")
+    parser.add_argument('--max-points', type=int, default=None,
+                        help="Downsample every series to at most this many points")
+    parser.add_argument('--history-years', type=int, default=2,
+                        help="Number of actual years per series (default: 2)")
+    parser.add_argument('--compress', nargs='*', choices=COMPRESSIONS, default=[],
+                        help="Also write precompressed copies of every file")
+    parser.add_argument('--default', nargs='*', default=[], metavar='MARKET=VARIANT',
+                        help="Variant the dashboard shows for a market, e.g. UK=Enhanced_Updated")
+    args = parser.parse_args()
+
+    compress = list(args.compress)
+    if 'brotli' in compress and importlib.util.find_spec('brotli') is None:
+        print("brotli is not installed, skipping the .br files")
+        compress.remove('brotli')
+
+    paths = expand_templates(args.sources)
+    if not paths:
+        parser.error("No forecast templates found")
+
+    entries = []
+    for path in paths:
+        try:
+            entries.append(write_dashboard(path, args.output_dir, args.max_points, args.history_years, compress))
+            print(f"{os.path.basename(path)} -> {entries[-1]['path']}")
+        except (KeyError, ValueError) as e:
+            print(f"Error writing the dashboard data of {path}: {e}")
+
+    defaults = dict(default.split('=', 1) for default in args.default)
+    version = write_manifest(entries, args.output_dir, defaults, compress)
+    print(f"Manifest version {version} saved to {os.path.join(args.output_dir, MANIFEST)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,13 @@ Enhanced UK Travel Queries Forecast Model
 
 This script enhances the existing factor-based forecast model with:
 1. Anomaly Detection: Identifies and adjusts outliers in historical data
-2. Time Series Forecasting: Implements ARIMA models for comparison
+2. Time Series Forecasting: Implements ARIMA models for comparison, with an
+   ARIMAX variant driven by flight searches, hotel guests and media impressions
 3. Bayesian Forecasting: Incorporates uncertainty and confidence intervals
 
 Usage:
     python uk_forecast_enhanced_model.py
+    python uk_forecast_enhanced_model.py --report uk_run_report.json --profile cprofile
 
 Requirements:
     - pandas
@@ -17,131 +19,163 @@ Requirements:
     - statsmodels
     - scipy
     - prophet (Facebook Prophet)
-    - pymc3 (for Bayesian modeling)
+    - pymc3 (optional, MCMC backend for Bayesian modeling)
 """
 
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from statsmodels.tsa.arima.model import ARIMA
-from statsmodels.tsa.stattools import adfuller
-from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
-from scipy import stats
+import copy
+import functools
 import os
 import warnings
+from uk_forecast_arima import ArimaCache, extend_arima, fit_arima, select_arima_order
+from uk_forecast_backtest import BACKTEST_MODELS, backtest
+from uk_forecast_cache import (DEFAULT_CACHE_DIR as RESULT_CACHE_DIR, ResultCache, file_digest, library_versions,
+                               model_cache_dir)
+from uk_forecast_charts import draw_forecasts, draw_outliers, render_png, save_chart
+from uk_forecast_exog import REGRESSORS, design_matrix, fit_arimax, forecast_arimax
+from uk_forecast_bayes import fourier_terms, sample_ar1_posterior, simulate_ar_paths, summarize_paths
+from uk_forecast_factor import FactorModel
+from uk_forecast_outliers import DETECTORS, adjust_outlier_values
+from uk_forecast_profile import PROFILERS, RunProfile, stage
+from uk_forecast_prophet import ProphetCache, fit_prophet, prophet_forecast
+from uk_forecast_series import MonthlySeries
+from uk_forecast_store import DEFAULT_STORE_DIR, ResultsStore, changed_rows, comparison_frames
+from uk_forecast_template import TemplateReader
 warnings.filterwarnings('ignore')
 
-# Try to import Prophet, but continue if not available
-try:
-    from prophet import Prophet
-    prophet_available = True
-except ImportError:
-    prophet_available = False
-    print("Facebook Prophet not available. Prophet forecasting will be skipped.")
+# Default seed of the Bayesian posterior sampling, so reruns give the same forecast
+BAYESIAN_SEED = 42
 
-# Try to import PyMC3, but continue if not available
-try:
-    import pymc3 as pm
-    import theano.tensor as tt
-    pymc3_available = True
-except ImportError:
-    pymc3_available = False
-    print("PyMC3 not available. Bayesian forecasting will be skipped.")
+# Plotting, statsmodels, Prophet and PyMC3 are imported the first time a method
+# needs them, so CSV-only or ARIMA-only runs do not pay for the other backends.
+
+@functools.lru_cache(maxsize=None)
+def load_prophet():
+    """Import Prophet on first use; returns the Prophet class, or None if it is not installed."""
+    try:
+        from prophet import Prophet
+    except ImportError:
+        print("Facebook Prophet not available. Prophet forecasting will be skipped.")
+        return None
+    return Prophet
+
+@functools.lru_cache(maxsize=None)
+def load_pymc3():
+    """Import PyMC3 on first use; returns the pymc3 module, or None if it is not installed."""
+    try:
+        import pymc3 as pm
+    except ImportError:
+        print("PyMC3 not available. Bayesian forecasting will use the conjugate backend.")
+        return None
+    return pm
+
+def __getattr__(name):
+    """Resolve the prophet_available/pymc3_available flags on first access."""
+    if name == 'prophet_available':
+        return load_prophet() is not None
+    if name == 'pymc3_available':
+        return load_pymc3() is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class EnhancedForecastModel:
-    def __init__(self, csv_path):
-        """Initialize the enhanced forecast model with data from the CSV file."""
+    def __init__(self, csv_path, cache_dir=None, profile=None):
+        """
+        Initialize the enhanced forecast model with data from the CSV file.
+        
+        Parameters:
+        - csv_path: Path to the forecast template CSV file
+        - cache_dir: Directory of the persistent result cache, or None to recompute every stage
+        - profile: RunProfile recording the time and memory of every stage, or None
+        """
         self.csv_path = csv_path
+        self.cache = ResultCache(cache_dir) if cache_dir is not None else None
+        self.profile = profile
         self.load_data()
         self.prepare_time_series()
+    
+    @classmethod
+    def from_series(cls, series, cache_dir=None):
+        """
+        Create a model for a monthly series that does not come from a template.
+        
+        Parameters:
+        - series: Indexed queries with a month-start DatetimeIndex
+        - cache_dir: Directory of the persistent result cache, or None to recompute every stage
+        
+        Returns:
+        - EnhancedForecastModel
+        """
+        model = cls.__new__(cls)
+        model.csv_path = None
+        model.cache = ResultCache(cache_dir) if cache_dir is not None else None
+        model.profile = None
+        model.template = None
+        model.historical_data = MonthlySeries.from_series(series, name='Indexed_Queries').to_frame()
+        model.prepare_time_series()
+        return model
+    
+    def __getstate__(self):
+        """Pickle the fitted state without the result cache, the profile and the Prophet model."""
+        state = self.__dict__.copy()
+        state['cache'] = None
+        state['profile'] = None
+        # Prophet models are cached in their JSON serialization by uk_forecast_prophet
+        state.pop('prophet_model', None)
+        return state
+    
+    def __setstate__(self, state):
+        """Restore a pickled model, including models pickled with a pandas time series."""
+        legacy_series = state.pop('time_series', None)
+        self.__dict__.update(state)
+        if 'series' not in state and legacy_series is not None:
+            self.series = MonthlySeries.from_series(legacy_series, name='Indexed_Queries')
+    
+    @property
+    def time_series(self):
+        """Indexed queries as a pandas Series sharing the values of the compact series."""
+        return self.series.to_series()
+    
+    def _cached(self, stage, compute, *parts, libraries=()):
+        """
+        Return the result of a pipeline stage, loading it from the cache when its inputs are unchanged.
+        
+        Parameters:
+        - stage: Name of the stage
+        - compute: Function computing the result on a cache miss
+        - parts: Inputs and parameters that determine the result
+        - libraries: Distributions whose versions are part of the key
+        """
+        if self.cache is None:
+            return compute()
+        key = self.cache.key(stage, *parts, library_versions('numpy', 'pandas', *libraries))
+        return self.cache.get_or_compute(key, compute)
+    
+    def _model_cache_dir(self, cache_dir, name):
+        """
+        Directory of a fitted-model cache.
         
+        An explicit directory is used as given; otherwise the cache is the `name`
+        subdirectory of the model's result cache, and there is none without it.
+        """
+        if cache_dir is not None:
+            return cache_dir
+        return model_cache_dir(self.cache.directory if self.cache is not None else None, name)
+        
+    @stage()
     def load_data(self):
         """Load data from the CSV file and extract historical queries."""
         try:
-            # Try to use pandas to read the CSV directly
-            # This is a simpler approach but might not work with the custom format
-            try:
-                # Skip rows until we find the HISTORICAL QUERIES section
-                skip_rows = 0
-                with open(self.csv_path, 'r') as file:
-                    for line in file:
-                        skip_rows += 1
-                        if 'HISTORICAL QUERIES' in line:
-                            break
-                
-                # Read the historical queries section
-                self.historical_data = pd.read_csv(
-                    self.csv_path, 
-                    skiprows=skip_rows+1,  # Skip the section header and column header
-                    nrows=60,  # Assuming there are at most 60 rows of historical data
-                    usecols=[0, 1, 2],  # Only use the first three columns
-                    names=['Month', 'Year', 'Indexed_Queries']  # Set column names
-                )
-                
-                # Convert Year to integer and Indexed_Queries to float
-                self.historical_data['Year'] = self.historical_data['Year'].astype(int)
-                self.historical_data['Indexed_Queries'] = self.historical_data['Indexed_Queries'].astype(float)
-                
-                # Remove any rows with NaN values
-                self.historical_data = self.historical_data.dropna()
-                
-                print(f"Loaded {len(self.historical_data)} rows of historical data")
-                
-            except Exception as e:
-                print(f"Error reading CSV with pandas: {e}")
-                print("Falling back to manual parsing...")
-                
-                # Manual parsing as a fallback
-                with open(self.csv_path, 'r') as file:
-                    content = file.read()
-                
-                # Split the content by section markers
-                sections = content.split('====================')
-                
-                # Find the historical queries section
-                historical_queries_section = None
-                for section in sections:
-                    if 'HISTORICAL QUERIES' in section:
-                        historical_queries_section = section
-                        break
-                
-                if historical_queries_section is None:
-                    raise ValueError("Historical queries section not found in the CSV file")
-                
-                # Parse the historical queries section
-                lines = historical_queries_section.strip().split('\n')
-                
-                # Find the header line
-                header_line_idx = -1
-                for i, line in enumerate(lines):
-                    if 'Month,Year,Indexed Queries' in line:
-                        header_line_idx = i
-                        break
-                
-                if header_line_idx == -1:
-                    raise ValueError("Header line not found in historical queries section")
-                
-                # Skip the header lines
-                data_lines = lines[header_line_idx+1:]
-                
-                # Create a DataFrame
-                data = []
-                for line in data_lines:
-                    if not line.strip() or ',' not in line:
-                        continue
-                    
-                    parts = line.split(',')
-                    if len(parts) >= 3 and parts[2].strip():
-                        try:
-                            month = parts[0].strip()
-                            year = int(parts[1].strip())
-                            queries = float(parts[2].strip())
-                            data.append({'Month': month, 'Year': year, 'Indexed_Queries': queries})
-                        except (ValueError, IndexError) as e:
-                            print(f"Error parsing line: {line}, error: {e}")
-                
-                self.historical_data = pd.DataFrame(data)
-                print(f"Loaded {len(self.historical_data)} rows of historical data using manual parsing")
+            # Index the template sections in a single pass; sections are
+            # parsed on demand so the whole history is read, however long
+            self.template = TemplateReader(self.csv_path)
+            digest = file_digest(self.csv_path) if self.cache is not None else None
+            self.historical_data = self._cached(
+                'historical_queries', self.template.historical_queries, digest
+            ).copy()
+            
+            print(f"Loaded {len(self.historical_data)} rows of historical data")
         
         except Exception as e:
             print(f"Error loading data: {e}")
@@ -149,56 +183,142 @@ class EnhancedForecastModel:
         
     def prepare_time_series(self):
         """Prepare the time series data for analysis."""
-        # Create a date column
-        self.historical_data['Date'] = pd.to_datetime(
-            self.historical_data['Year'].astype(str) + '-' + 
-            self.historical_data['Month'].apply(lambda x: {
-                'January': '01', 'February': '02', 'March': '03', 'April': '04',
-                'May': '05', 'June': '06', 'July': '07', 'August': '08',
-                'September': '09', 'October': '10', 'November': '11', 'December': '12'
-            }[x]) + '-01'
+        # Month ordinals replace parsed date strings; the rows are put in date order
+        self.series, order = MonthlySeries.from_columns(
+            self.historical_data['Month'], self.historical_data['Year'],
+            self.historical_data['Indexed_Queries'].to_numpy(), name='Indexed_Queries'
         )
+        self.historical_data = self.historical_data.iloc[order].assign(Date=self.series.index.to_numpy())
         
-        # Sort by date
-        self.historical_data = self.historical_data.sort_values('Date')
-        
-        # Create a time series
-        self.time_series = self.historical_data.set_index('Date')['Indexed_Queries']
-        
-    def detect_outliers(self, method='zscore', threshold=3.0):
+    @stage()
+    def detect_outliers(self, method='zscore', threshold=3.0, **detector_options):
         """
         Detect outliers in the historical data.
         
         Parameters:
-        - method: Method to use for outlier detection ('zscore', 'iqr')
+        - method: Method to use for outlier detection ('zscore', 'iqr', 'rolling_mad', 'seasonal', 'stl')
         - threshold: Threshold for outlier detection
+        - detector_options: Extra options for the rolling_mad/seasonal/stl detectors (e.g. window)
         
         Returns:
         - DataFrame with outliers flagged
         """
-        data = self.historical_data.copy()
+        if method not in ('zscore', 'iqr') and method not in DETECTORS:
+            raise ValueError(f"Unknown outlier detection method: {method}")
         
-        if method == 'zscore':
-            # Z-score method
-            z_scores = stats.zscore(data['Indexed_Queries'])
-            data['Outlier'] = abs(z_scores) > threshold
-            data['Z_Score'] = z_scores
+        def detect():
+            data = self.historical_data.copy()
+            detector = None
             
-        elif method == 'iqr':
-            # IQR method
-            Q1 = data['Indexed_Queries'].quantile(0.25)
-            Q3 = data['Indexed_Queries'].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - threshold * IQR
-            upper_bound = Q3 + threshold * IQR
-            data['Outlier'] = (data['Indexed_Queries'] < lower_bound) | (data['Indexed_Queries'] > upper_bound)
+            if method == 'zscore':
+                # Z-score method
+                from scipy import stats
+                z_scores = stats.zscore(data['Indexed_Queries'])
+                data['Outlier'] = abs(z_scores) > threshold
+                data['Z_Score'] = z_scores
             
-        else:
-            raise ValueError(f"Unknown outlier detection method: {method}")
+            elif method == 'iqr':
+                # IQR method
+                Q1 = data['Indexed_Queries'].quantile(0.25)
+                Q3 = data['Indexed_Queries'].quantile(0.75)
+                IQR = Q3 - Q1
+                lower_bound = Q1 - threshold * IQR
+                upper_bound = Q3 + threshold * IQR
+                data['Outlier'] = (data['Indexed_Queries'] < lower_bound) | (data['Indexed_Queries'] > upper_bound)
+            
+            elif method in DETECTORS:
+                # Trend and seasonality aware detectors that can be updated incrementally
+                detector = DETECTORS[method](threshold=threshold, **detector_options)
+                scores = detector.fit(data['Indexed_Queries'].to_numpy(), data['Date'].dt.month.to_numpy())
+                data['Score'] = scores
+                data['Outlier'] = detector.is_outlier(scores)
+            
+            return data, detector
+        
+        data, detector = self._cached(
+            'outliers', detect, self.historical_data, method, threshold, detector_options,
+            libraries=('scipy', 'statsmodels')
+        )
         
+        # Streaming updates change the detector state, so keep the cached copy intact
+        self.outlier_detector = copy.deepcopy(detector)
+        self.outlier_options = {'method': method, 'threshold': threshold, **detector_options}
+        self.outlier_flags = data
         self.outliers = data[data['Outlier']]
         return data
     
+    def update_outliers(self, new_rows):
+        """
+        Score newly appended observations with the running detector statistics.
+        
+        Parameters:
+        - new_rows: DataFrame with Date and Indexed_Queries columns, in date order
+        
+        Returns:
+        - The new rows with Score and Outlier columns
+        """
+        if getattr(self, 'outlier_detector', None) is None:
+            raise ValueError("Incremental updates need a 'rolling_mad', 'seasonal' or 'stl' detection run first")
+        
+        detector = self.outlier_detector
+        new_rows = new_rows.copy()
+        new_rows['Score'] = [
+            detector.update(value, month)
+            for value, month in zip(new_rows['Indexed_Queries'].to_numpy(), new_rows['Date'].dt.month.to_numpy())
+        ]
+        new_rows['Outlier'] = detector.is_outlier(new_rows['Score'].to_numpy())
+        
+        # Append rather than recompute the flag table
+        self.outlier_flags = pd.concat([self.outlier_flags, new_rows])
+        self.outliers = pd.concat([self.outliers, new_rows[new_rows['Outlier']]])
+        return new_rows
+    
+    def append_observations(self, new_data):
+        """
+        Append newly arrived months to the historical data.
+        
+        Rows that are not later than the last historical month are ignored.
+        Outlier flags are updated incrementally when a streaming detector is
+        active, and the adjusted series is refreshed if one exists.
+        
+        Parameters:
+        - new_data: DataFrame with Month, Year and Indexed_Queries columns
+        
+        Returns:
+        - DataFrame with the appended rows
+        """
+        new_rows = new_data[['Month', 'Year', 'Indexed_Queries']]
+        new_series, order = MonthlySeries.from_columns(
+            new_rows['Month'], new_rows['Year'], new_rows['Indexed_Queries'].to_numpy(), name='Indexed_Queries'
+        )
+        later = new_series.ordinals > self.series.ordinals[-1]
+        new_rows = new_rows.iloc[order[later]].assign(Date=new_series.index[later].to_numpy())
+        if new_rows.empty:
+            return new_rows
+        
+        # Continue the row labels of the historical data
+        first_label = self.historical_data.index.max() + 1
+        new_rows.index = pd.RangeIndex(first_label, first_label + len(new_rows))
+        
+        self.historical_data = pd.concat([self.historical_data, new_rows])
+        self.series = MonthlySeries(
+            np.concatenate([self.series.ordinals, new_series.ordinals[later]]),
+            np.concatenate([self.series.values, new_series.values[later]]),
+            self.series.name
+        )
+        
+        if getattr(self, 'outlier_detector', None) is not None:
+            new_rows = self.update_outliers(new_rows)
+        elif hasattr(self, 'outlier_options'):
+            # Z-score and IQR bounds depend on every observation, so detect again
+            self.detect_outliers(**self.outlier_options)
+        
+        if hasattr(self, 'adjusted_series'):
+            self.adjust_outliers(**self.adjustment_options)
+        
+        return new_rows
+    
+    @stage()
     def adjust_outliers(self, method='median_window', window_size=3):
         """
         Adjust outliers in the historical data.
@@ -214,45 +334,26 @@ class EnhancedForecastModel:
         if not hasattr(self, 'outliers'):
             self.detect_outliers()
         
-        # Create a copy of the time series
-        adjusted_series = self.time_series.copy()
-        
-        # Get the indices of outliers
-        outlier_indices = self.outliers.index
-        
-        for idx in outlier_indices:
-            if method == 'median_window':
-                # Use median of surrounding values
-                window_start = max(0, self.time_series.index.get_loc(idx) - window_size // 2)
-                window_end = min(len(self.time_series), self.time_series.index.get_loc(idx) + window_size // 2 + 1)
-                window_values = self.time_series.iloc[window_start:window_end]
-                # Exclude the outlier itself from the window
-                window_values = window_values[window_values.index != idx]
-                if not window_values.empty:
-                    adjusted_series.loc[idx] = window_values.median()
-                
-            elif method == 'mean_window':
-                # Use mean of surrounding values
-                window_start = max(0, self.time_series.index.get_loc(idx) - window_size // 2)
-                window_end = min(len(self.time_series), self.time_series.index.get_loc(idx) + window_size // 2 + 1)
-                window_values = self.time_series.iloc[window_start:window_end]
-                # Exclude the outlier itself from the window
-                window_values = window_values[window_values.index != idx]
-                if not window_values.empty:
-                    adjusted_series.loc[idx] = window_values.mean()
-                
-            elif method == 'linear_interp':
-                # Use linear interpolation
-                adjusted_series.loc[idx] = np.nan
-                
-        # Fill any NaN values with linear interpolation
-        if method == 'linear_interp':
-            adjusted_series = adjusted_series.interpolate(method='linear')
+        # Flag the outlier dates in time series order
+        outlier_mask = self.time_series.index.isin(self.outliers['Date'])
         
+        # Replace all outliers at once from the centred windows around them
+        adjusted_values = self._cached(
+            'adjusted_series',
+            lambda: adjust_outlier_values(
+                self.time_series.to_numpy(), outlier_mask, method=method, window_size=window_size
+            ),
+            self.time_series, outlier_mask, method, window_size
+        )
+        adjusted_series = pd.Series(adjusted_values, index=self.time_series.index, name=self.time_series.name)
+        
+        self.adjustment_options = {'method': method, 'window_size': window_size}
         self.adjusted_series = adjusted_series
         return adjusted_series
     
-    def fit_arima_model(self, p=1, d=1, q=1):
+    @stage()
+    def fit_arima_model(self, p=1, d=1, q=1, seasonal_order=(0, 0, 0, 0), auto=False,
+                        criterion='aic', workers=None, cache_dir=None):
         """
         Fit an ARIMA model to the adjusted time series.
         
@@ -260,6 +361,12 @@ class EnhancedForecastModel:
         - p: Order of the AR term
         - d: Order of differencing
         - q: Order of the MA term
+        - seasonal_order: Seasonal order (P, D, Q, s)
+        - auto: Select (p, d, q) and (P, D, Q, 12) by a parallel grid search instead
+        - criterion: Information criterion used to rank orders when auto is set ('aic', 'bic')
+        - workers: Number of worker processes for the order search
+        - cache_dir: Directory of the fitted-model cache; defaults to the arima
+          subdirectory of the model's result cache (no cache without one)
         
         Returns:
         - Fitted ARIMA model
@@ -267,11 +374,109 @@ class EnhancedForecastModel:
         # Use adjusted series if available, otherwise use original
         series = self.adjusted_series if hasattr(self, 'adjusted_series') else self.time_series
         
+        arima_cache_dir = self._model_cache_dir(cache_dir, 'arima')
+        order = (p, d, q)
+        if auto:
+            # Rank the candidate orders and refit the best one from the cache
+            self.arima_order_search = select_arima_order(
+                series, criterion=criterion, workers=workers, cache_dir=arima_cache_dir
+            )
+            best = self.arima_order_search.iloc[0]
+            order, seasonal_order = best['order'], best['seasonal_order']
+            print(f"Selected ARIMA{order}x{seasonal_order} by {criterion.upper()}")
+        
         # Fit ARIMA model
-        model = ARIMA(series, order=(p, d, q))
-        self.arima_model = model.fit()
+        cache = ArimaCache(arima_cache_dir) if arima_cache_dir is not None else None
+        self.arima_model = fit_arima(series, order, seasonal_order, cache=cache)
+        
+        # Remember the options for full refits during incremental updates
+        self.arima_options = {'p': p, 'd': d, 'q': q, 'seasonal_order': seasonal_order, 'auto': auto,
+                              'criterion': criterion, 'workers': workers, 'cache_dir': cache_dir}
+        self.arima_extended = 0
+        return self.arima_model
+    
+    @stage()
+    def update_arima_model(self, refit_every=12):
+        """
+        Extend the fitted ARIMA model with the months appended since it was fitted.
+        
+        The new observations are filtered through the model with the estimated
+        parameters; a full refit happens once refit_every months have been
+        added this way since the last fit.
+        
+        Parameters:
+        - refit_every: Number of appended months that triggers a full refit (None never refits)
+        
+        Returns:
+        - Fitted ARIMA model
+        """
+        if not hasattr(self, 'arima_model'):
+            return self.fit_arima_model()
+        
+        series = self.adjusted_series if hasattr(self, 'adjusted_series') else self.time_series
+        new_observations = series[series.index > self.arima_model.fittedvalues.index[-1]]
+        if new_observations.empty:
+            return self.arima_model
+        
+        if refit_every is not None and self.arima_extended + len(new_observations) >= refit_every:
+            return self.fit_arima_model(**self.arima_options)
+        
+        self.arima_model = extend_arima(self.arima_model, new_observations)
+        self.arima_extended += len(new_observations)
         return self.arima_model
     
+    @stage()
+    def update(self, new_data=None, steps=12, refit_every=12):
+        """
+        Bring the model up to date when new months of queries arrive.
+        
+        The new months are appended to the history, outlier flags and the
+        adjusted series are updated, the ARIMA model is extended without
+        re-estimating its parameters (see update_arima_model) and the ARIMA
+        forecast and comparison table are refreshed. The ARIMAX model is
+        refitted; Prophet and Bayesian forecasts are left as they are.
+        
+        Parameters:
+        - new_data: DataFrame with Month, Year and Indexed_Queries columns; when
+          None the template is read again and its new HISTORICAL QUERIES rows are used
+        - steps: Number of months to forecast
+        - refit_every: Number of appended months that triggers a full ARIMA refit
+        
+        Returns:
+        - Dict of result name -> DataFrame with only the new or changed rows,
+          in the layout written to the results store
+        """
+        previous = self._result_frames()
+        
+        if new_data is None:
+            self.template = TemplateReader(self.csv_path)
+            new_data = self.template.historical_queries()
+        
+        appended = self.append_observations(new_data)
+        if appended.empty:
+            return {}
+        
+        if hasattr(self, 'arima_model'):
+            self.update_arima_model(refit_every=refit_every)
+            self.forecast_arima(steps=steps)
+        
+        if hasattr(self, 'arimax_model'):
+            # The ARIMAX sample is short, so it is refitted rather than extended
+            self.exog_regressors = None
+            self.fit_arimax_model(**self.arimax_options)
+            self.forecast_arimax(steps=steps)
+        
+        if hasattr(self, 'comparison'):
+            self.compare_with_factor_model(**self.comparison_options)
+        
+        changes = {}
+        for name, frame in self._result_frames().items():
+            rows = changed_rows(previous.get(name), frame)
+            if not rows.empty:
+                changes[name] = rows
+        return changes
+    
+    @stage()
     def forecast_arima(self, steps=12):
         """
         Generate forecasts using the ARIMA model.
@@ -303,34 +508,98 @@ class EnhancedForecastModel:
         self.arima_forecast = forecast_df
         return forecast_df
     
-    def fit_prophet_model(self):
+    @stage()
+    def fit_arimax_model(self, p=1, d=1, q=1, seasonal_order=(0, 0, 0, 0), regressors=tuple(REGRESSORS),
+                         growth=None, cache_dir=None):
+        """
+        Fit an ARIMAX model with the template's flight searches, hotel guests and
+        media impressions as regressors.
+        
+        Parameters:
+        - p, d, q: ARIMA order of the errors
+        - seasonal_order: Seasonal order (P, D, Q, s)
+        - regressors: Regressors to use (see uk_forecast_exog.REGRESSORS)
+        - growth: Dict of regressor -> yearly growth of projected regressor values
+        - cache_dir: Directory of the fitted-model cache; defaults to the arima
+          subdirectory of the model's result cache (no cache without one)
+        
+        Returns:
+        - Fitted ARIMAX model
+        """
+        # Use adjusted series if available, otherwise use original
+        series = self.adjusted_series if hasattr(self, 'adjusted_series') else self.time_series
+        
+        # The design matrix is aligned once and reused for every fit and forecast
+        if getattr(self, 'exog_regressors', None) != tuple(regressors):
+            self.exog_matrix = design_matrix(self.template, regressors)
+            self.exog_regressors = tuple(regressors)
+        
+        arima_cache_dir = self._model_cache_dir(cache_dir, 'arima')
+        cache = ArimaCache(arima_cache_dir) if arima_cache_dir is not None else None
+        self.arimax_model = fit_arimax(
+            series, self.exog_matrix, (p, d, q), seasonal_order, growth=growth, cache=cache
+        )
+        self.arimax_options = {'p': p, 'd': d, 'q': q, 'seasonal_order': seasonal_order,
+                               'regressors': tuple(regressors), 'growth': growth, 'cache_dir': cache_dir}
+        return self.arimax_model
+    
+    @stage()
+    def forecast_arimax(self, steps=12, planned_impressions=None):
+        """
+        Generate forecasts using the ARIMAX model.
+        
+        Parameters:
+        - steps: Number of steps to forecast
+        - planned_impressions: Optional media plan (12 monthly impressions in
+          calendar order) replacing the template's planned impressions
+        
+        Returns:
+        - DataFrame with forecasts and confidence intervals
+        """
+        # Fit ARIMAX model if not already done
+        if not hasattr(self, 'arimax_model'):
+            self.fit_arimax_model()
+        
+        forecast_df = forecast_arimax(
+            self.arimax_model, self.exog_matrix, steps=steps,
+            planned_impressions=planned_impressions, growth=self.arimax_options['growth']
+        )
+        
+        self.arimax_forecast = forecast_df
+        return forecast_df
+    
+    @stage()
+    def fit_prophet_model(self, cache_dir=None, warm_start_months=1):
         """
         Fit a Prophet model to the adjusted time series.
         
+        With a cache, fitted models are kept on disk, and when the series only
+        gained a month since the template's previous fit, Stan's optimizer is
+        started from the previous parameters (see uk_forecast_prophet).
+        
+        Parameters:
+        - cache_dir: Directory of the fitted-model cache; defaults to the prophet
+          subdirectory of the model's result cache (no cache or warm starts without one)
+        - warm_start_months: Largest number of new months fitted from the previous parameters
+        
         Returns:
         - Fitted Prophet model
         """
-        if not prophet_available:
+        if load_prophet() is None:
             print("Prophet not available. Skipping Prophet forecasting.")
             return None
         
         # Use adjusted series if available, otherwise use original
         series = self.adjusted_series if hasattr(self, 'adjusted_series') else self.time_series
         
-        # Prepare data for Prophet
-        df = pd.DataFrame({
-            'ds': series.index,
-            'y': series.values
-        })
-        
-        # Fit Prophet model
-        model = Prophet(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
-        model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
-        model.fit(df)
-        
-        self.prophet_model = model
-        return model
+        # Warm starts are kept per template; series without one are always fitted cold
+        name = os.path.abspath(self.csv_path) if self.csv_path is not None else None
+        prophet_cache_dir = self._model_cache_dir(cache_dir, 'prophet')
+        cache = ProphetCache(prophet_cache_dir) if prophet_cache_dir is not None else None
+        self.prophet_model = fit_prophet(series, name=name, cache=cache, warm_start_months=warm_start_months)
+        return self.prophet_model
     
+    @stage()
     def forecast_prophet(self, periods=12):
         """
         Generate forecasts using the Prophet model.
@@ -341,7 +610,7 @@ class EnhancedForecastModel:
         Returns:
         - DataFrame with forecasts and confidence intervals
         """
-        if not prophet_available:
+        if load_prophet() is None:
             print("Prophet not available. Skipping Prophet forecasting.")
             return None
         
@@ -349,37 +618,34 @@ class EnhancedForecastModel:
         if not hasattr(self, 'prophet_model'):
             self.fit_prophet_model()
         
-        # Create future dataframe
-        future = self.prophet_model.make_future_dataframe(periods=periods, freq='MS')
-        
-        # Generate forecast
-        forecast = self.prophet_model.predict(future)
-        
-        # Extract relevant columns
-        prophet_forecast = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(periods)
-        prophet_forecast = prophet_forecast.rename(columns={
-            'ds': 'Date',
-            'yhat': 'Prophet_Forecast',
-            'yhat_lower': 'Lower_CI',
-            'yhat_upper': 'Upper_CI'
-        })
-        prophet_forecast = prophet_forecast.set_index('Date')
-        
-        self.prophet_forecast = prophet_forecast
-        return prophet_forecast
+        self.prophet_forecast = prophet_forecast(self.prophet_model, periods=periods)
+        return self.prophet_forecast
     
-    def bayesian_forecast(self, periods=12, samples=1000):
+    @stage()
+    def bayesian_forecast(self, periods=12, samples=1000, fan_levels=(0.5, 0.8, 0.95),
+                          backend='auto', seasonal=False, random_state=BAYESIAN_SEED):
         """
         Generate forecasts using Bayesian methods.
         
         Parameters:
         - periods: Number of periods to forecast
         - samples: Number of samples for the Bayesian model
+        - fan_levels: Central interval widths reported as fan chart bands
+        - backend: 'pymc3' (MCMC), 'conjugate' (closed-form NumPy posterior) or
+          'auto' (PyMC3 when installed, otherwise conjugate)
+        - seasonal: Add an annual Fourier seasonal term (conjugate backend only)
+        - random_state: Seed of the posterior sampling and path simulation; the
+          default fixed seed makes reruns reproducible (None for fresh draws)
         
         Returns:
-        - DataFrame with forecasts and credible intervals
+        - DataFrame with forecasts, 95% credible intervals and fan chart bands
         """
-        if not pymc3_available:
+        if backend == 'auto':
+            backend = 'pymc3' if not seasonal and load_pymc3() is not None else 'conjugate'
+        if backend not in ('pymc3', 'conjugate'):
+            raise ValueError(f"Unknown Bayesian backend: {backend}")
+        pm = load_pymc3() if backend == 'pymc3' else None
+        if backend == 'pymc3' and pm is None:
             print("PyMC3 not available. Skipping Bayesian forecasting.")
             return None
         
@@ -388,130 +654,76 @@ class EnhancedForecastModel:
         
         # Prepare data
         data = series.values
-        T = len(data)
+        forecast_index = pd.date_range(start=series.index[-1], periods=periods+1, freq='MS')[1:]
         
-        # Define the Bayesian model
-        with pm.Model() as model:
-            # Define priors for the parameters
-            sigma = pm.HalfCauchy('sigma', beta=10)
-            
-            # Define the AR(1) process
-            alpha = pm.Normal('alpha', mu=0, sigma=10)
-            beta = pm.Normal('beta', mu=0.9, sigma=0.1)
-            
-            # Define the likelihood
-            obs = pm.AR('obs', alpha, beta, sigma=sigma, observed=data)
-            
-            # Sample from the posterior
-            trace = pm.sample(samples, tune=1000, return_inferencedata=False)
-        
-        # Generate forecasts
-        last_value = data[-1]
-        forecasts = []
-        lower_cis = []
-        upper_cis = []
-        
-        # Extract posterior samples
-        alpha_samples = trace['alpha']
-        beta_samples = trace['beta']
-        sigma_samples = trace['sigma']
-        
-        # Generate forecasts for each period
-        for i in range(periods):
-            # Generate forecast samples
-            forecast_samples = alpha_samples + beta_samples * last_value + np.random.normal(0, sigma_samples)
-            
-            # Calculate forecast and credible intervals
-            forecast = np.mean(forecast_samples)
-            lower_ci = np.percentile(forecast_samples, 2.5)
-            upper_ci = np.percentile(forecast_samples, 97.5)
-            
-            # Store results
-            forecasts.append(forecast)
-            lower_cis.append(lower_ci)
-            upper_cis.append(upper_ci)
+        def sample_paths():
+            rng = np.random.default_rng(random_state)
+            seasonal_effects = None
+            if backend == 'conjugate':
+                # Sample the Normal-Inverse-Gamma posterior of the AR(1) model directly
+                months = series.index.month if seasonal else None
+                trace = sample_ar1_posterior(data, draws=samples, months=months, random_state=rng)
+                if seasonal:
+                    seasonal_effects = trace['seasonal'] @ fourier_terms(forecast_index.month).T
+            else:
+                # Define the Bayesian model
+                with pm.Model() as model:
+                    # Define priors for the parameters
+                    sigma = pm.HalfCauchy('sigma', beta=10)
+                    
+                    # Define the AR(1) process
+                    alpha = pm.Normal('alpha', mu=0, sigma=10)
+                    beta = pm.Normal('beta', mu=0.9, sigma=0.1)
+                    
+                    # Define the likelihood
+                    obs = pm.AR('obs', alpha, beta, sigma=sigma, observed=data)
+                    
+                    # Sample from the posterior
+                    trace = pm.sample(samples, tune=1000, random_seed=random_state, return_inferencedata=False)
             
-            # Update last value for next period
-            last_value = forecast
+            # Propagate every posterior draw as its own trajectory
+            return simulate_ar_paths(
+                trace['alpha'], trace['beta'], trace['sigma'], data[-1], periods,
+                seasonal_effects=seasonal_effects, random_state=rng
+            )
         
-        # Create forecast DataFrame
-        forecast_index = pd.date_range(start=series.index[-1], periods=periods+1, freq='MS')[1:]
-        bayesian_forecast = pd.DataFrame({
-            'Bayesian_Forecast': forecasts,
-            'Lower_CI': lower_cis,
-            'Upper_CI': upper_cis
-        }, index=forecast_index)
+        self.bayesian_paths = self._cached(
+            'bayesian_paths', sample_paths, series, periods, samples, backend, seasonal, random_state,
+            libraries=('pymc3', 'theano') if backend == 'pymc3' else ()
+        )
         
-        self.bayesian_forecast = bayesian_forecast
+        # Posterior mean, credible interval and fan chart bands
+        bayesian_forecast = summarize_paths(self.bayesian_paths, forecast_index, fan_levels=fan_levels)
+        
+        self.bayes_forecast = bayesian_forecast
         return bayesian_forecast
     
-    def compare_with_factor_model(self, factor_model_path):
+    @stage()
+    def compare_with_factor_model(self, factor_model_path, recompute=False):
         """
         Compare the statistical forecasts with the factor-based model.
         
         Parameters:
         - factor_model_path: Path to the factor-based model CSV file
+        - recompute: Compute the factor forecast from the template inputs with
+          FactorModel instead of reading the FORECAST RESULTS section
         
         Returns:
         - DataFrame with comparison of forecasts
         """
-        # Read the factor-based model CSV
-        with open(factor_model_path, 'r') as file:
-            content = file.read()
-        
-        # Split the content by section markers
-        sections = content.split('====================')
-        
-        # Find the forecast results section
-        forecast_section = None
-        for section in sections:
-            if 'FORECAST RESULTS' in section:
-                forecast_section = section
-                break
-        
-        if forecast_section is None:
-            raise ValueError("Forecast results section not found in the CSV file")
-        
-        # Parse the forecast results section
-        lines = forecast_section.strip().split('\n')
-        
-        # Skip the header lines
-        data_lines = []
-        for line in lines:
-            if 'Month,2024 Queries,Conservative,Moderate,Ambitious' in line:
-                continue
-            if line.strip() and ',' in line:
-                data_lines.append(line)
-        
-        # Create a DataFrame
-        data = []
-        for line in data_lines:
-            parts = line.split(',')
-            if len(parts) >= 5 and parts[1].strip() and parts[2].strip() and parts[3].strip() and parts[4].strip():
-                month = parts[0].strip()
-                queries_2024 = float(parts[1].strip())
-                conservative = float(parts[2].strip())
-                moderate = float(parts[3].strip())
-                ambitious = float(parts[4].strip())
-                data.append({
-                    'Month': month,
-                    '2024_Queries': queries_2024,
-                    'Conservative': conservative,
-                    'Moderate': moderate,
-                    'Ambitious': ambitious
-                })
-        
-        factor_forecast = pd.DataFrame(data)
-        
-        # Create a date column for 2025
-        factor_forecast['Date'] = pd.to_datetime(
-            '2025-' + 
-            factor_forecast['Month'].apply(lambda x: {
-                'January': '01', 'February': '02', 'March': '03', 'April': '04',
-                'May': '05', 'June': '06', 'July': '07', 'August': '08',
-                'September': '09', 'October': '10', 'November': '11', 'December': '12'
-            }[x]) + '-01'
-        )
+        self.comparison_options = {'factor_model_path': factor_model_path, 'recompute': recompute}
+        
+        # Reuse the already indexed template when comparing against itself
+        if self.csv_path is not None and os.path.abspath(factor_model_path) == os.path.abspath(self.csv_path):
+            reader = self.template
+        else:
+            reader = TemplateReader(factor_model_path)
+        
+        if recompute:
+            factor_forecast = FactorModel.from_template(reader).forecast_results()
+        else:
+            # Read the monthly rows of the forecast results section
+            factor_forecast = reader.forecast_results()
         
         # Set the date as index
         factor_forecast = factor_forecast.set_index('Date')
@@ -528,6 +740,12 @@ class EnhancedForecastModel:
             comparison['ARIMA_Lower_CI'] = self.arima_forecast['Lower_CI']
             comparison['ARIMA_Upper_CI'] = self.arima_forecast['Upper_CI']
         
+        # Add ARIMAX forecast if available
+        if hasattr(self, 'arimax_forecast'):
+            comparison['ARIMAX_Forecast'] = self.arimax_forecast['ARIMAX_Forecast']
+            comparison['ARIMAX_Lower_CI'] = self.arimax_forecast['Lower_CI']
+            comparison['ARIMAX_Upper_CI'] = self.arimax_forecast['Upper_CI']
+        
         # Add Prophet forecast if available
         if hasattr(self, 'prophet_forecast'):
             comparison['Prophet_Forecast'] = self.prophet_forecast['Prophet_Forecast']
@@ -535,95 +753,135 @@ class EnhancedForecastModel:
             comparison['Prophet_Upper_CI'] = self.prophet_forecast['Upper_CI']
         
         # Add Bayesian forecast if available
-        if hasattr(self, 'bayesian_forecast'):
-            comparison['Bayesian_Forecast'] = self.bayesian_forecast['Bayesian_Forecast']
-            comparison['Bayesian_Lower_CI'] = self.bayesian_forecast['Lower_CI']
-            comparison['Bayesian_Upper_CI'] = self.bayesian_forecast['Upper_CI']
+        if hasattr(self, 'bayes_forecast'):
+            comparison['Bayesian_Forecast'] = self.bayes_forecast['Bayesian_Forecast']
+            comparison['Bayesian_Lower_CI'] = self.bayes_forecast['Lower_CI']
+            comparison['Bayesian_Upper_CI'] = self.bayes_forecast['Upper_CI']
         
         self.comparison = comparison
         return comparison
-    
-    def plot_outliers(self):
-        """Plot the time series with outliers highlighted."""
-        if not hasattr(self, 'outliers'):
-            self.detect_outliers()
-        
-        plt.figure(figsize=(12, 6))
-        plt.plot(self.time_series.index, self.time_series.values, 'b-', label='Original Data')
-        plt.scatter(self.outliers.index, self.outliers['Indexed_Queries'], color='red', label='Outliers')
+
+    @stage()
+    def backtest(self, models=BACKTEST_MODELS, initial=36, horizon=12, step=1, window='expanding',
+                 arima_order=(1, 1, 1), seasonal_order=(0, 0, 0, 0), scenario='Moderate', naive_growth=None,
+                 workers=None):
+        """
+        Rolling-origin backtest of the forecast models on the historical series.
+
+        Parameters:
+        - models: Models to evaluate ('arima', 'prophet', 'bayesian', 'seasonal_naive')
+        - initial: Size of the first training window
+        - horizon: Number of months forecast from each origin
+        - step: Months between consecutive origins
+        - window: 'expanding' or 'rolling' training window
+        - arima_order, seasonal_order: ARIMA orders
+        - scenario: Template scenario whose base growth factor grows the seasonal naive baseline
+        - naive_growth: Annual growth of the seasonal naive baseline, instead of the
+          scenario's; models without a template use no growth by default
+        - workers: Number of worker processes (defaults to the number of cores)
+
+        Returns:
+        - Tuple of (fold forecasts DataFrame, metrics per model and horizon)
+        """
+        # Use the adjusted series if available, otherwise use the original
+        series = self.adjusted_series if hasattr(self, 'adjusted_series') else self.time_series
+
+        if naive_growth is None:
+            naive_growth = 0.0
+            if self.template is not None and 'PARAMETERS' in self.template:
+                parameters = self.template.section('PARAMETERS').set_index('Parameter')
+                naive_growth = float(parameters.loc['Base Growth Factor', scenario])
+
+        forecasts, metrics = backtest(
+            series, models=models, initial=initial, horizon=horizon, step=step, window=window,
+            arima_order=arima_order, seasonal_order=seasonal_order,
+            naive_growth=naive_growth, workers=workers
+        )
+
+        self.backtest_forecasts = forecasts
+        self.backtest_metrics = metrics
+        return forecasts, metrics
+
+    def _save_figure(self, path, stage, draw, *parts, **options):
+        """
+        Render a chart headlessly and save it as a PNG file.
         
-        if hasattr(self, 'adjusted_series'):
-            plt.plot(self.adjusted_series.index, self.adjusted_series.values, 'g--', label='Adjusted Data')
+        The PNG records a hash of the plotted data; if the file at path already
+        shows the same data it is left as it is. Rendered images are also kept
+        in the result cache.
         
-        plt.title('Time Series with Outliers')
-        plt.xlabel('Date')
-        plt.ylabel('Indexed Queries')
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
+        Parameters:
+        - path: Output file
+        - stage: Cache stage name of the plot
+        - draw: Function from uk_forecast_charts drawing on an Axes
+        - parts: Data shown in the plot, passed on to draw
+        - options: Keyword arguments passed on to draw
         
-        # Save the plot
-        plt.savefig('uk_outliers_detection.png')
-        plt.close()
+        Returns:
+        - True if the file was written, False if it was up to date
+        """
+        data_hash = ResultCache(None).key(stage, *parts, options, library_versions('matplotlib'))
+        render = functools.partial(render_png, draw, *parts, data_hash=data_hash, **options)
+        return save_chart(path, lambda: self._cached(stage, render, data_hash), data_hash)
     
-    def plot_forecasts(self):
-        """Plot the forecasts from different models."""
-        if not hasattr(self, 'comparison'):
-            raise ValueError("No comparison data available. Run compare_with_factor_model first.")
+    @stage()
+    def plot_outliers(self, path='uk_outliers_detection.png', market='UK'):
+        """
+        Plot the time series with outliers highlighted.
         
-        plt.figure(figsize=(12, 6))
+        Parameters:
+        - path: Output PNG file
+        - market: Market named in the chart title
         
-        # Plot historical data
-        plt.plot(self.time_series.index, self.time_series.values, 'b-', label='Historical Data')
+        Returns:
+        - True if the file was written, False if it already showed the same data
+        """
+        if not hasattr(self, 'outliers'):
+            self.detect_outliers()
         
-        # Plot factor-based forecasts
-        plt.plot(self.comparison.index, self.comparison['Factor_Conservative'], 'g--', label='Factor Conservative')
-        plt.plot(self.comparison.index, self.comparison['Factor_Moderate'], 'g-', label='Factor Moderate')
-        plt.plot(self.comparison.index, self.comparison['Factor_Ambitious'], 'g:', label='Factor Ambitious')
+        return self._save_figure(
+            path, 'plot_outliers', draw_outliers,
+            self.time_series, self.outliers.set_index('Date')[['Indexed_Queries']],
+            getattr(self, 'adjusted_series', None),
+            title=f'{market} Time Series with Outliers'
+        )
+    
+    @stage()
+    def plot_forecasts(self, path='uk_forecast_comparison.png', market='UK'):
+        """
+        Plot the forecasts from different models.
         
-        # Plot ARIMA forecast if available
-        if 'ARIMA_Forecast' in self.comparison.columns:
-            plt.plot(self.comparison.index, self.comparison['ARIMA_Forecast'], 'r-', label='ARIMA Forecast')
-            plt.fill_between(
-                self.comparison.index,
-                self.comparison['ARIMA_Lower_CI'],
-                self.comparison['ARIMA_Upper_CI'],
-                color='r', alpha=0.1, label='ARIMA 95% CI'
-            )
+        Parameters:
+        - path: Output PNG file
+        - market: Market named in the chart title
         
-        # Plot Prophet forecast if available
-        if 'Prophet_Forecast' in self.comparison.columns:
-            plt.plot(self.comparison.index, self.comparison['Prophet_Forecast'], 'm-', label='Prophet Forecast')
-            plt.fill_between(
-                self.comparison.index,
-                self.comparison['Prophet_Lower_CI'],
-                self.comparison['Prophet_Upper_CI'],
-                color='m', alpha=0.1, label='Prophet 95% CI'
-            )
+        Returns:
+        - True if the file was written, False if it already showed the same data
+        """
+        if not hasattr(self, 'comparison'):
+            raise ValueError("No comparison data available. Run compare_with_factor_model first.")
         
-        # Plot Bayesian forecast if available
-        if 'Bayesian_Forecast' in self.comparison.columns:
-            plt.plot(self.comparison.index, self.comparison['Bayesian_Forecast'], 'c-', label='Bayesian Forecast')
-            plt.fill_between(
-                self.comparison.index,
-                self.comparison['Bayesian_Lower_CI'],
-                self.comparison['Bayesian_Upper_CI'],
-                color='c', alpha=0.1, label='Bayesian 95% CI'
-            )
+        return self._save_figure(
+            path, 'plot_forecasts', draw_forecasts, self.time_series, self.comparison,
+            title=f'{market} Travel Queries Forecast Comparison'
+        )
+    
+    @stage()
+    def save_results(self, store_dir=None, market='UK', variant='Base'):
+        """
+        Save the results.
         
-        plt.title('UK Travel Queries Forecast Comparison')
-        plt.xlabel('Date')
-        plt.ylabel('Indexed Queries')
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
+        Parameters:
+        - store_dir: Directory of a Parquet results store to append this run to;
+          when None the results are written to CSV files in the working directory
+        - market, variant: Market and scenario variant recorded in the store
+        
+        Returns:
+        - The run id when writing to a store
+        """
+        if store_dir is not None:
+            return self._store_results(ResultsStore(store_dir), market, variant)
         
-        # Save the plot
-        plt.savefig('uk_forecast_comparison.png')
-        plt.close()
-    
-    def save_results(self):
-        """Save the results to CSV files."""
         # Save the comparison data
         if hasattr(self, 'comparison'):
             self.comparison.to_csv('uk_forecast_comparison.csv')
@@ -640,21 +898,80 @@ class EnhancedForecastModel:
         if hasattr(self, 'arima_forecast'):
             self.arima_forecast.to_csv('uk_arima_forecast.csv')
         
+        # Save the ARIMAX forecast
+        if hasattr(self, 'arimax_forecast'):
+            self.arimax_forecast.to_csv('uk_arimax_forecast.csv')
+        
         # Save the Prophet forecast
         if hasattr(self, 'prophet_forecast'):
             self.prophet_forecast.to_csv('uk_prophet_forecast.csv')
         
         # Save the Bayesian forecast
-        if hasattr(self, 'bayesian_forecast'):
-            self.bayesian_forecast.to_csv('uk_bayesian_forecast.csv')
+        if hasattr(self, 'bayes_forecast'):
+            self.bayes_forecast.to_csv('uk_bayesian_forecast.csv')
+
+    @stage()
+    def save_updates(self, changes, store_dir=DEFAULT_STORE_DIR, market='UK', variant='Base'):
+        """
+        Append the rows changed by update() to a results store.
+        
+        Only the changed rows are written; read the store with latest='row' to
+        combine them with the earlier runs.
+        
+        Returns:
+        - The run id, or None when nothing changed
+        """
+        if not changes:
+            return None
+        return ResultsStore(store_dir).write_run(changes, market=market, variant=variant)
+    
+    def _store_results(self, store, market, variant):
+        """Append the forecasts and outlier flags of this run to a results store."""
+        return store.write_run(self._result_frames(), market=market, variant=variant)
+    
+    def _result_frames(self):
+        """Forecasts and outlier flags as frames indexed by date, one per model."""
+        frames = comparison_frames(self.comparison) if hasattr(self, 'comparison') else {}
+        
+        # The full model outputs take precedence over their comparison columns
+        if hasattr(self, 'arima_forecast'):
+            frames['arima'] = self.arima_forecast.rename(columns={'ARIMA_Forecast': 'Forecast'})
+        if hasattr(self, 'arimax_forecast'):
+            frames['arimax'] = self.arimax_forecast.rename(columns={'ARIMAX_Forecast': 'Forecast'})
+        if hasattr(self, 'prophet_forecast'):
+            frames['prophet'] = self.prophet_forecast.rename(columns={'Prophet_Forecast': 'Forecast'})
+        if hasattr(self, 'bayes_forecast'):
+            frames['bayesian'] = self.bayes_forecast.rename(columns={'Bayesian_Forecast': 'Forecast'})
+        
+        if hasattr(self, 'outliers'):
+            outliers = self.time_series.to_frame('Indexed_Queries')
+            outliers['Outlier'] = self.time_series.index.isin(self.outliers['Date']).astype(float)
+            if hasattr(self, 'adjusted_series'):
+                outliers['Adjusted_Queries'] = self.adjusted_series
+            frames['outliers'] = outliers
+        
+        return frames
 
 def main():
     """Main function to run the enhanced forecast model."""
+    parser = argparse.ArgumentParser(description="Run the enhanced UK travel queries forecast model.")
+    parser.add_argument('--report', default=None,
+                        help="Write a JSON run report with the time and memory of every stage to this path")
+    parser.add_argument('--profile', choices=PROFILERS, default=None,
+                        help="Profile the run with cProfile or the pyinstrument sampling profiler")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Record the peak Python allocations of every stage (slower)")
+    args = parser.parse_args()
+    
     # Define paths
     aligned_model_path = 'Travel_Queries_Forecast_UK_Aligned.csv'
     
-    # Create the enhanced forecast model
-    model = EnhancedForecastModel(aligned_model_path)
+    profile = None
+    if args.report or args.profile or args.trace_memory:
+        profile = RunProfile('UK_Aligned', profiler=args.profile, trace_memory=args.trace_memory).start()
+    
+    # Create the enhanced forecast model; unchanged stages are loaded from the cache
+    model = EnhancedForecastModel(aligned_model_path, cache_dir=RESULT_CACHE_DIR, profile=profile)
     
     # Detect and adjust outliers
     print("Detecting and adjusting outliers...")
@@ -667,16 +984,20 @@ def main():
     model.fit_arima_model(p=1, d=1, q=1)
     model.forecast_arima(steps=12)
     
+    # Fit ARIMAX model with flight searches, hotel guests and media impressions
+    print("Fitting ARIMAX model and generating forecast...")
+    model.fit_arimax_model(p=1, d=1, q=1)
+    model.forecast_arimax(steps=12)
+    
     # Fit Prophet model and generate forecast if available
-    if prophet_available:
+    if load_prophet() is not None:
         print("Fitting Prophet model and generating forecast...")
         model.fit_prophet_model()
         model.forecast_prophet(periods=12)
     
-    # Generate Bayesian forecast if available
-    if pymc3_available:
-        print("Generating Bayesian forecast...")
-        model.bayesian_forecast(periods=12, samples=1000)
+    # Generate Bayesian forecast (closed-form backend when PyMC3 is not available)
+    print("Generating Bayesian forecast...")
+    model.bayesian_forecast(periods=12, samples=1000)
     
     # Compare with factor-based model
     print("Comparing with factor-based model...")
@@ -686,9 +1007,19 @@ def main():
     print("Plotting forecasts...")
     model.plot_forecasts()
     
-    # Save results
+    # Append the results of this run to the results store
     print("Saving results...")
-    model.save_results()
+    run_id = model.save_results(store_dir=DEFAULT_STORE_DIR, market='UK', variant='Aligned')
+    print(f"Results saved to {DEFAULT_STORE_DIR} as run {run_id}")
+    
+    if profile is not None:
+        profile.stop()
+        print(profile.stages().round(3).to_string())
+        if profile.profiler_output:
+            print(f"Profile saved to {profile.profiler_output}")
+        if args.report:
+            profile.write_report(args.report)
+            print(f"Run report saved to {args.report}")
     
     print("Done!")
 
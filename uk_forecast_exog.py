@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Exogenous Regressors for ARIMAX Forecasts
+
+Aligns the FLIGHT SEARCHES, HOTEL GUESTS and MEDIA IMPRESSIONS sections of a
+forecast template into one monthly design matrix, for regression with ARIMA
+errors (ARIMAX/SARIMAX) on the indexed queries. Regressors are log values, so
+their coefficients are elasticities, in line with the logarithmic media
+response of the factor model.
+
+The sections cover fewer years than HISTORICAL QUERIES, so the model is fitted
+from the first month in which every regressor is known. Months without a value
+after that (the newest actual month and the forecast horizon) are projected
+from the same month of the previous year, optionally grown. Media impressions
+use the planned impressions of the forecast year, which is what makes the
+forecast respond to the media plan.
+
+The design matrix is built once per template, and a fitted model forecasts any
+number of media plans without being refitted.
+
+Usage:
+    from uk_forecast_exog import design_matrix, fit_arimax, forecast_arimax
+
+    matrix = design_matrix('Travel_Queries_Forecast_UK_Aligned.csv')
+    results = fit_arimax(series, matrix)
+    forecast = forecast_arimax(results, matrix, steps=12)
+"""
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_arima import fit_arima
+from uk_forecast_template import MONTH_NAMES, TemplateReader, month_start_dates
+
+# Regressor name -> (template section, value column); media impressions are one column per year
+REGRESSORS = {
+    'Flight_Searches': ('FLIGHT SEARCHES', 'Flight Searches'),
+    'Hotel_Guests': ('HOTEL GUESTS', 'Hotel Guests'),
+    'Media_Impressions': ('MEDIA IMPRESSIONS', None),
+}
+
+_IMPRESSIONS_COLUMN = r'^(\d{4}) (?:Planned )?Impressions$'
+
+
+def design_matrix(template, regressors=tuple(REGRESSORS)):
+    """
+    Monthly design matrix of the regressor sections of a template.
+
+    Parameters:
+    - template: TemplateReader or path of the template CSV
+    - regressors: Names of the regressors to include (see REGRESSORS); missing sections are skipped
+
+    Returns:
+    - DataFrame of log values indexed by month start, one column per regressor,
+      with NaN where a section has no value for a month
+    """
+    reader = template if isinstance(template, TemplateReader) else TemplateReader(template)
+
+    columns = {}
+    for name in regressors:
+        section, column = REGRESSORS[name]
+        if section not in reader:
+            continue
+        data = reader.section(section)
+        if column is None:
+            # One column per year, e.g. '2024 Impressions' and '2025 Planned Impressions'
+            data = data.melt(id_vars='Month', var_name='Column', value_name='Value')
+            years = data['Column'].str.extract(_IMPRESSIONS_COLUMN)[0]
+            data = data[years.notna()].assign(Year=years[years.notna()].astype(int))
+        else:
+            data = data.rename(columns={column: 'Value'})
+        data = data.dropna(subset=['Value'])
+        columns[name] = pd.Series(
+            np.log(data['Value'].to_numpy(dtype=float)),
+            index=month_start_dates(data['Month'], data['Year'].to_numpy())
+        ).sort_index()
+
+    if not columns:
+        raise ValueError("The template has no regressor sections")
+    return pd.DataFrame(columns).asfreq('MS')
+
+
+def extend_regressors(matrix, dates, growth=None):
+    """
+    Regressor values for the given months, projecting missing ones.
+
+    A missing value is the value of the same month one year earlier, grown by
+    the regressor's growth rate.
+
+    Parameters:
+    - matrix: Design matrix from design_matrix
+    - dates: Months to return
+    - growth: Dict of regressor name -> yearly growth rate of the projection (default 0)
+
+    Returns:
+    - DataFrame of log values indexed by dates
+    """
+    growth = growth or {}
+    index = matrix.index.union(pd.DatetimeIndex(dates))
+    extended = matrix.reindex(pd.date_range(index[0], index[-1], freq='MS'))
+
+    values = extended.to_numpy(dtype=float, copy=True)
+    shift = np.log1p(np.array([growth.get(name, 0.0) for name in extended.columns]))
+    # Rows are filled in date order so projections can build on projections
+    for row in np.flatnonzero(np.isnan(values).any(axis=1)):
+        if row >= 12:
+            missing = np.isnan(values[row])
+            values[row, missing] = values[row - 12, missing] + shift[missing]
+    extended = pd.DataFrame(values, index=extended.index, columns=extended.columns)
+    return extended.reindex(pd.DatetimeIndex(dates))
+
+
+def fit_arimax(series, matrix, order=(1, 1, 1), seasonal_order=(0, 0, 0, 0), growth=None, cache=None,
+               **fit_options):
+    """
+    Fit a regression with ARIMA errors on the regressors of a design matrix.
+
+    The sample starts at the first month in which every regressor is known and
+    ends with the series; regressor gaps after the start are projected.
+
+    Parameters:
+    - series: Indexed queries with a monthly DatetimeIndex
+    - matrix: Design matrix from design_matrix
+    - order, seasonal_order: ARIMA orders
+    - growth: Growth rates of projected regressor values (see extend_regressors)
+    - cache: ArimaCache instance, or None to always fit
+    - fit_options: Keyword arguments passed to ARIMA.fit
+
+    Returns:
+    - Fitted ARIMAResults
+    """
+    complete = matrix.dropna()
+    if complete.empty:
+        raise ValueError("No month has a value for every regressor")
+    series = series[series.index >= complete.index[0]]
+    exog = extend_regressors(matrix, series.index, growth)
+    return fit_arima(series, order, seasonal_order, cache=cache, exog=exog, **fit_options)
+
+
+def forecast_arimax(results, matrix, steps=12, planned_impressions=None, growth=None, alpha=0.05):
+    """
+    Forecast from a fitted ARIMAX model.
+
+    Parameters:
+    - results: Fitted ARIMAResults from fit_arimax
+    - matrix: Design matrix the model was fitted with
+    - steps: Number of months to forecast
+    - planned_impressions: Optional media plan replacing the template's, as 12
+      monthly impressions in calendar order or a Series indexed by month start
+    - growth: Growth rates of projected regressor values (see extend_regressors)
+    - alpha: Significance level of the intervals
+
+    Returns:
+    - DataFrame with ARIMAX_Forecast, Lower_CI and Upper_CI indexed by month
+    """
+    last = results.fittedvalues.index[-1]
+    dates = pd.date_range(start=last, periods=steps + 1, freq='MS')[1:]
+
+    if planned_impressions is not None and 'Media_Impressions' in matrix:
+        matrix = matrix.copy()
+        if not isinstance(planned_impressions, pd.Series):
+            months = pd.Series(np.asarray(planned_impressions, dtype=float), index=MONTH_NAMES)
+            planned_impressions = pd.Series(
+                months[[MONTH_NAMES[month - 1] for month in dates.month]].to_numpy(), index=dates
+            )
+        matrix = matrix.reindex(matrix.index.union(planned_impressions.index))
+        matrix.loc[planned_impressions.index, 'Media_Impressions'] = np.log(planned_impressions.to_numpy(dtype=float))
+
+    # exog_names also holds the trend column ('const') that ARIMA adds to undifferenced models,
+    # which is not a regressor of the design matrix
+    exog = extend_regressors(matrix, dates, growth)[list(matrix.columns)]
+    prediction = results.get_forecast(steps=steps, exog=exog)
+    interval = np.asarray(prediction.conf_int(alpha=alpha))
+    return pd.DataFrame({
+        'ARIMAX_Forecast': np.asarray(prediction.predicted_mean),
+        'Lower_CI': interval[:, 0],
+        'Upper_CI': interval[:, 1]
+    }, index=dates)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Factor-Based Multiplier Model
+
+Computes the factor forecast described in UK_Forecast_Multipliers.md directly
+from the input sections of a forecast template (HISTORICAL QUERIES, SEASONALITY
+INDEX, MEDIA IMPRESSIONS, FLIGHT SEARCHES, BRAND HEALTH and PARAMETERS):
+
+    Media Multiplier        = 1 + Media Effectiveness * LOG10(1 + Planned Impressions / Current Impressions)
+    Flight Search Factor    = 1 + Flight Search Correlation * Flight Search Growth
+    Brand Health Multiplier = 1 + Brand Health Coefficient * Brand Growth
+    Forecast                = Base * (1 + Base Growth) * Seasonality Index * Media * Flight * Brand Health
+
+Brand Growth is the relative growth from the current to the target Consideration.
+Templates with Intent/Consideration weights in ENHANCED MODEL PARAMETERS use the
+weighted Intent and Consideration growth, and a Conversion Efficiency Factor when
+a baseline conversion ratio is given.
+
+Parameters are arrays with a trailing scenario axis and months are the last
+axis of every result, so any number of what-if parameter sets is evaluated in
+one vectorized call.
+
+Usage:
+    from uk_forecast_factor import FactorModel
+
+    model = FactorModel.from_template('Travel_Queries_Forecast_UK_Aligned.csv')
+    results = model.forecast_results()
+    what_if = model.compute(media_effectiveness=[[0.05, 0.08, 0.12], [0.10, 0.15, 0.20]])
+"""
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_template import MONTH_NAMES, TemplateReader, month_start_dates
+
+SCENARIOS = ('Conservative', 'Moderate', 'Ambitious')
+
+# Model parameters and their row in the PARAMETERS section
+PARAMETER_ROWS = {
+    'growth': 'Base Growth Factor',
+    'consideration_target': 'Brand Consideration Target',
+    'intent_target': 'Brand Intent Target',
+    'media_effectiveness': 'Media Effectiveness Multiplier',
+    'flight_correlation': 'Flight Search Correlation',
+    'brand_coefficient': 'Brand Health Coefficient',
+}
+
+# Month-level inputs that can be overridden in what-if runs
+MONTHLY_INPUTS = ('seasonality', 'current_impressions', 'planned_impressions', 'flight_growth')
+
+# Weights of the brand metrics in the Brand Health Multiplier
+BRAND_WEIGHTS = ('intent_weight', 'consideration_weight')
+
+
+def media_multiplier(planned_impressions, current_impressions, media_effectiveness):
+    """Media Multiplier from planned and current impressions (Excel LOG, base 10)."""
+    return 1 + media_effectiveness * np.log10(1 + planned_impressions / current_impressions)
+
+
+def flight_search_factor(flight_growth, flight_correlation):
+    """Flight Search Factor from the year-on-year growth of flight searches."""
+    return 1 + flight_correlation * flight_growth
+
+
+def brand_health_multiplier(brand_growth, brand_coefficient):
+    """Brand Health Multiplier from the projected brand metric growth."""
+    return 1 + brand_coefficient * brand_growth
+
+
+class FactorModel:
+    def __init__(self, base, seasonality, current_impressions, planned_impressions, flight_growth,
+                 consideration, parameters, intent=None, intent_weight=0.0, consideration_weight=1.0,
+                 conversion_baseline=None, conversion_efficiency=0.5, base_year=None,
+                 scenarios=SCENARIOS):
+        """
+        Factor model for one market.
+
+        Parameters:
+        - base: Base-year queries per month (12 values)
+        - seasonality: Seasonality index per month
+        - current_impressions, planned_impressions: Media impressions per month
+        - flight_growth: Year-on-year growth of flight searches per month
+        - consideration, intent: Current (latest actual) brand Consideration and Intent
+        - parameters: Dict of parameter name (see PARAMETER_ROWS) -> one value per scenario
+        - intent_weight, consideration_weight: Weights of Intent and Consideration growth
+        - conversion_baseline: Baseline Intent/Consideration ratio, or None for no conversion factor
+        - conversion_efficiency: Weight of the conversion ratio difference
+        - base_year: Year of the base queries; the forecast is for the following year
+        - scenarios: Scenario names matching the parameter values
+        """
+        self.base = np.asarray(base, dtype=float)
+        self.inputs = {
+            'seasonality': np.asarray(seasonality, dtype=float),
+            'current_impressions': np.asarray(current_impressions, dtype=float),
+            'planned_impressions': np.asarray(planned_impressions, dtype=float),
+            'flight_growth': np.asarray(flight_growth, dtype=float)
+        }
+        self.consideration = consideration
+        self.intent = intent
+        self.intent_weight = intent_weight
+        self.consideration_weight = consideration_weight
+        self.conversion_baseline = conversion_baseline
+        self.conversion_efficiency = conversion_efficiency
+        self.parameters = {name: np.asarray(values, dtype=float) for name, values in parameters.items()}
+        self.base_year = base_year
+        self.scenarios = tuple(scenarios)
+
+    @classmethod
+    def from_template(cls, template):
+        """
+        Build the model from the input sections of a forecast template.
+
+        Parameters:
+        - template: TemplateReader or path of the template CSV
+
+        Returns:
+        - FactorModel
+        """
+        reader = template if isinstance(template, TemplateReader) else TemplateReader(template)
+
+        # The base year is the last complete year of the historical queries
+        history = reader.historical_queries()
+        months_per_year = history.groupby('Year')['Month'].nunique()
+        base_year = int(months_per_year[months_per_year == 12].index.max())
+        base = _by_month(history[history['Year'] == base_year], 'Indexed_Queries')
+
+        seasonality = _by_month(reader.section('SEASONALITY INDEX'), 'Seasonality Index')
+
+        media = reader.section('MEDIA IMPRESSIONS')
+        current_impressions = _by_month(media, f'{base_year} Impressions')
+        planned_impressions = _by_month(media, f'{base_year + 1} Planned Impressions')
+
+        flights = reader.section('FLIGHT SEARCHES')
+        searches = flights.pivot_table(index='Month', columns='Year', values='Flight Searches')
+        searches = searches.reindex(list(MONTH_NAMES))
+        flight_growth = (searches[base_year] / searches[base_year - 1] - 1).to_numpy()
+
+        # Current brand metrics are the latest quarter that is not a target
+        brand = reader.section('BRAND HEALTH')
+        actual = brand[~brand['Quarter'].str.contains('Target')].iloc[-1]
+
+        table = reader.section('PARAMETERS').set_index('Parameter')
+        scenarios = [scenario for scenario in SCENARIOS if scenario in table.columns]
+        parameters = {
+            name: table.loc[row, scenarios].to_numpy(dtype=float)
+            for name, row in PARAMETER_ROWS.items() if row in table.index
+        }
+
+        options = {}
+        if 'ENHANCED MODEL PARAMETERS' in reader:
+            enhanced = reader.section('ENHANCED MODEL PARAMETERS').set_index('Parameter')['Value']
+            if 'Intent Weight' in enhanced and 'intent_target' in parameters:
+                options['intent_weight'] = float(enhanced['Intent Weight'])
+                options['consideration_weight'] = float(enhanced['Consideration Weight'])
+            if 'Conversion Ratio Baseline' in enhanced and 'intent_target' in parameters:
+                options['conversion_baseline'] = float(enhanced['Conversion Ratio Baseline'])
+                options['conversion_efficiency'] = float(enhanced.get('Conversion Efficiency Factor', 0.5))
+
+        return cls(
+            base, seasonality, current_impressions, planned_impressions, flight_growth,
+            consideration=float(actual['Consideration']), intent=float(actual['Intent']),
+            parameters=parameters, base_year=base_year, scenarios=scenarios, **options
+        )
+
+    def compute(self, base='average', **overrides):
+        """
+        Compute the multipliers and forecasts.
+
+        Parameters and month-level inputs can be overridden with arrays. Parameter
+        arrays broadcast against each other (the last axis is usually the
+        scenario); month-level inputs need a trailing axis of 12 months.
+
+        Parameters:
+        - base: 'average' scales the base-year average by the seasonality index (as
+          in the templates); 'monthly' uses each month's base-year queries
+        - overrides: Values for the names in PARAMETER_ROWS, MONTHLY_INPUTS or BRAND_WEIGHTS
+
+        Returns:
+        - Dict of arrays with months as the last axis: 'media', 'flight', 'brand',
+          'conversion' and 'forecast'
+        """
+        unknown = set(overrides) - set(PARAMETER_ROWS) - set(MONTHLY_INPUTS) - set(BRAND_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown factor model inputs: {', '.join(sorted(unknown))}")
+        if base not in ('average', 'monthly'):
+            raise ValueError(f"Unknown base: {base}")
+
+        # Parameters get a trailing month axis so they broadcast against monthly inputs
+        parameters = dict(self.parameters)
+        parameters.update({name: np.asarray(value, dtype=float) for name, value in overrides.items()
+                           if name in PARAMETER_ROWS})
+        parameters['intent_weight'] = np.asarray(overrides.get('intent_weight', self.intent_weight), dtype=float)
+        parameters['consideration_weight'] = np.asarray(
+            overrides.get('consideration_weight', self.consideration_weight), dtype=float
+        )
+        p = {name: value[..., None] for name, value in parameters.items()}
+        inputs = dict(self.inputs)
+        inputs.update({name: np.asarray(value, dtype=float) for name, value in overrides.items()
+                       if name in MONTHLY_INPUTS})
+
+        brand_growth = (p['consideration_target'] - self.consideration) / self.consideration
+        conversion = np.ones(1)
+        if 'intent_target' in p:
+            intent_growth = (p['intent_target'] - self.intent) / self.intent
+            brand_growth = p['consideration_weight'] * brand_growth + p['intent_weight'] * intent_growth
+            if self.conversion_baseline is not None:
+                ratio = p['intent_target'] / p['consideration_target']
+                conversion = 1 + (ratio - self.conversion_baseline) * self.conversion_efficiency
+        elif 'intent_weight' in overrides:
+            raise ValueError("Intent weights need a Brand Intent Target in the parameters")
+
+        media = media_multiplier(inputs['planned_impressions'], inputs['current_impressions'],
+                                 p['media_effectiveness'])
+        flight = flight_search_factor(inputs['flight_growth'], p['flight_correlation'])
+        brand = brand_health_multiplier(brand_growth, p['brand_coefficient'])
+
+        level = self.base.mean() if base == 'average' else self.base
+        forecast = level * (1 + p['growth']) * inputs['seasonality'] * media * flight * brand * conversion
+
+        shape = forecast.shape
+        return {
+            'media': np.broadcast_to(media, shape),
+            'flight': np.broadcast_to(flight, shape),
+            'brand': np.broadcast_to(brand, shape),
+            'conversion': np.broadcast_to(conversion, shape),
+            'forecast': forecast
+        }
+
+    def forecast_results(self, base='average', **overrides):
+        """
+        Forecast table in the layout of the FORECAST RESULTS section.
+
+        Returns:
+        - DataFrame with Month, the base-year queries, one column per scenario,
+          the YoY growth per scenario and a Date column for the forecast year
+        """
+        forecast = self.compute(base=base, **overrides)['forecast']
+        if forecast.ndim != 2:
+            raise ValueError("forecast_results needs one parameter value per scenario")
+
+        results = pd.DataFrame({'Month': MONTH_NAMES, f'{self.base_year} Queries': self.base})
+        for i, scenario in enumerate(self.scenarios):
+            results[scenario] = forecast[i]
+        for i, scenario in enumerate(self.scenarios):
+            results[f'{scenario} YoY'] = forecast[i] / self.base - 1
+        results['Date'] = month_start_dates(results['Month'], self.base_year + 1)
+        return results
+
+    def calculations(self, scenario='Moderate', base='average'):
+        """
+        Multipliers for one scenario in the layout of the FORECAST CALCULATIONS section.
+
+        Returns:
+        - DataFrame with one row per month
+        """
+        index = self.scenarios.index(scenario)
+        computed = self.compute(base=base)
+        return pd.DataFrame({
+            'Month': MONTH_NAMES,
+            f'{self.base_year} Queries': self.base,
+            'Seasonality Index': self.inputs['seasonality'],
+            'Media Multiplier': computed['media'][index],
+            'Flight Search Factor': computed['flight'][index],
+            'Brand Health Multiplier': computed['brand'][index],
+            f'{scenario} Forecast': computed['forecast'][index]
+        })
+
+
+def _by_month(frame, column):
+    """Values of a column in calendar month order."""
+    return frame.set_index('Month')[column].reindex(list(MONTH_NAMES)).to_numpy(dtype=float)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Hierarchical Forecasting Across Markets, Regions and Channels
+
+Forecasts every series of a hierarchy (for example market x device x query
+category at the bottom, with market, region and global totals above) and
+reconciles the forecasts so that they add up across the levels.
+
+The hierarchy is described by the summing matrix S, which maps the bottom
+series to every node (aggregates first, then the bottom series). S is a sparse
+matrix with one non-zero per bottom series and level, so building it and
+aggregating the history is cheap even for thousands of series. Each node is
+forecast independently with EnhancedForecastModel (outlier adjustment and
+ARIMA) in a process pool, and the base forecasts are reconciled with:
+
+- bottom_up: sum of the bottom-level forecasts
+- top_down: total forecast split by the average historical proportions
+- ols, wls: least-squares reconciliation with identity or structural weights
+- mint: minimum trace reconciliation weighted by the in-sample residual variances
+
+The least-squares methods use the projection form
+    reconciled = base - W C' (C W C')^-1 C base
+where C = [I, -S_aggregate] holds the aggregation constraints and W is
+diagonal, so the only system solved is a sparse one of the size of the
+aggregate levels.
+
+Usage:
+    python uk_forecast_hierarchy.py bottom_series.csv --keys Region Market Device Category \\
+        --levels Total Region Region,Market --method mint
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_enhanced_model import EnhancedForecastModel
+from uk_forecast_template import month_start_dates
+
+RECONCILIATION_METHODS = ('bottom_up', 'top_down', 'ols', 'wls', 'mint')
+
+# Name of the grand total node and level
+TOTAL = 'Total'
+
+
+def bottom_series(data, keys, value='Indexed_Queries'):
+    """
+    Pivot long-format data into one column per bottom-level series.
+
+    Parameters:
+    - data: DataFrame with a Date column (or Month and Year), the key columns and the values
+    - keys: Columns identifying a bottom-level series, top level first
+    - value: Column with the queries
+
+    Returns:
+    - DataFrame indexed by month with one column per series (MultiIndex columns named by keys)
+    """
+    keys = list(keys)
+    dates = data['Date'] if 'Date' in data else month_start_dates(data['Month'], data['Year'])
+    wide = data.assign(Date=pd.to_datetime(dates).to_numpy()).pivot_table(
+        index='Date', columns=keys, values=value, aggfunc='sum'
+    )
+    wide = wide.sort_index().asfreq('MS')
+    if wide.isna().any().any():
+        raise ValueError("Every bottom-level series needs a value for every month")
+    if not isinstance(wide.columns, pd.MultiIndex):
+        wide.columns = pd.MultiIndex.from_arrays([wide.columns], names=keys)
+    return wide
+
+
+def summing_matrix(bottom_keys, levels):
+    """
+    Summing matrix of a hierarchy.
+
+    Parameters:
+    - bottom_keys: DataFrame with one row per bottom-level series and its key columns
+    - levels: Aggregate levels, top first; each is a list of key columns ([] is the grand total)
+
+    Returns:
+    - Tuple of (S as a sparse CSR matrix of shape (nodes, bottom series), DataFrame of nodes
+      with Level, Node and the key columns, aggregates first and the bottom series last)
+    """
+    from scipy import sparse
+
+    bottom_keys = bottom_keys.reset_index(drop=True)
+    n_bottom = len(bottom_keys)
+    keys = list(bottom_keys.columns)
+
+    rows, node_frames, offset = [], [], 0
+    for level in levels:
+        level = list(level)
+        if not level:
+            codes = np.zeros(n_bottom, dtype=np.int64)
+            nodes = pd.DataFrame({'Level': [TOTAL], 'Node': [TOTAL]})
+        else:
+            groups = bottom_keys.groupby(level, sort=True)
+            codes = groups.ngroup().to_numpy()
+            nodes = groups.size().index.to_frame(index=False)
+            nodes.insert(0, 'Level', '/'.join(level))
+            nodes.insert(1, 'Node', nodes[level].astype(str).agg('/'.join, axis=1))
+        rows.append(codes + offset)
+        node_frames.append(nodes)
+        offset += len(nodes)
+
+    bottom_nodes = bottom_keys.copy()
+    bottom_nodes.insert(0, 'Level', '/'.join(keys))
+    bottom_nodes.insert(1, 'Node', bottom_keys.astype(str).agg('/'.join, axis=1))
+    rows.append(np.arange(n_bottom) + offset)
+    node_frames.append(bottom_nodes)
+
+    rows = np.concatenate(rows)
+    columns = np.tile(np.arange(n_bottom), len(levels) + 1)
+    S = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(offset + n_bottom, n_bottom))
+    nodes = pd.concat(node_frames, ignore_index=True)[['Level', 'Node'] + keys]
+    return S, nodes
+
+
+def aggregate(bottom, S, nodes):
+    """
+    Series of every node of the hierarchy.
+
+    Returns:
+    - DataFrame indexed like bottom with one column per node
+    """
+    values = (S @ bottom.to_numpy(dtype=float).T).T
+    return pd.DataFrame(values, index=bottom.index, columns=nodes['Node'])
+
+
+def reconcile(base, S, method='mint', residuals=None, proportions=None):
+    """
+    Reconcile base forecasts so that they are coherent with the hierarchy.
+
+    Parameters:
+    - base: Array of shape (nodes, horizon) with the base forecasts in node order
+    - S: Summing matrix, aggregates first and the bottom series last
+    - method: One of RECONCILIATION_METHODS
+    - residuals: Array of shape (nodes, observations) with in-sample residuals (mint)
+    - proportions: Share of the total of every bottom series (top_down; the first node must be the total)
+
+    Returns:
+    - Array of shape (nodes, horizon) with the reconciled forecasts
+    """
+    from scipy import sparse
+    from scipy.sparse.linalg import splu
+
+    if method not in RECONCILIATION_METHODS:
+        raise ValueError(f"Unknown reconciliation method: {method}")
+
+    S = sparse.csr_matrix(S)
+    base = np.asarray(base, dtype=float)
+    n_nodes, n_bottom = S.shape
+    n_aggregate = n_nodes - n_bottom
+
+    if method == 'bottom_up':
+        return S @ base[n_aggregate:]
+
+    if method == 'top_down':
+        if proportions is None:
+            raise ValueError("Top-down reconciliation needs the bottom-level proportions")
+        return S @ (np.asarray(proportions, dtype=float)[:, None] * base[0])
+
+    if method == 'ols':
+        weights = np.ones(n_nodes)
+    elif method == 'wls':
+        # Structural scaling: the variance of a node grows with the number of series it sums
+        weights = np.asarray(S.sum(axis=1)).ravel()
+    else:
+        if residuals is None:
+            raise ValueError("MinT reconciliation needs the in-sample residuals")
+        weights = np.nanvar(np.asarray(residuals, dtype=float), axis=1)
+        # Constant series get the average variance instead of a zero weight
+        positive = weights > 0
+        weights = np.where(positive, weights, weights[positive].mean() if positive.any() else 1.0)
+
+    # Aggregation constraints: C @ coherent = 0
+    C = sparse.hstack([sparse.identity(n_aggregate, format='csr'), -S[:n_aggregate]], format='csr')
+    CW = C @ sparse.diags(weights)
+    solver = splu((CW @ C.T).tocsc())
+    return base - CW.T @ solver.solve(C @ base)
+
+
+def historical_proportions(bottom):
+    """Average share of the total of every bottom series (top-down method A)."""
+    values = bottom.to_numpy(dtype=float)
+    return (values / values.sum(axis=1, keepdims=True)).mean(axis=0)
+
+
+def _forecast_node(task):
+    """Forecast one node with the enhanced model in a worker process."""
+    values, dates, steps, arima_order, outlier_method, outlier_threshold = task
+    model = EnhancedForecastModel.from_series(pd.Series(values, index=dates))
+    model.detect_outliers(method=outlier_method, threshold=outlier_threshold)
+    model.adjust_outliers(method='median_window', window_size=3)
+
+    p, d, q = arima_order
+    model.fit_arima_model(p=p, d=d, q=q, cache_dir=None)
+    forecast = model.forecast_arima(steps=steps)
+    # The first d residuals are the unconditioned starting values
+    residuals = model.arima_model.resid.to_numpy()[d:]
+    return forecast[['ARIMA_Forecast', 'Lower_CI', 'Upper_CI']].to_numpy(), residuals
+
+
+def forecast_hierarchy(bottom, levels=None, method='mint', steps=12, arima_order=(1, 1, 1),
+                       outlier_method='zscore', outlier_threshold=3.0, workers=None):
+    """
+    Forecast every node of a hierarchy and reconcile the forecasts.
+
+    Parameters:
+    - bottom: Bottom-level series as returned by bottom_series
+    - levels: Aggregate levels, top first (defaults to the total and every prefix of the keys)
+    - method: Reconciliation method (see RECONCILIATION_METHODS)
+    - steps: Number of months to forecast
+    - arima_order: ARIMA order of the per-node models
+    - outlier_method, outlier_threshold: Outlier detection of the per-node models
+    - workers: Number of worker processes (defaults to the number of cores, 1 runs in-process)
+
+    Returns:
+    - DataFrame with one row per node and month: Level, Node, the key columns, Date,
+      ARIMA_Forecast, ARIMA_Lower_CI, ARIMA_Upper_CI and Reconciled_Forecast
+    """
+    keys = list(bottom.columns.names)
+    if levels is None:
+        levels = [keys[:depth] for depth in range(len(keys))]
+    S, nodes = summing_matrix(bottom.columns.to_frame(index=False), levels)
+    history = aggregate(bottom, S, nodes)
+
+    tasks = [
+        (history[node].to_numpy(), history.index, steps, arima_order, outlier_method, outlier_threshold)
+        for node in history.columns
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        results = [_forecast_node(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_forecast_node, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+    forecasts = np.stack([forecast for forecast, _ in results])
+    residuals = np.stack([residual for _, residual in results])
+    reconciled = reconcile(
+        forecasts[:, :, 0], S, method=method, residuals=residuals,
+        proportions=historical_proportions(bottom) if method == 'top_down' else None
+    )
+
+    dates = pd.date_range(start=history.index[-1], periods=steps + 1, freq='MS')[1:]
+    results = nodes.loc[nodes.index.repeat(steps)].reset_index(drop=True)
+    results['Date'] = np.tile(dates, len(nodes))
+    results['ARIMA_Forecast'] = forecasts[:, :, 0].ravel()
+    results['ARIMA_Lower_CI'] = forecasts[:, :, 1].ravel()
+    results['ARIMA_Upper_CI'] = forecasts[:, :, 2].ravel()
+    results['Reconciled_Forecast'] = np.asarray(reconciled).ravel()
+    return results
+
+
+def main():
+    """Main function to run the hierarchical forecast."""
+    parser = argparse.ArgumentParser(description="Forecast and reconcile a hierarchy of travel query series.")
+    parser.add_argument('input', help="CSV file with Month and Year (or Date), the key columns and Indexed_Queries")
+    parser.add_argument('--keys', nargs='+', required=True,
+                        help="Columns identifying a bottom-level series, top level first")
+    parser.add_argument('--levels', nargs='*', default=None,
+                        help=f"Aggregate levels as comma-separated key columns, '{TOTAL}' for the grand total "
+                             "(default: the total and every prefix of the keys)")
+    parser.add_argument('--method', choices=RECONCILIATION_METHODS, default='mint', help="Reconciliation method")
+    parser.add_argument('--steps', type=int, default=12, help="Number of months to forecast")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: number of cores)")
+    parser.add_argument('--output', default='forecast_hierarchy_results.csv', help="Path of the results table")
+    args = parser.parse_args()
+
+    bottom = bottom_series(pd.read_csv(args.input), args.keys)
+    levels = None
+    if args.levels is not None:
+        levels = [[] if level == TOTAL else level.split(',') for level in args.levels]
+
+    print(f"Forecasting {bottom.shape[1]} bottom-level series...")
+    results = forecast_hierarchy(bottom, levels=levels, method=args.method, steps=args.steps, workers=args.workers)
+    results.to_csv(args.output, index=False)
+    print(f"Forecast {results['Node'].nunique()} nodes. Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Outlier Handling for Travel Queries Time Series
+
+Whole-array implementations of the outlier adjustment strategies used by the
+enhanced forecast model. Replacement values are computed from centred windows
+around every flagged point (excluding the point itself) in a single NumPy
+operation rather than a Python loop over the outliers.
+
+The module also provides detectors that account for trend and seasonality:
+
+- RollingMADDetector: robust z-score against the median/MAD of the preceding months
+- SeasonalDetector: compares each month with the same calendar month in earlier years
+- STLResidualDetector: robust z-score of the STL decomposition residuals
+
+Each detector scores a full history with fit(), and update() scores a newly
+arrived month. The rolling and seasonal detectors keep running statistics,
+so update() takes O(1) time without rescanning the history. The STL
+detector refits the decomposition on the whole history for every new month
+(see STLResidualDetector).
+"""
+
+import abc
+import warnings
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ADJUSTMENT_METHODS = ('median_window', 'mean_window', 'linear_interp')
+
+# Scale factor that makes the MAD a consistent estimator of the standard deviation
+MAD_SCALE = 0.6745
+
+
+def neighbour_windows(values, window_size, rows=None):
+    """
+    Return the centred window around each point with the centre removed.
+
+    Windows are truncated at the ends of the series; missing neighbours are NaN.
+
+    Parameters:
+    - values: 1-D array of observations
+    - window_size: Window size; the window spans window_size // 2 points on each side
+    - rows: Optional boolean mask or index array selecting the windows to return
+
+    Returns:
+    - Array of shape (n_rows, 2 * (window_size // 2)) with the neighbouring values
+    """
+    half = window_size // 2
+    padded = np.pad(np.asarray(values, dtype=float), half, constant_values=np.nan)
+    windows = sliding_window_view(padded, 2 * half + 1)
+    if rows is not None:
+        windows = windows[rows]
+    return np.delete(windows, half, axis=1)
+
+
+def adjust_outlier_values(values, outlier_mask, method='median_window', window_size=3):
+    """
+    Replace flagged points in a series.
+
+    Parameters:
+    - values: 1-D array of observations in time order
+    - outlier_mask: Boolean array, True where the observation is an outlier
+    - method: 'median_window', 'mean_window' or 'linear_interp'
+    - window_size: Size of the window for median/mean methods
+
+    Returns:
+    - Array of adjusted values
+    """
+    values = np.asarray(values, dtype=float)
+    outlier_mask = np.asarray(outlier_mask, dtype=bool)
+    adjusted = values.copy()
+
+    if method not in ADJUSTMENT_METHODS:
+        raise ValueError(f"Unknown outlier adjustment method: {method}")
+    if not outlier_mask.any():
+        return adjusted
+
+    if method == 'linear_interp':
+        # Interpolate between the nearest non-outlier neighbours
+        positions = np.arange(len(values))
+        keep = ~outlier_mask
+        if keep.any():
+            adjusted[outlier_mask] = np.interp(positions[outlier_mask], positions[keep], values[keep])
+        return adjusted
+
+    # Median or mean of the surrounding values, ignoring the edges of the series
+    neighbours = neighbour_windows(values, window_size, rows=outlier_mask)
+    reducer = np.nanmedian if method == 'median_window' else np.nanmean
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        replacement = reducer(neighbours, axis=1)
+
+    # Leave points without any neighbours unchanged
+    adjusted[outlier_mask] = np.where(np.isnan(replacement), values[outlier_mask], replacement)
+    return adjusted
+
+
+def _robust_scores(values, medians, mads):
+    """Robust z-scores; NaN where the spread is zero or unknown."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = MAD_SCALE * (values - medians) / mads
+    return np.where(np.asarray(mads) > 0, scores, np.nan)
+
+
+class OutlierDetector(abc.ABC):
+    """Base class for detectors that support incremental updates."""
+
+    def __init__(self, threshold=3.5):
+        self.threshold = threshold
+
+    def is_outlier(self, scores):
+        """Flag scores beyond the threshold; unscored points are never outliers."""
+        scores = np.asarray(scores, dtype=float)
+        return np.abs(np.nan_to_num(scores, nan=0.0)) > self.threshold
+
+    @abc.abstractmethod
+    def fit(self, values, months):
+        """
+        Score a full history and initialise the running statistics.
+
+        Parameters:
+        - values: 1-D array of observations in time order
+        - months: Calendar month (1-12) of each observation
+
+        Returns:
+        - Array of scores, NaN where there is not enough history
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def update(self, value, month):
+        """Score one new observation and fold it into the running statistics."""
+        raise NotImplementedError
+
+
+class RollingMADDetector(OutlierDetector):
+    """Robust z-score against the median and MAD of the preceding `window` months."""
+
+    def __init__(self, threshold=3.5, window=12, min_periods=6):
+        super().__init__(threshold)
+        self.window = window
+        self.min_periods = min_periods
+        self._recent = deque(maxlen=window)
+
+    def fit(self, values, months=None):
+        values = np.asarray(values, dtype=float)
+
+        # Trailing window of the `window` observations before each point
+        padded = np.concatenate([np.full(self.window, np.nan), values[:-1]])
+        windows = sliding_window_view(padded, self.window)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            medians = np.nanmedian(windows, axis=1)
+            mads = np.nanmedian(np.abs(windows - medians[:, None]), axis=1)
+        counts = np.sum(~np.isnan(windows), axis=1)
+
+        scores = _robust_scores(values, medians, mads)
+        scores[counts < self.min_periods] = np.nan
+
+        self._recent = deque(values[-self.window:], maxlen=self.window)
+        return scores
+
+    def update(self, value, month=None):
+        recent = np.asarray(self._recent, dtype=float)
+        score = np.nan
+        if np.sum(~np.isnan(recent)) >= self.min_periods:
+            median = np.nanmedian(recent)
+            mad = np.nanmedian(np.abs(recent - median))
+            score = float(_robust_scores(value, median, mad))
+        self._recent.append(value)
+        return score
+
+
+class SeasonalDetector(OutlierDetector):
+    """
+    Compare each month with the same calendar month in earlier years.
+
+    Each observation is expressed relative to the mean of the preceding twelve
+    months, which removes the level (e.g. the 2020-2021 trough), and the ratio is
+    scored against running mean/variance of that calendar month's past ratios.
+    """
+
+    def __init__(self, threshold=3.0, min_years=2):
+        super().__init__(threshold)
+        self.min_years = min_years
+        self._recent = deque(maxlen=12)
+        # Welford accumulators per calendar month: count, mean, sum of squared deviations
+        self._count = np.zeros(12)
+        self._mean = np.zeros(12)
+        self._m2 = np.zeros(12)
+
+    def _level_ratios(self, values):
+        """Ratio of each observation to the mean of the preceding twelve months."""
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        ratios = np.full(len(values), np.nan)
+        if len(values) > 12:
+            levels = (cumulative[12:-1] - cumulative[:-13]) / 12
+            ratios[12:] = values[12:] / levels
+        return ratios
+
+    def fit(self, values, months):
+        values = np.asarray(values, dtype=float)
+        months = np.asarray(months, dtype=int)
+        ratios = self._level_ratios(values)
+        scores = np.full(len(values), np.nan)
+
+        self._count[:] = 0
+        self._mean[:] = 0
+        self._m2[:] = 0
+        for month in range(1, 13):
+            positions = np.flatnonzero((months == month) & ~np.isnan(ratios))
+            if len(positions) == 0:
+                continue
+            month_ratios = ratios[positions]
+
+            # Statistics of the earlier years only, for every year at once
+            count = np.arange(len(month_ratios))
+            total = np.concatenate([[0.0], np.cumsum(month_ratios)[:-1]])
+            total_sq = np.concatenate([[0.0], np.cumsum(month_ratios ** 2)[:-1]])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = total / count
+                std = np.sqrt((total_sq - count * mean ** 2) / (count - 1))
+                month_scores = (month_ratios - mean) / std
+            month_scores[(count < self.min_years) | ~(std > 0)] = np.nan
+            scores[positions] = month_scores
+
+            self._count[month - 1] = len(month_ratios)
+            self._mean[month - 1] = month_ratios.mean()
+            self._m2[month - 1] = np.sum((month_ratios - month_ratios.mean()) ** 2)
+
+        self._recent = deque(values[-12:], maxlen=12)
+        return scores
+
+    def update(self, value, month):
+        score = np.nan
+        slot = month - 1
+        if len(self._recent) == 12:
+            ratio = value / np.mean(self._recent)
+
+            count = self._count[slot]
+            if count >= self.min_years and count > 1:
+                std = np.sqrt(self._m2[slot] / (count - 1))
+                if std > 0:
+                    score = (ratio - self._mean[slot]) / std
+
+            # Welford update of the calendar month statistics
+            self._count[slot] = count + 1
+            delta = ratio - self._mean[slot]
+            self._mean[slot] += delta / self._count[slot]
+            self._m2[slot] += delta * (ratio - self._mean[slot])
+
+        self._recent.append(value)
+        return score
+
+
+class STLResidualDetector(OutlierDetector):
+    """
+    Robust z-score of the residuals of an STL decomposition.
+
+    A new observation is scored by refitting STL on the history extended with
+    it. Extrapolating the last trend instead never re-anchors it to the
+    observed values and scores forecast errors against the much tighter
+    in-sample residual MAD, so clean months and every month after a level
+    shift would be flagged. At the length of the templates a refit takes a
+    fraction of a second.
+
+    The non-robust fit is the default: robust STL fits the bulk of the series so
+    closely that sustained shocks such as the 2020-2021 trough end up in the
+    residuals and are flagged month after month.
+    """
+
+    def __init__(self, threshold=3.5, period=12, robust=False):
+        super().__init__(threshold)
+        self.period = period
+        self.robust = robust
+
+    def fit(self, values, months):
+        from statsmodels.tsa.seasonal import STL
+
+        values = np.asarray(values, dtype=float)
+        months = np.asarray(months, dtype=int)
+        decomposition = STL(values, period=self.period, robust=self.robust).fit()
+        residuals = np.asarray(decomposition.resid)
+
+        self._median = np.median(residuals)
+        self._mad = np.median(np.abs(residuals - self._median))
+
+        # The history is kept so that appended observations refit the decomposition
+        self._values = values
+        self._months = months
+        return _robust_scores(residuals, self._median, self._mad)
+
+    def update(self, value, month):
+        scores = self.fit(np.append(self._values, value), np.append(self._months, month))
+        return float(scores[-1])
+
+
+# Detectors available to EnhancedForecastModel.detect_outliers by method name
+DETECTORS = {
+    'rolling_mad': RollingMADDetector,
+    'seasonal': SeasonalDetector,
+    'stl': STLResidualDetector,
+}
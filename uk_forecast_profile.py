@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Run Profiling for the Forecast Pipeline
+
+Records a span for every stage of a forecast run (loading, outlier detection
+and adjustment, the model fits and forecasts, the comparison, the charts and
+the saved results) with its wall time, CPU time and memory, and writes them as
+a machine-readable JSON run report. Batch runs combine the reports of all
+markets into one, with per-stage totals across markets.
+
+Spans nest: a stage that triggers another (e.g. forecast_arima fitting the
+model first) records the inner stage with the outer one as its parent, and
+the outer stage's time includes the inner one.
+
+Memory is measured as the resident set size (RSS) of the process at the start
+and the end of every span (from /proc/self/statm, or psutil where there is no
+/proc), so each span reports how much the process grew or shrank while it
+ran. The lifetime peak RSS of the process (getrusage's ru_maxrss) is a
+high-water mark that never falls, so it is only reported for the whole run,
+as process_peak_rss_bytes. With trace_memory, the peak of the Python
+allocations within each span is recorded too (tracemalloc, which slows the
+run down).
+
+A profiler can be attached to the whole run:
+- cprofile: the standard library's deterministic profiler; the statistics are
+  written to a .prof file and the slowest functions are added to the report
+- sampling: pyinstrument's statistical profiler, if it is installed, with
+  much lower overhead; its call tree is written to a .txt file
+
+Usage:
+    from uk_forecast_profile import RunProfile
+
+    profile = RunProfile('UK/Aligned', profiler='cprofile')
+    model = EnhancedForecastModel(path, profile=profile)
+    ...
+    profile.write_report('uk_run_report.json')
+"""
+
+import contextlib
+import functools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from uk_forecast_cache import library_versions
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the process peak is then not recorded
+    resource = None
+
+PROFILERS = ('cprofile', 'sampling')
+
+# Layout version of the run reports
+REPORT_VERSION = 2
+
+_STATM_PATH = '/proc/self/statm'
+
+# Libraries whose versions are recorded in a report
+REPORT_LIBRARIES = ('numpy', 'pandas', 'scipy', 'statsmodels', 'prophet', 'pymc3', 'matplotlib')
+
+# Number of functions listed in a cProfile summary
+TOP_FUNCTIONS = 25
+
+
+def peak_rss_bytes():
+    """Lifetime peak resident set size of this process in bytes, or None if it cannot be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def rss_bytes():
+    """Current resident set size of this process in bytes, or None if it cannot be measured."""
+    try:
+        with open(_STATM_PATH, 'rb') as file:
+            # The second field is the number of resident pages
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class RunProfile:
+    def __init__(self, name, profiler=None, trace_memory=False, output_prefix=None):
+        """
+        Profile of one forecast run.
+
+        Parameters:
+        - name: Name of the run in the report, e.g. the market and variant
+        - profiler: None, or one of PROFILERS to profile the whole run
+        - trace_memory: Record the peak Python allocations of every span with tracemalloc
+        - output_prefix: Path prefix of the profiler output (.prof or .txt); defaults to the name
+        """
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler}")
+
+        self.name = name
+        self.profiler = profiler
+        self.trace_memory = trace_memory
+        self.output_prefix = output_prefix
+        self.spans = []
+        self.profiler_output = None
+        self.top_functions = None
+        self._stack = []
+        self._profiler = None
+        self._started = None
+
+    def start(self):
+        """Start the run clock and the profiler."""
+        self._started = (time.time(), time.perf_counter(), time.process_time())
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        if self.profiler == 'cprofile':
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profiler == 'sampling':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument not available. The run is profiled without a sampling profiler.")
+            else:
+                self._profiler = Profiler()
+                self._profiler.start()
+        return self
+
+    def stop(self):
+        """Stop the profiler and write its output."""
+        if self._profiler is None:
+            return
+        prefix = self.output_prefix or self.name.replace(os.sep, '_').replace('/', '_')
+        if os.path.dirname(prefix):
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        if self.profiler == 'cprofile':
+            import pstats
+
+            self._profiler.disable()
+            self.profiler_output = f"{prefix}.prof"
+            self._profiler.dump_stats(self.profiler_output)
+            self.top_functions = _top_functions(pstats.Stats(self._profiler))
+        else:
+            self._profiler.stop()
+            self.profiler_output = f"{prefix}.txt"
+            with open(self.profiler_output, 'w', encoding='utf-8') as file:
+                file.write(self._profiler.output_text(unicode=False, color=False))
+        self._profiler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        """Record the time and memory of a stage."""
+        if self._started is None:
+            self.start()
+
+        parent = self._stack[-1] if self._stack else None
+        record = {'stage': stage, 'parent': parent['stage'] if parent else None, 'depth': len(self._stack)}
+        self._stack.append(record)
+
+        if self.trace_memory:
+            # The parent's peak so far is kept before the peak is reset for this span
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent['_peak'] = max(parent.get('_peak', 0), peak)
+            tracemalloc.reset_peak()
+            record['_start_traced'] = current
+
+        start_rss = rss_bytes()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            record['rss_bytes'] = rss_bytes()
+            record['rss_delta_bytes'] = (record['rss_bytes'] - start_rss
+                                         if record['rss_bytes'] is not None and start_rss is not None else None)
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop('_peak', 0))
+                record['peak_traced_bytes'] = peak - record.pop('_start_traced')
+                if parent is not None:
+                    parent['_peak'] = max(parent.get('_peak', 0), peak)
+            self._stack.pop()
+            self.spans.append(record)
+
+    def stages(self):
+        """
+        Totals per stage.
+
+        Returns:
+        - DataFrame indexed by stage with Calls, Seconds, CPU_Seconds, RSS_Delta_Bytes
+          (total growth of the RSS over the stage's spans) and Max_RSS_Bytes (largest
+          RSS at the end of a span)
+        """
+        if not self.spans:
+            return pd.DataFrame(columns=['Calls', 'Seconds', 'CPU_Seconds', 'RSS_Delta_Bytes', 'Max_RSS_Bytes'])
+        spans = pd.DataFrame(self.spans)
+        return spans.groupby('stage', sort=False).agg(
+            Calls=('seconds', 'size'),
+            Seconds=('seconds', 'sum'),
+            CPU_Seconds=('cpu_seconds', 'sum'),
+            RSS_Delta_Bytes=('rss_delta_bytes', 'sum'),
+            Max_RSS_Bytes=('rss_bytes', 'max')
+        )
+
+    def report(self):
+        """Machine-readable report of the run."""
+        started, wall, cpu = self._started or (time.time(), time.perf_counter(), time.process_time())
+        stages = self.stages()
+        return {
+            'version': REPORT_VERSION,
+            'name': self.name,
+            'started': pd.Timestamp(started, unit='s', tz='UTC').isoformat(),
+            'seconds': time.perf_counter() - wall,
+            'cpu_seconds': time.process_time() - cpu,
+            'process_peak_rss_bytes': peak_rss_bytes(),
+            'environment': environment(),
+            'spans': self.spans,
+            'stages': {stage: row for stage, row in stages.to_dict(orient='index').items()},
+            'profiler': self.profiler,
+            'profiler_output': self.profiler_output,
+            'top_functions': self.top_functions,
+        }
+
+    def write_report(self, path):
+        """Write the report as JSON and return it."""
+        self.stop()
+        report = self.report()
+        write_report(report, path)
+        return report
+
+
+def profile_span(profile, stage):
+    """Span of a stage in a profile, or a no-op context without a profile."""
+    return contextlib.nullcontext() if profile is None else profile.span(stage)
+
+
+def stage(name=None):
+    """
+    Decorator recording a method call as a span of the instance's profile.
+
+    The span goes to the RunProfile in the instance's profile attribute; without
+    one the method runs unchanged.
+    """
+    def decorate(method):
+        label = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profile = getattr(self, 'profile', None)
+            if profile is None:
+                return method(self, *args, **kwargs)
+            with profile.span(label):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def environment():
+    """Host and library versions of a run."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pid': os.getpid(),
+        'libraries': dict(library_versions(*REPORT_LIBRARIES)),
+    }
+
+
+def aggregate_reports(reports, **fields):
+    """
+    Combine the reports of many runs, e.g. every market of a batch.
+
+    Parameters:
+    - reports: Run reports from RunProfile.report
+    - fields: Extra top-level fields of the combined report (e.g. workers and wall time)
+
+    Returns:
+    - Report with the runs and, per stage, the number of runs, the total,
+      mean and maximum seconds, the total CPU seconds, the total RSS growth
+      and the largest RSS at the end of a span
+    """
+    rows = [
+        {'run': report['name'], 'stage': stage, **totals}
+        for report in reports for stage, totals in report['stages'].items()
+    ]
+    stages = {}
+    if rows:
+        frame = pd.DataFrame(rows)
+        stages = frame.groupby('stage', sort=False).agg(
+            Runs=('run', 'nunique'),
+            Seconds=('Seconds', 'sum'),
+            Mean_Seconds=('Seconds', 'mean'),
+            Max_Seconds=('Seconds', 'max'),
+            CPU_Seconds=('CPU_Seconds', 'sum'),
+            RSS_Delta_Bytes=('RSS_Delta_Bytes', 'sum'),
+            Max_RSS_Bytes=('Max_RSS_Bytes', 'max')
+        ).to_dict(orient='index')
+
+    return {
+        'version': REPORT_VERSION,
+        'environment': environment(),
+        **fields,
+        'runs': len(reports),
+        'seconds': sum(report['seconds'] for report in reports),
+        'cpu_seconds': sum(report['cpu_seconds'] for report in reports),
+        # Runs of one worker process share its peak
+        'process_peak_rss_bytes': max((report['process_peak_rss_bytes'] for report in reports
+                                       if report['process_peak_rss_bytes'] is not None), default=None),
+        'stages': stages,
+        'reports': list(reports),
+    }
+
+
+def write_report(report, path):
+    """Write a report as indented JSON."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, default=_json_default)
+
+
+def _json_default(value):
+    """JSON encoding of NumPy scalars in the stage totals."""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _top_functions(stats, limit=TOP_FUNCTIONS):
+    """Slowest functions of a cProfile run by cumulative time."""
+    rows = []
+    for (filename, line, function), (calls, _, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'seconds': total,
+            'cumulative_seconds': cumulative
+        })
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:limit]
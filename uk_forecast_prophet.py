@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Prophet Fitting Layer
+
+Fits Prophet models for one or many series with three kinds of reuse:
+
+- Fitted models are stored on disk in Prophet's JSON serialization, keyed by
+  a hash of the series and the model options, so an unchanged series is
+  never refitted.
+- The parameters of the latest fit of every named series are stored too.
+  When the series has only gained a month since then, the new fit starts
+  Stan's optimizer from those parameters (a warm start) instead of from
+  Prophet's default initialization.
+- Every process loads the Stan backend once and shares it between all the
+  models it fits or loads from the cache. fit_prophet_models and
+  forecast_prophet_models fan the fits for many series out over a process
+  pool, so each worker loads the backend once however many markets it fits.
+
+The series are monthly (month-start dates), so the models have a yearly
+seasonality only; weekly, daily and sub-monthly seasonalities cannot be
+estimated from one observation per month.
+
+Usage:
+    from uk_forecast_prophet import ProphetCache, fit_prophet, prophet_forecast
+
+    model = fit_prophet(series, name='UK/Aligned', cache=ProphetCache())
+    forecast = prophet_forecast(model, periods=12)
+
+    forecasts = forecast_prophet_models({'UK': uk_series, 'DE': de_series}, periods=12)
+"""
+
+import functools
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_arima import series_key
+from uk_forecast_cache import DEFAULT_MAX_BYTES, ResultCache, library_versions
+
+DEFAULT_CACHE_DIR = os.path.join('.forecast_cache', 'prophet')
+
+# Prophet options of the monthly models
+PROPHET_OPTIONS = {'yearly_seasonality': True, 'weekly_seasonality': False, 'daily_seasonality': False}
+
+# Parameters of a fitted model that initialize a warm-started fit
+WARM_START_PARAMETERS = ('k', 'm', 'sigma_obs', 'delta', 'beta')
+
+
+class ProphetCache(ResultCache):
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Cache of fitted Prophet models and of the latest parameters of every named series.
+
+        Parameters:
+        - directory: Directory for the cached models, or None to keep them in memory only
+        - max_bytes: Size limit of the directory
+        """
+        super().__init__(directory, max_bytes)
+
+    def key(self, series, options):
+        """Cache key of the model fitted to a series with the given options."""
+        digest = hashlib.sha256(
+            f"{series_key(series)}|{super().key(options)}|{library_versions('prophet')}".encode()
+        )
+        return f"model_{digest.hexdigest()[:32]}"
+
+    def latest_key(self, name, options):
+        """Cache key of the latest fit of a named series."""
+        return f"latest_{super().key(name, options, library_versions('prophet'))[:32]}"
+
+
+@functools.lru_cache(maxsize=None)
+def _prophet_class():
+    """Prophet subclass that shares one Stan backend per process between all its instances."""
+    from prophet import Prophet
+
+    backends = {}
+
+    class SharedBackendProphet(Prophet):
+        def _load_stan_backend(self, stan_backend):
+            # Loading the backend loads the compiled Stan model, which is the
+            # same for every instance
+            if stan_backend not in backends:
+                super()._load_stan_backend(stan_backend)
+                backends[stan_backend] = self.stan_backend
+            self.stan_backend = backends[stan_backend]
+
+    return SharedBackendProphet
+
+
+def model_from_json(serialized):
+    """
+    Deserialize a model written by prophet.serialize.model_to_json.
+
+    prophet.serialize.model_from_json builds a plain Prophet, which loads the
+    Stan backend again for every model. The model is built here as the
+    shared-backend subclass and filled from the serialized attributes in the
+    same way, using the attribute lists of the installed Prophet version.
+    """
+    from prophet import serialize
+
+    attributes = json.loads(serialized)
+    model = _prophet_class()()
+
+    for name in serialize.SIMPLE_ATTRIBUTES:
+        setattr(model, name, attributes[name])
+    for name in serialize.PD_SERIES:
+        value = attributes[name]
+        if value is not None:
+            value = pd.read_json(StringIO(value), typ='series', orient='split')
+            if value.name == 'ds':
+                value = pd.to_datetime(value).dt.tz_localize(None)
+        setattr(model, name, value)
+    for name in serialize.PD_TIMESTAMP:
+        setattr(model, name, pd.Timestamp(attributes[name], unit='s'))
+    for name in serialize.PD_TIMEDELTA:
+        setattr(model, name, pd.Timedelta(seconds=attributes[name]))
+    for name in serialize.PD_DATAFRAME:
+        value = attributes[name]
+        if value is not None:
+            value = pd.read_json(StringIO(value), typ='frame', orient='table', convert_dates=['ds'])
+            if name == 'train_component_cols':
+                value.columns.name = 'component'
+                value.index.name = 'col'
+        setattr(model, name, value)
+    for name in serialize.NP_ARRAY:
+        setattr(model, name, np.array(attributes[name]))
+    for name in serialize.ORDEREDDICT:
+        keys, values = attributes[name]
+        setattr(model, name, OrderedDict((key, values[key]) for key in keys))
+
+    model.fit_kwargs = attributes['fit_kwargs']
+    model.params = {name: np.array(values) for name, values in attributes['params'].items()}
+    model.stan_fit = None
+    return model
+
+
+def warm_start_parameters(model):
+    """Parameters of a fitted model in the layout Prophet.fit accepts as init."""
+    params = {}
+    for name in WARM_START_PARAMETERS:
+        values = np.asarray(model.params[name])[0]
+        params[name] = float(values[0]) if name in ('k', 'm', 'sigma_obs') else values
+    return params
+
+
+def _extends(previous, series, max_months):
+    """Whether series is previous followed by 1 to max_months new months."""
+    added = len(series) - len(previous)
+    return (0 < added <= max_months
+            and series.index[:len(previous)].equals(previous.index)
+            and np.allclose(series.to_numpy(dtype=float)[:len(previous)], previous.to_numpy(dtype=float)))
+
+
+def fit_prophet(series, name=None, cache=None, warm_start_months=1, **options):
+    """
+    Fit a Prophet model, reusing cached models and warm-starting from the previous fit.
+
+    Parameters:
+    - series: Time series with a monthly DatetimeIndex
+    - name: Identity of the series (e.g. market and variant) under which its
+      latest parameters are kept for warm starts, or None for no warm start
+    - cache: ProphetCache instance, or None to always fit from scratch
+    - warm_start_months: Largest number of new months for which the previous
+      parameters are used as a warm start
+    - options: Prophet options overriding PROPHET_OPTIONS
+
+    Returns:
+    - Fitted Prophet model
+    """
+    options = {**PROPHET_OPTIONS, **options}
+
+    key = None
+    if cache is not None:
+        key = cache.key(series, options)
+        serialized = cache.get(key)
+        if serialized is not None:
+            return model_from_json(serialized)
+
+    init = None
+    if cache is not None and name is not None:
+        latest = cache.get(cache.latest_key(name, options))
+        if latest is not None and _extends(latest['series'], series, warm_start_months):
+            init = latest['parameters']
+
+    Prophet = _prophet_class()
+    data = pd.DataFrame({'ds': series.index, 'y': series.to_numpy(dtype=float)})
+    model = Prophet(**options)
+    try:
+        model.fit(data, **({'init': init} if init is not None else {}))
+    except Exception:
+        if init is None:
+            raise
+        # Parameters that do not fit the new model (e.g. another number of changepoints)
+        model = Prophet(**options)
+        model.fit(data)
+
+    if cache is not None:
+        from prophet.serialize import model_to_json
+
+        cache.put(key, model_to_json(model))
+        if name is not None:
+            cache.put(cache.latest_key(name, options),
+                      {'series': series, 'parameters': warm_start_parameters(model)})
+    return model
+
+
+def prophet_forecast(model, periods=12):
+    """
+    Forecast from a fitted Prophet model.
+
+    Returns:
+    - DataFrame with Prophet_Forecast, Lower_CI and Upper_CI indexed by Date
+    """
+    future = model.make_future_dataframe(periods=periods, freq='MS').tail(periods)
+    forecast = model.predict(future)
+    forecast = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].rename(columns={
+        'ds': 'Date',
+        'yhat': 'Prophet_Forecast',
+        'yhat_lower': 'Lower_CI',
+        'yhat_upper': 'Upper_CI'
+    })
+    return forecast.set_index('Date')
+
+
+def _fit_task(task):
+    """Fit one series in a worker process and return the serialized model."""
+    from prophet.serialize import model_to_json
+
+    name, series, cache_dir, warm_start_months, options = task
+    cache = ProphetCache(cache_dir) if cache_dir is not None else None
+    return model_to_json(fit_prophet(series, name, cache, warm_start_months, **options))
+
+
+def _forecast_task(task):
+    """Fit and forecast one series in a worker process."""
+    name, series, cache_dir, warm_start_months, options, periods = task
+    cache = ProphetCache(cache_dir) if cache_dir is not None else None
+    return prophet_forecast(fit_prophet(series, name, cache, warm_start_months, **options), periods)
+
+
+def _map_series(worker, tasks, workers):
+    """Run one task per series in a process pool (in-process for a single worker)."""
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [worker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(worker, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+
+def fit_prophet_models(series, workers=None, cache_dir=DEFAULT_CACHE_DIR, warm_start_months=1, **options):
+    """
+    Fit a Prophet model per series in a process pool.
+
+    Parameters:
+    - series: Dict of name -> monthly time series
+    - workers: Number of worker processes (defaults to the number of cores, 1 runs in-process)
+    - cache_dir: Directory of the model cache, or None to disable caching and warm starts
+    - warm_start_months, options: See fit_prophet
+
+    Returns:
+    - Dict of name -> fitted Prophet model
+    """
+    tasks = [(name, values, cache_dir, warm_start_months, options) for name, values in series.items()]
+    return {task[0]: model_from_json(serialized)
+            for task, serialized in zip(tasks, _map_series(_fit_task, tasks, workers))}
+
+
+def forecast_prophet_models(series, periods=12, workers=None, cache_dir=DEFAULT_CACHE_DIR, warm_start_months=1,
+                            **options):
+    """
+    Fit and forecast a Prophet model per series in a process pool.
+
+    Only the forecasts are sent back from the workers, so the models are not
+    deserialized in the calling process.
+
+    Parameters:
+    - series: Dict of name -> monthly time series
+    - periods: Number of months to forecast
+    - workers, cache_dir, warm_start_months, options: See fit_prophet_models
+
+    Returns:
+    - Dict of name -> forecast DataFrame (see prophet_forecast)
+    """
+    tasks = [(name, values, cache_dir, warm_start_months, options, periods) for name, values in series.items()]
+    return {task[0]: forecast for task, forecast in zip(tasks, _map_series(_forecast_task, tasks, workers))}
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Scenario Sweeps for Media Spend Planning
+
+Evaluates the factor-based model over a Cartesian grid of parameter values and
+media plans. Every swept input gets its own array axis, so the whole grid is a
+single broadcasted computation with FactorModel.compute: a sweep of 10 media
+effectiveness values, 10 flight search correlations, 10 brand weights and
+1,000 monthly allocations is one call over a (10, 10, 10, 1000, 12) array.
+
+The response surface is the total forecast queries of the year at every grid
+point. Besides the best allocation found in the grid, optimal_allocation
+returns the allocation of a fixed impressions budget that maximises the total
+forecast: the Media Multiplier is concave in the planned impressions, so the
+optimum follows from equalising the marginal queries per impression across
+months (water-filling).
+
+Usage:
+    from uk_forecast_factor import FactorModel
+    from uk_forecast_scenarios import sweep, dirichlet_allocations
+
+    model = FactorModel.from_template('Travel_Queries_Forecast_UK_Aligned.csv')
+    plans = dirichlet_allocations(model.inputs['planned_impressions'], 5000)
+    result = sweep(model, media_effectiveness=np.linspace(0.05, 0.2, 16), planned_impressions=plans)
+    result['best']
+"""
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_factor import BRAND_WEIGHTS, PARAMETER_ROWS
+from uk_forecast_template import MONTH_NAMES
+
+
+def dirichlet_allocations(planned_impressions, count, concentration=50.0, random_state=None):
+    """
+    Random media plans with the same total budget as a reference plan.
+
+    Monthly shares are drawn from a Dirichlet distribution centred on the
+    shares of the reference plan; higher concentration keeps the plans closer
+    to it. The first row is the reference plan itself.
+
+    Parameters:
+    - planned_impressions: Reference plan (12 monthly impressions)
+    - count: Number of plans
+    - concentration: Dirichlet concentration
+    - random_state: Seed or numpy Generator
+
+    Returns:
+    - Array of shape (count, 12)
+    """
+    rng = np.random.default_rng(random_state)
+    planned_impressions = np.asarray(planned_impressions, dtype=float)
+    budget = planned_impressions.sum()
+    shares = rng.dirichlet(concentration * planned_impressions / budget, size=count)
+    shares[0] = planned_impressions / budget
+    return shares * budget
+
+
+def sweep(model, scenario='Moderate', base='average', **ranges):
+    """
+    Evaluate the factor model over the Cartesian grid of the given ranges.
+
+    Parameters:
+    - model: FactorModel
+    - scenario: Scenario supplying the values of the parameters that are not swept
+    - base: Base level passed on to FactorModel.compute
+    - ranges: 1-D value ranges for parameters (PARAMETER_ROWS) or brand weights
+      (BRAND_WEIGHTS), and optionally planned_impressions as a (plans, 12) array
+
+    Returns:
+    - Dict with
+      'axes': dict of swept name -> values, in grid axis order
+      'forecast': array of shape grid + (12,) with the monthly forecasts
+      'total': array of shape grid with the total forecast queries (response surface)
+      'surface': long DataFrame with one row per grid point ('Plan' indexes the plans)
+      'best': dict with the grid values, plan and total of the best grid point
+    """
+    unknown = set(ranges) - set(PARAMETER_ROWS) - set(BRAND_WEIGHTS) - {'planned_impressions'}
+    if unknown:
+        raise ValueError(f"Unknown sweep inputs: {', '.join(sorted(unknown))}")
+
+    index = model.scenarios.index(scenario)
+    parameters = {name: values[index] for name, values in model.parameters.items()}
+
+    axes = {name: np.atleast_1d(np.asarray(values, dtype=float))
+            for name, values in ranges.items() if name != 'planned_impressions'}
+    plans = None
+    if 'planned_impressions' in ranges:
+        plans = np.atleast_2d(np.asarray(ranges['planned_impressions'], dtype=float))
+        axes['planned_impressions'] = np.arange(len(plans))
+
+    # One array axis per swept input; months are added by FactorModel.compute
+    dimensions = len(axes)
+    overrides = dict(parameters)
+    for axis, (name, values) in enumerate(axes.items()):
+        shape = [1] * dimensions
+        shape[axis] = len(values)
+        if name == 'planned_impressions':
+            overrides[name] = plans.reshape(shape + [len(MONTH_NAMES)])
+        else:
+            overrides[name] = values.reshape(shape)
+
+    forecast = model.compute(base=base, **overrides)['forecast']
+    grid_shape = tuple(len(values) for values in axes.values())
+    forecast = np.broadcast_to(forecast, grid_shape + (len(MONTH_NAMES),))
+    total = forecast.sum(axis=-1)
+
+    grid = np.meshgrid(*axes.values(), indexing='ij')
+    surface = pd.DataFrame({
+        ('Plan' if name == 'planned_impressions' else name): values.ravel()
+        for name, values in zip(axes, grid)
+    })
+    surface['Total_Queries'] = total.ravel()
+
+    position = np.unravel_index(np.argmax(total), grid_shape)
+    best = {name: values[i].item() for (name, values), i in zip(axes.items(), position)}
+    if plans is not None:
+        best['planned_impressions'] = plans[best['planned_impressions']]
+    best['Total_Queries'] = float(total[position])
+
+    return {'axes': axes, 'forecast': forecast, 'total': total, 'surface': surface, 'best': best}
+
+
+def optimal_allocation(model, budget=None, scenario='Moderate', base='average', minimum=None, tolerance=1e-9):
+    """
+    Allocation of an impressions budget that maximises the total forecast queries.
+
+    With the other multipliers fixed, month m contributes
+    c[m] * (1 + k * log10(1 + x[m] / I[m])) queries for x[m] planned impressions,
+    so the optimum sets c[m] * k / (ln(10) * (I[m] + x[m])) equal across the
+    months that receive impressions.
+
+    Parameters:
+    - model: FactorModel
+    - budget: Total impressions to allocate (defaults to the planned total)
+    - scenario: Scenario supplying the parameter values
+    - base: Base level passed on to FactorModel.compute
+    - minimum: Optional minimum impressions per month (scalar or 12 values)
+    - tolerance: Relative tolerance of the budget
+
+    Returns:
+    - DataFrame with Month, Planned, Optimal impressions and the forecast under each plan
+    """
+    index = model.scenarios.index(scenario)
+    planned = model.inputs['planned_impressions']
+    current = model.inputs['current_impressions']
+    budget = planned.sum() if budget is None else float(budget)
+    minimum = np.zeros(len(planned)) if minimum is None else np.broadcast_to(np.asarray(minimum, float), planned.shape)
+    if minimum.sum() > budget:
+        raise ValueError("The monthly minimums exceed the budget")
+
+    computed = model.compute(base=base)
+    media_effectiveness = model.parameters['media_effectiveness'][index]
+    # Queries per month excluding the media multiplier
+    weight = computed['forecast'][index] / computed['media'][index]
+
+    # x[m] = max(minimum, weight[m] * scale - I[m]); bisect the common scale to spend the budget
+    def allocation(scale):
+        return np.maximum(minimum, weight * scale - current)
+
+    low, high = 0.0, 1.0
+    while allocation(high).sum() < budget:
+        high *= 2
+    while high - low > tolerance * high:
+        middle = (low + high) / 2
+        if allocation(middle).sum() < budget:
+            low = middle
+        else:
+            high = middle
+    optimal = allocation(high)
+    optimal *= budget / optimal.sum()
+
+    forecasts = model.compute(base=base, media_effectiveness=media_effectiveness,
+                              planned_impressions=np.stack([planned, optimal]),
+                              **{name: values[index] for name, values in model.parameters.items()
+                                 if name != 'media_effectiveness'})['forecast']
+    return pd.DataFrame({
+        'Month': MONTH_NAMES,
+        'Planned': planned,
+        'Optimal': optimal,
+        'Planned_Forecast': forecasts[0],
+        'Optimal_Forecast': forecasts[1]
+    })
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Compact Monthly Time Series
+
+MonthlySeries holds a monthly series as two NumPy arrays: int32 month
+ordinals (months since January 1970, the epoch of datetime64[M]) and float64
+values. Building one from the Month/Year columns of a template is a single
+vectorized lookup, without formatting or parsing date strings, and a series
+of 60 months takes under 1 KB instead of a DataFrame with a string column per
+row.
+
+Backends that need pandas get a Series whose values share the memory of the
+array; its DatetimeIndex is built on first use and kept with the series.
+
+Usage:
+    from uk_forecast_series import MonthlySeries
+
+    series = MonthlySeries.from_frame(reader.historical_queries())
+    series.to_series()      # pandas view for statsmodels, Prophet, ...
+"""
+
+import numpy as np
+import pandas as pd
+
+from uk_forecast_template import EPOCH_YEAR, MONTH_NAMES, month_ordinals, ordinal_dates
+
+
+class MonthlySeries:
+    __slots__ = ('ordinals', 'values', 'name', '_index')
+
+    def __init__(self, ordinals, values, name=None):
+        """
+        Monthly series in date order.
+
+        Parameters:
+        - ordinals: Month ordinals (months since January 1970), increasing
+        - values: One value per month
+        - name: Name of the series, used as the name of its pandas views
+        """
+        self.ordinals = np.asarray(ordinals, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.ordinals.shape != self.values.shape or self.ordinals.ndim != 1:
+            raise ValueError("A monthly series needs one month ordinal per value")
+        self.name = name
+        self._index = None
+
+    @classmethod
+    def from_columns(cls, months, years, values, name=None):
+        """
+        Build a series from month names, years and values in any row order.
+
+        Returns:
+        - Tuple of (MonthlySeries in date order, positions of the rows in date order)
+        """
+        ordinals = month_ordinals(months, years)
+        order = np.argsort(ordinals, kind='stable')
+        return cls(ordinals[order], np.asarray(values, dtype=np.float64)[order], name), order
+
+    @classmethod
+    def from_frame(cls, frame, column='Indexed_Queries'):
+        """Build a series from a frame with Month and Year columns (e.g. HISTORICAL QUERIES)."""
+        series, _ = cls.from_columns(frame['Month'], frame['Year'], frame[column].to_numpy(), name=column)
+        return series
+
+    @classmethod
+    def from_series(cls, series, name=None):
+        """Build a series from a pandas Series with a month-start DatetimeIndex, in date order."""
+        index = pd.DatetimeIndex(series.index)
+        ordinals = (index.year - EPOCH_YEAR) * 12 + index.month - 1
+        return cls(ordinals, np.asarray(series, dtype=np.float64), name or getattr(series, 'name', None))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getstate__(self):
+        # The index is rebuilt on demand rather than pickled
+        return {'ordinals': self.ordinals, 'values': self.values, 'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['ordinals'], state['values'], state['name'])
+
+    @property
+    def years(self):
+        """Year of every month."""
+        return self.ordinals // 12 + EPOCH_YEAR
+
+    @property
+    def months(self):
+        """Calendar month (1-12) of every month."""
+        return self.ordinals % 12 + 1
+
+    @property
+    def month_names(self):
+        """Month name of every month."""
+        return np.asarray(MONTH_NAMES, dtype=object)[self.ordinals % 12]
+
+    @property
+    def index(self):
+        """Month-start DatetimeIndex named Date, built on first use."""
+        if self._index is None:
+            self._index = ordinal_dates(self.ordinals, name='Date')
+        return self._index
+
+    @property
+    def nbytes(self):
+        """Bytes held by the ordinal and value arrays."""
+        return self.ordinals.nbytes + self.values.nbytes
+
+    def to_series(self):
+        """pandas Series sharing the values array, indexed by month-start dates."""
+        return pd.Series(self.values, index=self.index, name=self.name, copy=False)
+
+    def to_frame(self):
+        """Frame with Month, Year and value columns in the layout of HISTORICAL QUERIES."""
+        return pd.DataFrame({'Month': self.month_names, 'Year': self.years, self.name or 'Value': self.values})
+
+    def extends(self, previous):
+        """Whether this series is previous followed by new months."""
+        known = len(previous)
+        return (len(self) > known
+                and np.array_equal(self.ordinals[:known], previous.ordinals)
+                and np.allclose(self.values[:known], previous.values))
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Partitioned Parquet Results Store
+
+Keeps the forecast output of every run in one columnar dataset instead of
+overwriting CSV files in the working directory. Each run appends compressed
+Parquet files in long format
+
+    market | variant | model | run_id | run_timestamp | date | metric | value
+
+partitioned by market and model (market=UK/model=arima/<run_id>_<variant>.parquet), so
+reading one market or model only opens the files of that partition, and the
+date filter is answered from the row-group statistics of the date-sorted files.
+
+Incremental updates write only the rows that changed since the previous run
+(see changed_rows); read(latest='row') overlays them on the earlier runs.
+
+Requires pyarrow.
+
+Usage:
+    from uk_forecast_store import ResultsStore
+
+    store = ResultsStore('forecast_store')
+    run_id = store.write_run({'arima': model.arima_forecast}, market='UK')
+    arima = store.read(market='UK', model='arima', start='2025-01-01', latest=True, wide=True)
+"""
+
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_DIR = 'forecast_store'
+
+# Column prefixes of the comparison table and the model they belong to
+COMPARISON_MODELS = {
+    'Factor_': 'factor',
+    'ARIMA_': 'arima',
+    'ARIMAX_': 'arimax',
+    'Prophet_': 'prophet',
+    'Bayesian_': 'bayesian',
+}
+
+_PARTITION_KEYS = ('market', 'model')
+
+
+def _load_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The results store needs pyarrow (pip install pyarrow)") from e
+    return pa, ds, pq
+
+
+def comparison_frames(comparison):
+    """
+    Split a comparison table into one frame per model.
+
+    ARIMA_Forecast/ARIMA_Lower_CI become the Forecast/Lower_CI columns of the
+    'arima' frame; Factor_Moderate becomes the Moderate column of 'factor'.
+
+    Returns:
+    - Dict of model name -> DataFrame indexed by date
+    """
+    frames = {}
+    for prefix, model in COMPARISON_MODELS.items():
+        columns = [column for column in comparison.columns if column.startswith(prefix)]
+        if columns:
+            frames[model] = comparison[columns].rename(columns=lambda column: column[len(prefix):])
+    return frames
+
+
+def changed_rows(previous, current, rtol=1e-9):
+    """
+    Rows of a result frame that are new or differ from the previous version.
+
+    Parameters:
+    - previous: Earlier version of the frame, or None
+    - current: Current version, indexed by date
+    - rtol: Relative tolerance below which values count as unchanged
+
+    Returns:
+    - The new or changed rows of current
+    """
+    if previous is None or previous.empty:
+        return current
+    aligned = previous.reindex(index=current.index, columns=current.columns)
+    old = aligned.to_numpy(dtype=float)
+    new = current.to_numpy(dtype=float)
+    unchanged = np.isclose(new, old, rtol=rtol, atol=0, equal_nan=True)
+    return current[~unchanged.all(axis=1)]
+
+
+def _partition_value(value):
+    if not value or '/' in value or '=' in value or value.startswith('.'):
+        raise ValueError(f"Invalid partition value: {value!r}")
+    return value
+
+
+class ResultsStore:
+    def __init__(self, root=DEFAULT_STORE_DIR, compression='zstd'):
+        """
+        Append-only store of forecast results.
+
+        Parameters:
+        - root: Directory of the dataset
+        - compression: Parquet compression codec
+        """
+        self.root = root
+        self.compression = compression
+
+    def write_run(self, frames, market, variant='Base', run_id=None, timestamp=None):
+        """
+        Append the results of one run.
+
+        Parameters:
+        - frames: Dict of model name -> DataFrame indexed by date, one column per metric
+        - market, variant: Market and scenario variant of the template
+        - run_id: Identifier of the run (generated from the timestamp when None)
+        - timestamp: Time of the run (defaults to now, UTC)
+
+        Returns:
+        - The run id
+        """
+        pa, _, pq = _load_pyarrow()
+
+        timestamp = pd.Timestamp.now(tz='UTC') if timestamp is None else pd.Timestamp(timestamp)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize('UTC')
+        if run_id is None:
+            run_id = f"{timestamp:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+        for model, frame in frames.items():
+            if frame is None or frame.empty:
+                continue
+            long = frame.rename_axis('date').reset_index().melt(
+                id_vars='date', var_name='metric', value_name='value'
+            )
+            long = long.sort_values(['date', 'metric'], kind='stable')
+            table = pa.table({
+                'variant': pa.array([variant] * len(long), pa.string()),
+                'run_id': pa.array([run_id] * len(long), pa.string()),
+                'run_timestamp': pa.array([timestamp] * len(long), pa.timestamp('us', tz='UTC')),
+                'date': pa.array(pd.to_datetime(long['date']), pa.timestamp('us')),
+                'metric': pa.array(long['metric'].astype(str), pa.string()),
+                'value': pa.array(long['value'].astype(float), pa.float64())
+            })
+
+            directory = os.path.join(
+                self.root, f"market={_partition_value(market)}", f"model={_partition_value(model)}"
+            )
+            os.makedirs(directory, exist_ok=True)
+            # Variants of a market written by the same run get separate files
+            path = os.path.join(directory, f"{run_id}_{_partition_value(variant)}.parquet")
+            # Write to a hidden temporary file first so readers never see partial files
+            temporary_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+            pq.write_table(table, temporary_path, compression=self.compression, use_dictionary=True)
+            os.replace(temporary_path, path)
+        return run_id
+
+    def _dataset(self):
+        pa, ds, _ = _load_pyarrow()
+        partitioning = ds.partitioning(
+            pa.schema([(key, pa.string()) for key in _PARTITION_KEYS]), flavor='hive'
+        )
+        return ds.dataset(self.root, format='parquet', partitioning=partitioning,
+                          exclude_invalid_files=False, ignore_prefixes=['.', '_'])
+
+    def read(self, market=None, model=None, variant=None, run_id=None, start=None, end=None,
+             metrics=None, latest=False, wide=False):
+        """
+        Load a slice of the stored results.
+
+        Parameters:
+        - market, model, variant, run_id: A value or list of values to select
+        - start, end: Inclusive date range
+        - metrics: Metrics to load
+        - latest: Keep only the most recent run of every market, variant and model, or
+          'row' to keep the most recent value of every date and metric across runs
+        - wide: Pivot the metrics into columns
+
+        Returns:
+        - DataFrame in long format (or wide, one row per run and date; one row per date with latest='row')
+        """
+        _, ds, _ = _load_pyarrow()
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=['market', 'variant', 'model', 'run_id', 'run_timestamp',
+                                         'date', 'metric', 'value'])
+
+        condition = None
+        for column, values in (('market', market), ('model', model), ('variant', variant),
+                               ('run_id', run_id), ('metric', metrics)):
+            if values is None:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            condition = _and(condition, ds.field(column).isin(values))
+        if start is not None:
+            condition = _and(condition, ds.field('date') >= pd.Timestamp(start).to_datetime64())
+        if end is not None:
+            condition = _and(condition, ds.field('date') <= pd.Timestamp(end).to_datetime64())
+
+        data = self._dataset().to_table(filter=condition).to_pandas()
+        data = data[['market', 'variant', 'model', 'run_id', 'run_timestamp', 'date', 'metric', 'value']]
+
+        index = ['market', 'variant', 'model', 'run_id', 'run_timestamp', 'date']
+        if latest == 'row' and not data.empty:
+            data = data.sort_values('run_timestamp', kind='stable').drop_duplicates(
+                ['market', 'variant', 'model', 'date', 'metric'], keep='last'
+            )
+            index = ['market', 'variant', 'model', 'date']
+        elif latest and not data.empty:
+            newest = data.groupby(['market', 'variant', 'model'])['run_timestamp'].transform('max')
+            data = data[data['run_timestamp'] == newest]
+
+        if wide:
+            data = data.pivot_table(index=index, columns='metric', values='value', aggfunc='first').reset_index()
+            data.columns.name = None
+
+        order = ['market', 'model', 'date'] if latest == 'row' else ['market', 'model', 'run_timestamp', 'date']
+        return data.sort_values(order, kind='stable').reset_index(drop=True)
+
+    def runs(self):
+        """
+        List the stored runs.
+
+        Returns:
+        - DataFrame with one row per run, market, variant and model
+        """
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=['run_id', 'run_timestamp', 'market', 'variant', 'model', 'rows'])
+        table = self._dataset().to_table(columns=['run_id', 'run_timestamp', 'market', 'variant', 'model'])
+        runs = table.to_pandas().value_counts().rename('rows').reset_index()
+        return runs.sort_values(['run_timestamp', 'market', 'model']).reset_index(drop=True)
+
+
+def _and(condition, expression):
+    return expression if condition is None else condition & expression
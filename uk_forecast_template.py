@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Travel Queries Forecast Template Reader
+
+The forecast templates (Travel_Queries_Forecast_<MARKET>*.csv) are a single CSV
+file split into sections, each introduced by a banner:
+
+    ====================,,,,
+    HISTORICAL QUERIES,,,,
+    ====================,,,,
+    Month,Year,Indexed Queries,,,
+    ...
+
+This module scans a template once, builds a byte-offset index of every section
+and parses sections into typed DataFrames only when they are requested.
+
+Usage:
+    from uk_forecast_template import TemplateReader
+
+    reader = TemplateReader('Travel_Queries_Forecast_UK_Aligned.csv')
+    history = reader.historical_queries()
+    results = reader.section('FORECAST RESULTS')
+"""
+
+import csv
+import glob
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+MONTH_NAMES = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+)
+MONTH_NUMBERS = {name: number for number, name in enumerate(MONTH_NAMES, start=1)}
+
+# Month ordinals count months since January 1970, the epoch of datetime64[M]
+EPOCH_YEAR = 1970
+
+_MONTH_INDEX = pd.Index(MONTH_NAMES)
+
+# Sections found in the templates we maintain, in the order they appear
+KNOWN_SECTIONS = (
+    'HISTORICAL QUERIES',
+    'FLIGHT SEARCHES',
+    'MEDIA IMPRESSIONS',
+    'BRAND HEALTH',
+    'HOTEL GUESTS',
+    'PARAMETERS',
+    'ENHANCED MODEL PARAMETERS',
+    'SEASONALITY INDEX',
+    'FORECAST CALCULATIONS',
+    'FORECAST RESULTS',
+    'CONFIDENCE INTERVALS',
+    'ENHANCED BRAND METRICS',
+)
+
+# File name pattern of the forecast templates
+TEMPLATE_PATTERN = 'Travel_Queries_Forecast_*.csv'
+
+# Free-text block before the first section banner
+INTRODUCTION = 'INTRODUCTION'
+
+# A banner line, the section name line and a closing banner line
+_SECTION_HEADER = re.compile(
+    rb'^=+[,\s]*?\r?\n([^\r\n]*)\r?\n=+[,\s]*?(?:\r?\n|\Z)',
+    re.MULTILINE
+)
+
+# Separator rows that contain nothing but commas
+_BLANK_ROW = re.compile(rb'^[,\s]*(?:\r?\n|\Z)', re.MULTILINE)
+
+
+class TemplateReader:
+    def __init__(self, csv_path):
+        """Read the template once and index the byte range of every section."""
+        self.csv_path = csv_path
+        with open(csv_path, 'rb') as file:
+            self._content = file.read()
+        self.sections = self._index_sections()
+        self._frames = {}
+
+    def _index_sections(self):
+        """
+        Build the section index.
+
+        Returns:
+        - Dict mapping section name to a (start, end) byte range of its body
+        """
+        index = {}
+        previous_name = INTRODUCTION
+        previous_start = 0
+        for match in _SECTION_HEADER.finditer(self._content):
+            index[previous_name] = (previous_start, match.start())
+            previous_name = match.group(1).decode('utf-8').strip(' ,\t')
+            previous_start = match.end()
+        index[previous_name] = (previous_start, len(self._content))
+        return index
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    @property
+    def names(self):
+        """Section names in file order, excluding the introduction."""
+        return [name for name in self.sections if name != INTRODUCTION]
+
+    def raw(self, name):
+        """Return the undecoded bytes of a section body."""
+        if name not in self.sections:
+            raise ValueError(f"{name} section not found in {self.csv_path}")
+        start, end = self.sections[name]
+        return self._content[start:end]
+
+    def rows(self, name):
+        """
+        Return the non-empty rows of a section as lists of strings.
+
+        Quoted fields such as "39,266,229" are kept as a single cell and
+        trailing empty cells are dropped.
+        """
+        text = self.raw(name).decode('utf-8')
+        rows = []
+        for row in csv.reader(io.StringIO(text)):
+            while row and not row[-1].strip():
+                row.pop()
+            if row:
+                rows.append([cell.strip() for cell in row])
+        return rows
+
+    def section(self, name):
+        """
+        Parse a section into a typed DataFrame.
+
+        The first row of the section is used as the header. Thousands
+        separators are removed and percentages become fractions
+        (92.24% -> 0.9224). Parsed sections are cached.
+
+        Parameters:
+        - name: Section name, e.g. 'FORECAST RESULTS'
+
+        Returns:
+        - DataFrame with the section contents
+        """
+        if name not in self._frames:
+            self._frames[name] = self._parse_section(name)
+        return self._frames[name].copy()
+
+    def _parse_section(self, name):
+        """Parse the byte range of a section with the C CSV parser."""
+        body = _BLANK_ROW.sub(b'', self.raw(name))
+        frame = pd.read_csv(
+            io.BytesIO(body),
+            thousands=',',
+            skipinitialspace=True,
+            skip_blank_lines=True
+        )
+
+        # Remove the padding columns
+        frame = frame.dropna(axis=1, how='all')
+        frame.columns = [str(column).strip() for column in frame.columns]
+        frame = frame.reset_index(drop=True)
+
+        return _coerce_types(frame)
+
+    def historical_queries(self):
+        """
+        Return the HISTORICAL QUERIES section.
+
+        Returns:
+        - DataFrame with Month, Year and Indexed_Queries columns
+        """
+        data = self.section('HISTORICAL QUERIES')
+        data = data.rename(columns={'Indexed Queries': 'Indexed_Queries'})
+        data = data[['Month', 'Year', 'Indexed_Queries']].dropna()
+        data['Year'] = data['Year'].astype(int)
+        data['Indexed_Queries'] = data['Indexed_Queries'].astype(float)
+        return data.reset_index(drop=True)
+
+    def forecast_results(self):
+        """
+        Return the monthly rows of the FORECAST RESULTS section.
+
+        The summary 'Average' row is dropped and a Date column is added for
+        the forecast year, which is the year after the '<year> Queries' column.
+
+        Returns:
+        - DataFrame with Date, Month, the base-year queries and one column per scenario
+        """
+        data = self.section('FORECAST RESULTS')
+        data = data[data['Month'].isin(MONTH_NUMBERS)].reset_index(drop=True)
+
+        base_year = base_year_of(data.columns)
+        data['Date'] = month_start_dates(data['Month'], base_year + 1)
+        return data
+
+
+def expand_templates(sources, pattern=TEMPLATE_PATTERN):
+    """
+    Expand files, directories and glob patterns into a sorted list of templates.
+
+    Parameters:
+    - sources: Iterable of file paths, directories or glob patterns
+    - pattern: File name pattern matched inside directories
+
+    Returns:
+    - List of unique template paths
+    """
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            paths.update(glob.glob(os.path.join(source, pattern)))
+        elif glob.has_magic(source):
+            paths.update(glob.glob(source))
+        elif os.path.exists(source):
+            paths.add(source)
+        else:
+            print(f"File not found: {source}")
+    return sorted(path for path in paths if path.endswith('.csv'))
+
+
+def base_year_of(columns):
+    """Return the year of the '<year> Queries' column in a results section."""
+    for column in columns:
+        match = re.fullmatch(r'(\d{4}) (?:Queries|Actual)', column)
+        if match:
+            return int(match.group(1))
+    raise ValueError("Base year queries column not found in the forecast results")
+
+
+def month_ordinals(months, years):
+    """
+    Month ordinals (months since January 1970) of month names and years.
+
+    The names are looked up in one hash-table pass, without parsing dates.
+
+    Parameters:
+    - months: Month names (see MONTH_NAMES)
+    - years: Years, a scalar or one per month
+
+    Returns:
+    - int32 array of month ordinals
+    """
+    numbers = _MONTH_INDEX.get_indexer(np.asarray(months, dtype=object))
+    if (numbers < 0).any():
+        unknown = sorted(set(np.asarray(months, dtype=object)[numbers < 0].tolist()), key=str)
+        raise ValueError(f"Unknown month names: {', '.join(map(str, unknown))}")
+    years = np.asarray(years, dtype=np.int32)
+    return ((years - EPOCH_YEAR) * 12 + numbers).astype(np.int32)
+
+
+def ordinal_dates(ordinals, name=None):
+    """Month-start DatetimeIndex of month ordinals."""
+    dates = np.asarray(ordinals, dtype=np.int64).astype('datetime64[M]').astype('datetime64[ns]')
+    return pd.DatetimeIndex(dates, name=name)
+
+
+def month_start_dates(months, years):
+    """Build month-start timestamps from month names and years."""
+    return pd.Series(ordinal_dates(month_ordinals(months, years)))
+
+
+def _coerce_types(frame):
+    """Convert text columns that hold numbers or percentages to numeric dtypes."""
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values):
+            continue
+        text = values.astype('string').str.strip()
+        is_percent = text.str.endswith('%').fillna(False)
+        numbers = pd.to_numeric(
+            text.str.rstrip('%').str.replace(',', '', regex=False),
+            errors='coerce'
+        )
+        # Only convert columns where every present value is numeric
+        if numbers.notna().sum() != text.notna().sum():
+            continue
+        frame[column] = numbers.where(~is_percent, numbers / 100).astype(float)
+    return frame